@@ -37,6 +37,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # SearchVectorField, GinIndex 등 Postgres 전용 기능
+    'django.contrib.postgres',
     # NestJS의 app.module.js처럼 모든 subapp의 중심이 되는 core app
     # 내가 만든 core 앱을 추가하기
 
@@ -56,6 +58,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # 맨 뒤에 둬야 view와 render에서 실행한 query만 셈
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -86,16 +91,36 @@ WSGI_APPLICATION = 'app.wsgi.application'
 DATABASES = {
     'default': {
         # 사용할 데이터베이스 엔진
-        'ENGINE': 'django.db.backends.postgresql',
+        # django.db.backends.postgresql + stale connection health check, pool
+        'ENGINE': 'core.db.backends.postgresql',
         # HOST: host값, username, db name과 password 모두 환경변수에서 가져옴
         # docker-compose 파일의 enviornment의 내용
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        # request마다 connection을 새로 열지 않고 재사용할 시간(초)
+        # 0이면 매 request마다 닫음 (POOL 사용 시에는 0으로 둘 것)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# DB_POOL_MAX_SIZE를 주면 request가 끝난 connection을 process 안의
+# pool로 돌려줌. runserver처럼 request마다 thread가 생기는 server용
+if os.environ.get('DB_POOL_MAX_SIZE'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {
+        # pool에 남겨둘 idle connection 수
+        'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'MAX_SIZE': int(os.environ['DB_POOL_MAX_SIZE']),
+        # 이 시간(초)보다 오래 놀던 connection은 쓰기 전에 SELECT 1
+        'HEALTH_CHECK_AFTER': int(
+            os.environ.get('DB_HEALTH_CHECK_AFTER', 30)
+        ),
+        # 모든 connection을 빌려갔을 때 반납을 기다릴 시간(초)
+        'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -138,4 +163,180 @@ STATIC_URL = '/static/'
 # core = 내가만든 앱(= app.module) 이름 
 # User = 내 앱 안 models.py의 새로운 model 이름 ( == 클래스 이름)
 """ 디펜던시 인젝션과 유사 """
-AUTH_USER_MODEL = "core.User"
\ No newline at end of file
+AUTH_USER_MODEL = "core.User"
+
+
+# CachedTokenAuthentication의 token -> user cache
+# MAX_SIZE: process마다 LRU에 들고있을 token 수, TTL: 초
+# CACHE_ALIAS: 설정하면 CACHES의 해당 cache를 process간 공유 cache로 사용
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 1024)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'CACHE_ALIAS': os.environ.get('TOKEN_AUTH_CACHE_ALIAS') or None,
+}
+
+
+# Recipe API의 user별 response cache
+# ALIAS: 사용할 CACHES. worker process가 여러개면 memcached처럼
+# 공유되는 cache를 가리켜야 invalidation이 모든 process에 보임
+# 그래서 ALIAS를 설정했을 때만 기본으로 켜짐 ('default'는 process별 메모리)
+# recipe.search, recipe.similarity의 in-memory index도 이 cache의
+# generation으로 다른 worker의 변경을 알아챔
+RECIPE_RESPONSE_CACHE = {
+    'ENABLED': os.environ.get(
+        'RECIPE_RESPONSE_CACHE',
+        '1' if os.environ.get('RECIPE_RESPONSE_CACHE_ALIAS') else '0'
+    ) == '1',
+    'ALIAS': os.environ.get('RECIPE_RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RECIPE_RESPONSE_CACHE_TIMEOUT', 60)),
+}
+
+
+# Recipe API pagination
+# MODE: 'cursor'(keyset, COUNT 없음) | 'page'(page number) | 'none'
+# PAGE_SIZE가 0이면 client가 ?page_size= 를 줄 때만 paginate
+RECIPE_PAGINATION = {
+    'MODE': os.environ.get('RECIPE_PAGINATION_MODE', 'cursor'),
+    'PAGE_SIZE': int(os.environ.get('RECIPE_PAGE_SIZE', 0)),
+    'MAX_PAGE_SIZE': int(os.environ.get('RECIPE_MAX_PAGE_SIZE', 100)),
+}
+
+
+# <prefix>/bulk/ API에서 request 하나에 보낼 수 있는 최대 item 수
+RECIPE_BULK = {
+    'MAX_BATCH_SIZE': int(os.environ.get('RECIPE_BULK_MAX_SIZE', 100)),
+}
+
+
+# GET /recipes/sync/
+# TOMBSTONE_RETENTION_DAYS: 삭제 기록(Tombstone)을 남겨두는 기간
+# prune_tombstones command가 이보다 오래된 것을 지우고, since가 이보다
+# 오래된 sync는 410으로 전체 sync를 다시 하라고 응답
+RECIPE_SYNC = {
+    'TOMBSTONE_RETENTION_DAYS': int(
+        os.environ.get('RECIPE_SYNC_TOMBSTONE_RETENTION_DAYS', 30)
+    ),
+}
+
+
+# Recipe ?search=
+# CONFIG: to_tsvector/plainto_tsquery의 text search configuration
+# TRIGRAM_THRESHOLD: full text 결과가 없을 때 tag/ingredient 이름 오타 허용
+# 정도 (pg_trgm extension이 있을 때만)
+RECIPE_SEARCH = {
+    # recipe.search.PostgresSearchBackend: search_vector + GIN index
+    # recipe.search.InvertedIndexSearchBackend: process 메모리 index (SQLite용)
+    'BACKEND': os.environ.get(
+        'RECIPE_SEARCH_BACKEND', 'recipe.search.PostgresSearchBackend'
+    ),
+    # in-memory index를 들고 있을 최대 user 수
+    'INDEX_MAX_USERS': int(
+        os.environ.get('RECIPE_SEARCH_INDEX_MAX_USERS', 1000)
+    ),
+    # 이 초가 지난 in-memory index는 다시 만듦 (0이면 안 함)
+    # 다른 worker의 변경은 RECIPE_RESPONSE_CACHE_ALIAS의 공유 generation으로만
+    # 알 수 있어서, ALIAS가 없으면 (process별 cache) 이 시간만큼 늦게 보임
+    'INDEX_MAX_AGE': float(os.environ.get(
+        'RECIPE_SEARCH_INDEX_MAX_AGE',
+        0 if os.environ.get('RECIPE_RESPONSE_CACHE_ALIAS') else 60
+    )),
+    'CONFIG': os.environ.get('RECIPE_SEARCH_CONFIG', 'english'),
+    'TRIGRAM_THRESHOLD': float(
+        os.environ.get('RECIPE_SEARCH_TRIGRAM_THRESHOLD', 0.3)
+    ),
+}
+
+
+# GET /recipes/{id}/similar/
+# LIMIT: ?limit= 기본값, MAX_LIMIT: ?limit= 최대값
+# MAX_USERS: process 메모리에 feature matrix를 들고 있을 최대 user 수
+# MAX_AGE: 이 초가 지난 matrix는 다시 만듦 (0이면 안 함)
+# worker process가 여러개면 RECIPE_RESPONSE_CACHE_ALIAS를 공유 cache로
+# 설정해야 다른 worker의 변경이 바로 보임. 없으면 MAX_AGE만큼 늦을 수 있음
+RECIPE_SIMILAR = {
+    'LIMIT': int(os.environ.get('RECIPE_SIMILAR_LIMIT', 10)),
+    'MAX_LIMIT': int(os.environ.get('RECIPE_SIMILAR_MAX_LIMIT', 100)),
+    'MAX_USERS': int(os.environ.get('RECIPE_SIMILAR_MAX_USERS', 1000)),
+    'MAX_AGE': float(os.environ.get(
+        'RECIPE_SIMILAR_MAX_AGE',
+        0 if os.environ.get('RECIPE_RESPONSE_CACHE_ALIAS') else 60
+    )),
+}
+
+
+# request별 query 수, SQL 시간, serialize 시간, render 시간 (core.middleware)
+# SAMPLE_RATE: 측정할 request 비율 0.0 ~ 1.0, 0이면 overhead 없음
+# HEADER: 측정한 response에 Server-Timing header를 붙일지
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING', '1') == '1',
+    'SAMPLE_RATE': float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 0)),
+    'HEADER': os.environ.get('REQUEST_TIMING_HEADER', '1') == '1',
+}
+
+
+# /metrics (core.metrics, core.middleware.MetricsMiddleware)
+# MULTIPROCESS_DIR: worker process가 여러개일 때 값을 모을 directory
+# server를 띄울 때마다 비워야 함
+# TOKEN: 설정하면 'Authorization: Bearer <TOKEN>' header가 있어야 응답
+# TOKEN이 없으면 DEBUG이거나 localhost, INTERNAL_IPS에서 온 request만 응답
+# (reverse proxy 뒤라면 REMOTE_ADDR가 proxy 주소라서 TOKEN을 써야 함)
+# PUBLIC: TOKEN 없이 누구에게나 응답
+METRICS = {
+    'ENABLED': os.environ.get('METRICS', '1') == '1',
+    'MULTIPROCESS_DIR': os.environ.get('METRICS_MULTIPROCESS_DIR') or None,
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+    'PUBLIC': os.environ.get('METRICS_PUBLIC', '0') == '1',
+}
+
+
+# recipe API의 느린 query 기록 (core.slowqueries, admin의 Slow queries)
+# THRESHOLD_MS: 이보다 오래 걸린 statement를 EXPLAIN해서 저장
+# MAX_ENTRIES: 최근 몇개를 남길지
+# BACKGROUND: EXPLAIN을 background thread에서 실행 (0이면 request 안에서)
+# EXPLAIN_TIMEOUT_MS: EXPLAIN ANALYZE의 statement_timeout
+SLOW_QUERIES = {
+    'ENABLED': os.environ.get('SLOW_QUERIES', '1') == '1',
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200)),
+    'MAX_ENTRIES': int(os.environ.get('SLOW_QUERY_MAX_ENTRIES', 500)),
+    'BACKGROUND': os.environ.get('SLOW_QUERY_BACKGROUND', '1') == '1',
+    'EXPLAIN_TIMEOUT_MS': int(
+        os.environ.get('SLOW_QUERY_EXPLAIN_TIMEOUT_MS', 5000)
+    ),
+}
+
+
+# RecipeViewSet, user API의 sampling profiler (core.profiling)
+# SAMPLE_RATE 비율의 request와 HEADER header에 SECRET 값을 보낸 request를
+# profile해서 OUTPUT_DIR에 collapsed stack file(flamegraph.pl 입력)로 남김
+# SECRET이 없으면 header로는 켤 수 없음
+# MAX_FILES: OUTPUT_DIR에 남겨둘 최대 file 수
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('PROFILING_SAMPLE_RATE', 0)),
+    'HEADER': os.environ.get('PROFILING_HEADER', 'X-Profile') or None,
+    'SECRET': os.environ.get('PROFILING_SECRET') or None,
+    'MAX_FILES': int(os.environ.get('PROFILING_MAX_FILES', 100)),
+    'INTERVAL_MS': float(os.environ.get('PROFILING_INTERVAL_MS', 5)),
+    'OUTPUT_DIR': os.environ.get(
+        'PROFILING_OUTPUT_DIR', os.path.join(BASE_DIR, 'profiles')
+    ),
+}
+
+
+# core.timing의 key=value log를 stdout으로
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
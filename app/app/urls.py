@@ -1,5 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
+
+from core.views import metrics_view
 """app URL Configuration
 
 The `urlpatterns` list routes URLs to views. For more information please see:
@@ -20,4 +22,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
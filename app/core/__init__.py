@@ -1 +1,3 @@
 # sudo docker-compose run app sh -c "python manage.py startapp core"
+
+default_app_config = 'core.apps.CoreConfig'
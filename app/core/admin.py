@@ -7,6 +7,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from core import models
 # 파이썬의 string을 human readable text로 바꾼다.
 from django.utils.translation import gettext as _
+from django.utils.html import format_html
 
 # Useradmin은 뭐야 대체
 class UserAdmin(BaseUserAdmin):
@@ -44,3 +45,32 @@ admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
 admin.site.register(models.Recipe)
+
+
+class SlowQueryAdmin(admin.ModelAdmin):
+    """ Read only list of the slow queries recorded by core.slowqueries """
+    list_display = ['created_at', 'view', 'duration_ms', 'short_sql']
+    list_filter = ['view']
+    search_fields = ['sql']
+    fields = ['created_at', 'view', 'duration_ms', 'sql', 'params',
+              'explain']
+    readonly_fields = fields
+
+    def short_sql(self, obj):
+        return obj.sql[:120]
+    short_sql.short_description = 'SQL'
+
+    def explain(self, obj):
+        # plan의 들여쓰기가 보이게
+        return format_html('<pre>{}</pre>', obj.plan)
+    explain.short_description = 'Plan'
+
+    # 직접 만들거나 고치지 않음, 보고 지우기만
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(models.SlowQuery, SlowQueryAdmin)
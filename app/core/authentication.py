@@ -0,0 +1,157 @@
+# DRF TokenAuthentication은 request마다 authtoken_token + core_user를 join해서
+# 조회한다. 여기서 token -> user 결과를 cache해서 DB hit을 없앤다
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import metrics
+
+
+class TokenUserCache:
+    """ Bounded in-process LRU of token key -> (user, token) with a TTL
+
+    With a cache_alias the entries live in that Django cache instead, so
+    an invalidation in one worker process is seen by all of them.
+    """
+
+    def __init__(self, max_size, ttl, cache_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        # 설정하면 in-process LRU 대신 process간에 공유되는 Django cache 사용
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared_key(self, key):
+        # v2: 값이 model 객체가 아니라 field 값 tuple
+        return 'core:auth:token:v2:%s' % key
+
+    def get(self, key):
+        """ Return the cached (user, token) pair or None """
+        if self.cache_alias:
+            # 공유 cache가 기준. 다른 process에서 invalidate한 것도 바로 반영됨
+            return caches[self.cache_alias].get(self._shared_key(key))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            # LRU: 최근에 쓴 것을 맨 뒤로
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """ Cache the (user, token) pair for the token key """
+        if self.cache_alias:
+            caches[self.cache_alias].set(
+                self._shared_key(key), value, self.ttl
+            )
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                # 가장 오래 안 쓴 것부터 버림
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """ Forget the token key """
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_alias:
+            caches[self.cache_alias].delete(self._shared_key(key))
+
+    def clear(self):
+        """ Forget every token of this process """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """ Return the process wide token cache built from settings """
+    global _token_cache
+    if _token_cache is None:
+        config = settings.TOKEN_AUTH_CACHE
+        _token_cache = TokenUserCache(
+            max_size=config['MAX_SIZE'],
+            ttl=config['TTL'],
+            cache_alias=config.get('CACHE_ALIAS'),
+        )
+
+    return _token_cache
+
+
+def reset_token_cache():
+    """ Drop the token cache so it is rebuilt from settings """
+    global _token_cache
+    _token_cache = None
+
+
+def invalidate_token(key):
+    """ Remove a token from the cache, e.g. after it was deleted """
+    get_token_cache().delete(key)
+
+
+def freeze(instance):
+    """ Return the (db alias, field values) of a model instance """
+    return instance._state.db, tuple(
+        getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    )
+
+
+def thaw(model, frozen):
+    """ Build a new instance of model from freeze() output """
+    db, values = frozen
+    return model.from_db(db, [
+        field.attname for field in model._meta.concrete_fields
+    ], values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ TokenAuthentication that caches the token -> user lookup
+
+    Only field values are cached. Every request gets new user and token
+    instances, so related object caches set while handling one request
+    never leak into another.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cached = cache.get(key)
+        if cached is None:
+            metrics.CACHE_REQUESTS.inc(cache='token', result='miss')
+            try:
+                # 없는 token, inactive user는 여기서 AuthenticationFailed
+                user, token = super().authenticate_credentials(key)
+            except AuthenticationFailed:
+                metrics.AUTH_FAILURES.inc(reason='token')
+                raise
+            cache.set(key, (freeze(user), freeze(token)))
+            return (user, token)
+
+        metrics.CACHE_REQUESTS.inc(cache='token', result='hit')
+        user_values, token_values = cached
+        user = thaw(get_user_model(), user_values)
+        token = thaw(self.get_model(), token_values)
+        # token.user로 다시 조회하지 않게
+        token.user = user
+        return (user, token)
@@ -0,0 +1,63 @@
+# Tag.recipe_count, Ingredient.recipe_count 관리
+#
+# tag/ingredient list마다 through table을 annotate(Count(...))로 세지 않도록
+# column에 저장해 둠. link가 바뀌는 곳마다 F()로 더하고 빼서 동시에
+# 여러 request가 바꿔도 UPDATE 하나가 atomic
+# - recipe.tags.add() 등, recipe 삭제: core.signals
+# - bulk API (through table bulk_create/delete): recipe.bulk.set_m2m_links
+# - import_recipes (COPY): recount_recipes
+# - 어긋났을 때: repair_recipe_counts command
+
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe
+
+# 세는 model -> (through table, through table의 FK column)
+COUNTED = {
+    Tag: (Recipe.tags.through, 'tag_id'),
+    Ingredient: (Recipe.ingredients.through, 'ingredient_id'),
+}
+
+
+def adjust_recipe_counts(model, deltas):
+    """ Add {pk: delta} to recipe_count, one UPDATE per distinct delta """
+    pks_by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            pks_by_delta[delta].append(pk)
+    # count가 바뀌면 updated_at도 같이 바꿈. /recipes/sync/가 다시 보내고
+    # nested로 보여주는 recipe detail의 ETag도 바뀌게
+    now = timezone.now()
+    for delta, pks in pks_by_delta.items():
+        model.objects.filter(pk__in=pks).update(
+            recipe_count=F('recipe_count') + delta, updated_at=now
+        )
+
+
+def actual_recipe_count(through, column):
+    """ Return an expression counting the links of OuterRef('pk') """
+    return Coalesce(Subquery(
+        through.objects.filter(
+            **{column: OuterRef('pk')}
+        ).order_by().values(column).annotate(
+            count=Count('*')
+        ).values('count')
+    ), 0)
+
+
+def wrong_recipe_counts(queryset, through, column):
+    """ Return the objects of queryset whose recipe_count is wrong """
+    return queryset.exclude(recipe_count=actual_recipe_count(through, column))
+
+
+def recount_recipes(queryset, through, column):
+    """ Fix the wrong recipe_count of queryset, return how many were fixed """
+    # 틀린 row만 UPDATE 한번으로
+    return wrong_recipe_counts(queryset, through, column).update(
+        recipe_count=actual_recipe_count(through, column),
+        updated_at=timezone.now()
+    )
@@ -0,0 +1,167 @@
+# django.db.backends.postgresql을 extend한 DB backend
+# settings.py의 DATABASES ENGINE에 'core.db.backends.postgresql'로 사용
+#
+# 1. CONN_MAX_AGE로 유지되는 persistent connection이 오래 놀고 있었다면
+#    재사용하기 전에 SELECT 1로 health check
+# 2. DATABASES의 'POOL'을 설정하면 request가 끝날 때 connection을 닫지 않고
+#    process 안의 pool에 돌려줌 (thread per request인 WSGI server용)
+
+import threading
+import time
+import weakref
+
+from django.db.backends.postgresql import base
+from psycopg2 import pool as psycopg2_pool
+
+from core.db.backends.postgresql.creation import DatabaseCreation
+
+
+# connection parameter별 pool, process 안의 모든 thread가 공유
+_pools = {}
+_pools_lock = threading.Lock()
+# connection -> pool에 반납된 시간. 다른 thread가 꺼내갈 수 있어서 module 단위
+_returned_at = weakref.WeakKeyDictionary()
+
+
+class BlockingConnectionPool(psycopg2_pool.ThreadedConnectionPool):
+    """ ThreadedConnectionPool whose getconn() waits for a free connection
+
+    psycopg2 raises PoolError as soon as max_size connections are out, so
+    a burst of requests would fail instead of queueing for a moment.
+    """
+
+    def __init__(self, min_size, max_size, *args, **kwargs):
+        super().__init__(min_size, max_size, *args, **kwargs)
+        # 빌려간 connection 수를 max_size까지만
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self, key=None, timeout=None):
+        """ Borrow a connection, waiting up to timeout seconds """
+        if not self._slots.acquire(timeout=timeout):
+            raise base.Database.OperationalError(
+                'Timed out after %ss waiting for a pooled connection'
+                % timeout
+            )
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+def get_pool(conn_params, min_size, max_size):
+    """ Return the process wide pool for the connection parameters """
+    key = tuple(sorted(conn_params.items()))
+    with _pools_lock:
+        connection_pool = _pools.get(key)
+        if connection_pool is None:
+            connection_pool = BlockingConnectionPool(
+                min_size, max_size, **conn_params
+            )
+            _pools[key] = connection_pool
+
+    return connection_pool
+
+
+def close_pools():
+    """ Close every pooled connection of this process """
+    with _pools_lock:
+        for connection_pool in _pools.values():
+            connection_pool.closeall()
+        _pools.clear()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """ Postgres backend with stale connection checks and optional pooling """
+    creation_class = DatabaseCreation
+    # 이 시간(초)보다 오래 놀던 connection은 쓰기 전에 health check
+    health_check_after = 30
+    pool_timeout = 30
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._last_used = None
+
+    @property
+    def pool_settings(self):
+        return self.settings_dict.get('POOL') or None
+
+    def get_new_connection(self, conn_params):
+        config = self.pool_settings
+        if not config:
+            return super().get_new_connection(conn_params)
+
+        self.health_check_after = config.get(
+            'HEALTH_CHECK_AFTER', self.health_check_after
+        )
+        # pool이 다 빌려갔을 때 기다릴 최대 시간(초), None이면 계속
+        self.pool_timeout = config.get('TIMEOUT', self.pool_timeout)
+        self._pool = get_pool(
+            conn_params, config.get('MIN_SIZE', 1), config.get('MAX_SIZE', 10)
+        )
+        connection = self._checkout()
+
+        # super().get_new_connection()의 isolation level 설정과 동일
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+
+        return connection
+
+    def _checkout(self):
+        """ Borrow a live connection from the pool """
+        while True:
+            connection = self._pool.getconn(timeout=self.pool_timeout)
+            returned_at = _returned_at.pop(connection, None)
+            if connection.closed:
+                self._pool.putconn(connection, close=True)
+                continue
+            idle = returned_at is not None and (
+                time.monotonic() - returned_at > self.health_check_after
+            )
+            if idle and not self._ping(connection):
+                # DB가 재시작됐거나 idle timeout으로 끊긴 connection은 버림
+                self._pool.putconn(connection, close=True)
+                continue
+            return connection
+
+    def _ping(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except base.Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is None or self._pool is None or self._pool.closed:
+            return super()._close()
+
+        # 닫는 대신 pool에 반납. rollback은 psycopg2 pool이 해준다
+        connection = self.connection
+        with self.wrap_database_errors:
+            broken = bool(connection.closed or self.errors_occurred)
+            if not broken:
+                _returned_at[connection] = time.monotonic()
+            self._pool.putconn(connection, close=broken)
+
+    def close_if_unusable_or_obsolete(self):
+        # request 시작/끝에서 call됨 (django.db.close_old_connections)
+        if self.connection is not None and self._last_used is not None:
+            idle = time.monotonic() - self._last_used
+            if idle > self.health_check_after and not self.is_usable():
+                self.close()
+        super().close_if_unusable_or_obsolete()
+        self._last_used = time.monotonic()
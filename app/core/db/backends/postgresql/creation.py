@@ -0,0 +1,13 @@
+from django.db.backends.postgresql.creation import (
+    DatabaseCreation as BaseDatabaseCreation
+)
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+    """ Close the pooled connections before the test database is dropped """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # pool에 남은 idle connection이 있으면 DROP DATABASE가 실패함
+        from core.db.backends.postgresql import base
+        base.close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,94 @@
+# 실제 WSGI server를 띄워서 API endpoint의 requests/sec를 측정하는 command
+# DB connection 설정(DB_CONN_MAX_AGE, DB_POOL_MAX_SIZE)을 바꿔가며 비교
+#
+# python manage.py benchmark_requests --token <key> --requests 500
+#
+# test Client는 request가 끝나도 DB connection을 닫지 않아서
+# connection 비용을 잴 수 없음. 그래서 socket으로 요청을 보낸다
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """ Request handler that does not log every request """
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadPerRequestServer(ThreadingMixIn, WSGIServer):
+    """ runserver와 같이 request마다 thread를 만드는 server """
+    daemon_threads = True
+
+
+class Command(BaseCommand):
+    """ Django command to measure requests/sec of an API endpoint """
+    help = 'Serve the app on a local port and measure requests/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/recipe/tags/')
+        parser.add_argument(
+            '--token', help='Auth token sent as "Authorization: Token ..."'
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--threaded', action='store_true',
+            help='Start a thread per request like runserver does'
+        )
+
+    def handle(self, *args, **options):
+        server_class = ThreadPerRequestServer if options['threaded'] \
+            else WSGIServer
+        server = server_class(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        host, port = server.server_address
+        url = 'http://%s:%d%s' % (host, port, options['url'])
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = 'Token ' + options['token']
+
+        def fetch(_):
+            try:
+                with urlopen(Request(url, headers=headers)) as response:
+                    response.read()
+                    return response.status
+            except HTTPError as error:
+                return error.code
+
+        settings_dict = connections['default'].settings_dict
+        self.stdout.write('GET %s, CONN_MAX_AGE=%s, POOL=%s' % (
+            options['url'],
+            settings_dict['CONN_MAX_AGE'],
+            settings_dict.get('POOL'),
+        ))
+        # warm up: import, URL resolve 등 처음 한번만 드는 비용 제외
+        fetch(None)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            statuses = list(executor.map(fetch, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+
+        server.shutdown()
+        server.server_close()
+
+        failed = len([status for status in statuses if status != 200])
+        self.stdout.write(self.style.SUCCESS(
+            '%d requests in %.2fs: %.1f requests/sec (%d failed)' % (
+                len(statuses), elapsed, len(statuses) / elapsed, failed
+            )
+        ))
@@ -0,0 +1,104 @@
+# recipe 검색 방법별 속도 비교 command
+#
+# python manage.py benchmark_search user@example.com --terms curry "green thai"
+#
+# - icontains: title, tag/ingredient 이름 LIKE '%...%' 스캔 (index 못 탐)
+# - memory: recipe.search.InvertedIndexSearchBackend의 user index
+# term을 안 주면 user의 title에서 단어를 몇 개 골라서 사용
+
+import random
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.models import Recipe
+from recipe import search
+
+
+def icontains_search(user, term):
+    """ Return the ids of the user's recipes containing every word of term """
+    queryset = Recipe.objects.filter(user=user)
+    for word in search.tokenize(term):
+        queryset = queryset.filter(
+            Q(title__icontains=word) |
+            Q(tags__name__icontains=word) |
+            Q(ingredients__name__icontains=word)
+        )
+    return list(queryset.distinct().values_list('id', flat=True))
+
+
+class Command(BaseCommand):
+    """ Django command to compare recipe search backends """
+    help = 'Compare icontains scans with the in-memory inverted index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to search')
+        parser.add_argument('--terms', nargs='+', help='Search terms')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Times each term is searched'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('No user with email %s' % options['email'])
+
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        terms = options['terms'] or self.sample_terms(user)
+        if not terms:
+            raise CommandError('User %s has no recipes' % user.email)
+
+        backend = search.InvertedIndexSearchBackend()
+        start = time.perf_counter()
+        index = backend.get_index(user.pk)
+        build = time.perf_counter() - start
+        size = sum(
+            sys.getsizeof(posting) for posting in index.postings.values()
+        )
+        self.stdout.write(
+            'Index of %d recipes, %d tokens, %d KiB of postings, '
+            'built in %.1fms' % (
+                len(index.documents), len(index.postings), size // 1024,
+                build * 1000
+            )
+        )
+
+        for term in terms:
+            tokens = search.tokenize(term)
+            icontains = self.measure(
+                lambda: icontains_search(user, term), options['repeat']
+            )
+            memory = self.measure(
+                lambda: index.search(tokens), options['repeat']
+            )
+            # 부분 문자열 vs 단어 단위라 결과 수가 다를 수 있음
+            self.stdout.write(
+                '%-20s icontains %8.3fms (%d)  memory %8.3fms (%d)' % (
+                    term, icontains[0] * 1000, len(icontains[1]),
+                    memory[0] * 1000, len(memory[1])
+                )
+            )
+
+    def measure(self, func, repeat):
+        """ Return (average seconds, last result) of calling func """
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) / repeat, result
+
+    def sample_terms(self, user):
+        titles = Recipe.objects.filter(user=user).values_list(
+            'title', flat=True
+        )[:1000]
+        words = sorted({
+            word for title in titles for word in search.tokenize(title)
+            if len(word) > 2
+        })
+        random.seed(0)
+        return random.sample(words, min(5, len(words)))
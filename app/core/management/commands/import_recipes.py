@@ -0,0 +1,260 @@
+# user 한 명의 recipe를 NDJSON/CSV 파일에서 한번에 import하는 command
+# recipe export (GET /api/recipe/recipes/export/)와 같은 형식을 읽음
+#
+# python manage.py import_recipes user@example.com recipes.ndjson
+#
+# API로 하나씩 POST하면 recipe마다 serializer validation, INSERT,
+# M2M INSERT가 따로 나가서 수만 개면 몇 시간이 걸림
+# 여기서는 batch 단위로 bulk_create하고 through table은 Postgres COPY로 넣음
+# 전체가 transaction 하나라 중간에 실패하면 아무것도 남지 않음
+
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.counters import COUNTED, recount_recipes
+from core.models import Tag, Ingredient, Recipe
+from core.signals import bulk_changed
+
+RECIPE_FIELDS = ('title', 'time_minutes', 'price', 'link')
+# CSV에서 여러 이름을 한 칸에 넣을 때 구분자 (export와 동일)
+NAME_SEPARATOR = '|'
+
+
+def read_ndjson(stream):
+    """ Yield (line number, row dict) of a newline delimited JSON file """
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise CommandError('Line %d: %s' % (number, error))
+        if not isinstance(row, dict):
+            raise CommandError(
+                'Line %d: expected an object, got %s' % (
+                    number, type(row).__name__
+                )
+            )
+        yield number, row
+
+
+def read_csv(stream):
+    """ Yield (line number, row dict) of a CSV file with a header row """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        for name in ('tags', 'ingredients'):
+            value = row.get(name) or ''
+            row[name] = value.split(NAME_SEPARATOR) if value else []
+        # 따옴표 안에 줄바꿈이 있을 수 있어서 reader가 센 줄 번호 사용
+        yield reader.line_num, row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    """ Django command to bulk load recipes of a user from a file """
+    help = 'Import recipes of a user from an NDJSON or CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the owner')
+        parser.add_argument('path', help='NDJSON or CSV file')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='File format (default: guessed from the extension)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Recipes inserted per batch'
+        )
+
+    def handle(self, *args, **options):
+        # through table은 COPY로 넣고, link를 만들 recipe id는
+        # bulk_create의 RETURNING에서 받음. 둘 다 Postgres에서만 됨
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'import_recipes requires PostgreSQL, not %s'
+                % connection.vendor
+            )
+
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('No user with email %s' % options['email'])
+
+        file_format = options['format'] or \
+            os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                'Unknown format %r, use --format' % file_format
+            )
+
+        start = time.perf_counter()
+        with open(options['path'], newline='', encoding='utf-8') as stream:
+            with transaction.atomic():
+                counts = self.load(
+                    user, READERS[file_format](stream), options['batch_size']
+                )
+                # link 하나마다 +1 하지 않고 끝나고 user 것만 다시 셈
+                for model, (through, column) in COUNTED.items():
+                    recount_recipes(
+                        model.objects.filter(user=user), through, column
+                    )
+                # bulk_create, COPY는 model signal을 안 보내서 직접 알림
+                # (search_vector 계산도 같은 transaction 안에서)
+                bulk_changed.send(
+                    sender=Recipe, user=user, recipe_ids=self.recipe_ids
+                )
+                self.restamp(self.recipe_ids)
+        elapsed = time.perf_counter() - start
+
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %(recipes)d recipes, %(tags)d tags, %(ingredients)d '
+            'ingredients, %(links)d links' % counts +
+            ' in %.2fs: %.1f rows/sec' % (elapsed, rows / max(elapsed, 1e-9))
+        ))
+
+    def restamp(self, recipe_ids):
+        """ Set updated_at of the imported rows to the commit time """
+        # row마다 INSERT 때 시간이 들어가서 commit보다 몇 분 빠를 수 있음
+        # 그 사이에 /recipes/sync/를 부른 client의 token이 더 늦어서
+        # import된 것을 영영 못 받으니 commit 직전 시간으로 다시 씀
+        now = timezone.now()
+        Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=now)
+        # 새로 만든 tag/ingredient, recipe_count가 바뀐 것 모두 import된
+        # recipe에 link된 것
+        for model, (through, column) in COUNTED.items():
+            model.objects.filter(pk__in=through.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values(column)).update(updated_at=now)
+
+    def load(self, user, rows, batch_size):
+        """ Insert every row in batches, return the inserted counts """
+        counts = {'recipes': 0, 'tags': 0, 'ingredients': 0, 'links': 0}
+        self.recipe_ids = []
+        # 이름 -> id. 같은 이름이 여러 개면 먼저 만든 것을 사용
+        names = {
+            Tag: self.existing_names(Tag, user),
+            Ingredient: self.existing_names(Ingredient, user),
+        }
+
+        while True:
+            batch = [
+                self.parse(number, row)
+                for number, row in islice(rows, batch_size)
+            ]
+            if not batch:
+                return counts
+
+            counts['tags'] += self.create_missing(
+                Tag, user, names[Tag],
+                (name for _, tags, _ in batch for name in tags)
+            )
+            counts['ingredients'] += self.create_missing(
+                Ingredient, user, names[Ingredient],
+                (name for _, _, ingredients in batch for name in ingredients)
+            )
+            # Postgres는 bulk_create가 RETURNING으로 id를 채워줌
+            recipes = Recipe.objects.bulk_create(
+                [Recipe(user=user, **fields) for fields, _, _ in batch]
+            )
+            counts['recipes'] += len(recipes)
+            self.recipe_ids.extend(recipe.pk for recipe in recipes)
+
+            tag_links, ingredient_links = [], []
+            for recipe, (_, tags, ingredients) in zip(recipes, batch):
+                tag_links.extend(
+                    (recipe.pk, names[Tag][name]) for name in tags
+                )
+                ingredient_links.extend(
+                    (recipe.pk, names[Ingredient][name])
+                    for name in ingredients
+                )
+            counts['links'] += self.copy_links(Recipe.tags, tag_links)
+            counts['links'] += self.copy_links(
+                Recipe.ingredients, ingredient_links
+            )
+
+    def parse(self, number, row):
+        """ Return (recipe fields, tag names, ingredient names) of a row """
+        fields = {}
+        try:
+            for name in RECIPE_FIELDS:
+                field = Recipe._meta.get_field(name)
+                value = row.get(name)
+                if value is None and field.blank:
+                    value = ''
+                fields[name] = field.clean(value, None)
+        except ValidationError as error:
+            raise CommandError('Row %d, %s: %s' % (
+                number, name, ' '.join(error.messages)
+            ))
+
+        return fields, self.clean_names(number, row, 'tags', Tag), \
+            self.clean_names(number, row, 'ingredients', Ingredient)
+
+    def clean_names(self, number, row, key, model):
+        """ Return the stripped names of a row without duplicates """
+        value = row.get(key) or []
+        # "tags": "Vegan" 이면 글자마다 tag가 되니까 list만 받음
+        if not isinstance(value, list):
+            raise CommandError('Row %d, %s: expected a list' % (number, key))
+        max_length = model._meta.get_field('name').max_length
+        names = []
+        for name in value:
+            name = str(name).strip()
+            if len(name) > max_length:
+                raise CommandError(
+                    'Row %d, %s: %r is longer than %d characters' % (
+                        number, key, name[:20] + '...', max_length
+                    )
+                )
+            if name:
+                names.append(name)
+        # 순서는 유지, 같은 이름을 두 번 link하면 unique 제약에 걸림
+        return list(dict.fromkeys(names))
+
+    def existing_names(self, model, user):
+        ids = {}
+        queryset = model.objects.filter(user=user).order_by('id')
+        for pk, name in queryset.values_list('id', 'name').iterator():
+            ids.setdefault(name, pk)
+        return ids
+
+    def create_missing(self, model, user, ids, names):
+        """ Create the names not seen yet, return the created count """
+        missing = dict.fromkeys(name for name in names if name not in ids)
+        created = model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing]
+        )
+        for obj in created:
+            ids[obj.name] = obj.pk
+        return len(created)
+
+    def copy_links(self, descriptor, links):
+        """ Insert (recipe id, tag/ingredient id) rows into a through table """
+        if not links:
+            return 0
+        through = descriptor.through
+        # recipe_id, tag_id (또는 ingredient_id)
+        recipe_column = descriptor.field.m2m_column_name()
+        target_column = descriptor.field.m2m_reverse_name()
+        # INSERT 대신 COPY: row마다 parse/plan을 하지 않아서 훨씬 빠름
+        buffer = io.StringIO(''.join('%d\t%d\n' % link for link in links))
+        with connection.cursor() as cursor:
+            cursor.copy_from(
+                buffer, through._meta.db_table,
+                columns=(recipe_column, target_column)
+            )
+        return len(links)
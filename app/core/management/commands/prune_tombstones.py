@@ -0,0 +1,33 @@
+# 오래된 삭제 기록(Tombstone) 정리
+#
+# python manage.py prune_tombstones
+#
+# Tombstone은 /recipes/sync/가 삭제를 알려주려고 남기는 것이라 계속 쌓임
+# RECIPE_SYNC['TOMBSTONE_RETENTION_DAYS']보다 오래된 것을 지움
+# (since가 그보다 오래된 sync는 어차피 410으로 전체 sync를 받음)
+# cron 등으로 하루 한번 정도 실행
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """ Django command to delete tombstones past the sync retention """
+    help = 'Delete tombstones older than the sync retention window.'
+
+    def handle(self, *args, **options):
+        # sync view와 같은 기간이어야 delta sync가 삭제를 놓치지 않음
+        days = settings.RECIPE_SYNC['TOMBSTONE_RETENTION_DAYS']
+
+        # (user, deleted_at) index는 user가 앞이라 못 씀. 하루 한번이라 괜찮음
+        deleted, _ = Tombstone.objects.filter(
+            deleted_at__lt=timezone.now() - timedelta(days=days)
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            'Deleted %d tombstones older than %d days' % (deleted, days)
+        ))
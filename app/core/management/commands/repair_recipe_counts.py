@@ -0,0 +1,47 @@
+# Tag.recipe_count, Ingredient.recipe_count를 through table로 다시 계산
+#
+# python manage.py repair_recipe_counts [--user user@example.com]
+#
+# 평소에는 signal과 bulk API가 F()로 맞춰두지만, DB를 직접 고쳤거나
+# signal 없이 through table을 바꾼 경우 어긋날 수 있음
+# 틀린 row만 model별 UPDATE 한번으로 고침
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.counters import COUNTED, recount_recipes, wrong_recipe_counts
+from core.signals import bulk_changed
+
+
+class Command(BaseCommand):
+    """ Django command to recompute the recipe counts of tags/ingredients """
+    help = 'Recompute recipe_count of tags and ingredients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email of the only user to repair')
+
+    def handle(self, *args, **options):
+        filters = {}
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError('No user with email %s' % options['user'])
+            filters['user'] = user
+
+        with transaction.atomic():
+            for model, (through, column) in COUNTED.items():
+                queryset = model.objects.filter(**filters)
+                # 고칠 user들의 cache된 response를 무효화하기 위해 먼저 조회
+                user_ids = set(wrong_recipe_counts(
+                    queryset, through, column
+                ).values_list('user_id', flat=True))
+                fixed = recount_recipes(queryset, through, column)
+                for user in get_user_model().objects.filter(pk__in=user_ids):
+                    bulk_changed.send(sender=model, user=user)
+                self.stdout.write('Fixed %d %s' % (
+                    fixed, model._meta.verbose_name_plural
+                ))
+
+        self.stdout.write(self.style.SUCCESS('Recipe counts repaired'))
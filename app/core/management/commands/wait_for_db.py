@@ -2,33 +2,91 @@
 # 그리고 나서 docker-compose에 내가 custom한 wait_for_db command 쓰겠다고
 # command 섹션에 추가해야 함
 
+import random
 import time
 # DB 커넥션이 available한지 테스트 가능하게 해주는 모듈
 from django.db import connections
 # DB가 unavailable하면 던지는 에러
 from django.db.utils import OperationalError
 # custom command를 만들기 위한 BaseCommand
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
 
 class Command(BaseCommand):
     """ Django command to pause execution until database is ready """
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--databases', nargs='+', default=['default'],
+            help='Database aliases to wait for (default: default)'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0.5,
+            help='First retry delay in seconds, doubled after each failure'
+        )
+        parser.add_argument(
+            '--max-interval', type=float, default=5,
+            help='Upper bound for the retry delay in seconds'
+        )
+
     # handleFunctiond은 이 management command를 실행할때마다 실행됨
     def handle(self, *args, **options):
-        # stdout.즉 print함수랑 똑같음
-        self.stdout.write('Waiting for database')
-        db_conn = None
-        while not db_conn:
-            try:
-                # get the database with keyword 'default' from settings.py
-                db_conn = connections['default']
-                """ connections['default'] calls the __getitem__ method 
-                in ConnectionHandler class """
-            except OperationalError:
-                self.stdout.write('Database unavailable waiting one second...')
-                # 프로덕션일땐 이런거 없지. 테스트하니까 그런 것
-                time.sleep(1)
+        start = time.monotonic()
+        deadline = start + options['timeout']
+        for alias in options['databases']:
+            # stdout.즉 print함수랑 똑같음
+            self.stdout.write('Waiting for database %s' % alias)
+            attempts = self.wait_for(alias, deadline, options)
+            # 녹색 메시지, startup latency 추적용으로 걸린 시간 출력
+            self.stdout.write(self.style.SUCCESS(
+                'Database %s available after %.2fs (%d attempts)!' % (
+                    alias, time.monotonic() - start, attempts
+                )
+            ))
 
-        # 녹색 메시지
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+    def wait_for(self, alias, deadline, options):
+        """ Probe the database until it answers, return the attempt count """
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.probe(alias)
+                return attempts
+            except OperationalError as error:
+                # exponential backoff + jitter
+                # 여러 container가 동시에 재시도해서 DB를 두드리지 않게
+                delay = min(
+                    options['max_interval'],
+                    options['interval'] * 2 ** (attempts - 1)
+                )
+                delay = random.uniform(delay / 2, delay)
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(
+                        'Database %s unavailable after %d attempts: %s' % (
+                            alias, attempts, error
+                        )
+                    )
+                self.stdout.write(
+                    'Database %s unavailable, waiting %.2f seconds...' % (
+                        alias, delay
+                    )
+                )
+                time.sleep(delay)
 
+    def probe(self, alias):
+        """ Open a real connection and run a cheap query """
+        # connections['default']만으로는 socket을 열지 않아서
+        # DB가 안 떠있어도 바로 통과해버림
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except OperationalError:
+            # 반쯤 열린 connection을 정리하고 다음 시도에서 새로 연결
+            connection.close()
+            raise
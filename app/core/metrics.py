@@ -0,0 +1,347 @@
+# Prometheus text format으로 내보내는 process 안의 metric registry
+#
+# 값은 thread마다 따로 가진 shard에 쌓음. shard마다 쓰는 thread가 하나라
+# inc/observe에 lock이 없고, /metrics를 읽을 때만 모든 shard를 더함
+#
+# worker process가 여러개면 settings.METRICS['MULTIPROCESS_DIR']를 설정.
+# shard가 메모리 dict 대신 그 directory의 mmap file이 되고 /metrics는
+# directory의 모든 file을 더해서 응답 (어느 worker가 받아도 같은 값)
+# directory는 server를 띄울 때마다 비워야 함 (죽은 process의 값도 남아있음)
+
+import bisect
+import glob
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# request latency(초) 기본 bucket
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace(
+        '"', r'\"'
+    )
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class MemoryShard:
+    """ Values written by one thread, kept in a dict """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.owner = None
+        self.values = {}
+
+    def inc(self, key, amount):
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def items(self):
+        # dict.copy()는 GIL 안에서 한번에 끝나서 쓰는 thread와 겹쳐도 안전
+        return self.values.copy().items()
+
+
+class MmapShard:
+    """ Values written by one thread, kept in a file other processes read
+
+    Layout: 8 byte header holding the used size, then entries of
+    (int32 key length, utf-8 key padded to 8 bytes, float64 value).
+    The used size is written after the entry, so a reader never sees a
+    half written entry.
+    """
+    initial_size = 64 * 1024
+
+    def __init__(self, path):
+        self.pid = os.getpid()
+        self.owner = None
+        self.path = path
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(self.initial_size)
+        self._map()
+        # 같은 pid, thread ident로 다시 열린 file이면 이어서 씀
+        self._positions = {
+            key: position for key, position, _ in read_entries(self._mmap)
+        }
+        self._used = max(struct.unpack_from('q', self._mmap, 0)[0], 8)
+
+    def _map(self):
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+
+    def _add(self, key):
+        encoded = key.encode('utf-8')
+        padded = len(encoded) + (-(4 + len(encoded)) % 8)
+        size = 4 + padded + 8
+        if self._used + size > len(self._mmap):
+            new_size = max(len(self._mmap) * 2, self._used + size)
+            self._mmap.close()
+            self._file.truncate(new_size)
+            self._map()
+        struct.pack_into(
+            'i%dsd' % padded, self._mmap, self._used,
+            len(encoded), encoded, 0.0
+        )
+        position = self._used + 4 + padded
+        self._used += size
+        struct.pack_into('q', self._mmap, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def inc(self, key, amount):
+        position = self._positions.get(key)
+        if position is None:
+            position = self._add(key)
+        value = struct.unpack_from('d', self._mmap, position)[0]
+        struct.pack_into('d', self._mmap, position, value + amount)
+
+    def items(self):
+        return [(key, value) for key, _, value in read_entries(self._mmap)]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+def read_entries(data):
+    """ Yield (key, value position, value) of a shard file's bytes """
+    used = struct.unpack_from('q', data, 0)[0]
+    offset = 8
+    while offset < used:
+        length = struct.unpack_from('i', data, offset)[0]
+        key = bytes(data[offset + 4:offset + 4 + length]).decode('utf-8')
+        position = offset + 4 + length + (-(4 + length) % 8)
+        yield key, position, struct.unpack_from('d', data, position)[0]
+        offset = position + 8
+
+
+class Metric:
+    """ Base of the metric types, registered on creation """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(),
+                 registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+        # label 값 tuple -> label text. 매번 escape/join 하지 않게
+        self._label_texts = {}
+
+    def _labels(self, labels):
+        try:
+            values = tuple([labels[name] for name in self.labelnames])
+        except KeyError:
+            values = None
+        if values is None or len(labels) != len(self.labelnames):
+            raise ValueError('%s expects labels %s, got %s' % (
+                self.name, self.labelnames, tuple(labels)
+            ))
+        text = self._label_texts.get(values)
+        if text is None:
+            text = self._label_texts[values] = ','.join(
+                '%s="%s"' % (name, _escape(value))
+                for name, value in zip(self.labelnames, values)
+            )
+        return text
+
+    def _key(self, suffix, labels):
+        # shard key: "<metric>\t<sample suffix>\t<label text>"
+        return '%s\t%s\t%s' % (self.name, suffix, labels)
+
+    def samples(self, values):
+        """ Yield (sample name, label text, value) from summed values """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """ Monotonic counter; name it with a _total suffix """
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.shard().inc(self._key('', self._labels(labels)), amount)
+
+    def samples(self, values):
+        for (suffix, labels), value in sorted(values.items()):
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    """ Fixed bucket histogram with _bucket, _sum and _count samples """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        text = self._labels(labels)
+        shard = self.registry.shard()
+        # bucket은 누적하지 않고 해당 bucket 하나만 +1, 읽을 때 누적
+        index = bisect.bisect_left(self.buckets, value)
+        shard.inc(self._key('_bucket', '%s\t%d' % (text, index)), 1)
+        shard.inc(self._key('_sum', text), value)
+        shard.inc(self._key('_count', text), 1)
+
+    def samples(self, values):
+        label_sets = sorted(
+            labels for suffix, labels in values if suffix == '_count'
+        )
+        bounds = self.buckets + (float('inf'),)
+        for labels in label_sets:
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += values.get(
+                    ('_bucket', '%s\t%d' % (labels, index)), 0
+                )
+                le = 'le="%s"' % _format_value(bound)
+                yield (self.name + '_bucket',
+                       '%s,%s' % (labels, le) if labels else le, cumulative)
+            yield self.name + '_sum', labels, values[('_sum', labels)]
+            yield self.name + '_count', labels, values[('_count', labels)]
+
+
+class MetricsRegistry:
+    """ Metrics of the process and the per-thread shards of their values """
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # reset()하면 바뀜. thread들이 들고 있던 옛 shard를 버리게 함
+        self._generation = 0
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError('Duplicate metric %s' % metric.name)
+            self.metrics[metric.name] = metric
+
+    @property
+    def directory(self):
+        return settings.METRICS.get('MULTIPROCESS_DIR') or None
+
+    def shard(self):
+        """ Return the shard of the current thread """
+        shard = getattr(self._local, 'shard', None)
+        # fork된 child는 부모 thread의 shard를 물려받으니 pid도 확인
+        if (shard is None or shard.pid != os.getpid()
+                or self._local.generation != self._generation):
+            shard = self._new_shard()
+        return shard
+
+    def _new_shard(self):
+        pid = os.getpid()
+        with self._lock:
+            # fork 전에 부모가 만든 shard는 버림 (부모 것이라 쓰면 안 됨)
+            self._shards = [s for s in self._shards if s.pid == pid]
+            # request마다 thread를 만드는 server에서 shard가 계속 늘지 않게
+            # 끝난 thread의 shard를 이어받음. 쓰는 thread는 여전히 하나
+            shard = next((
+                s for s in self._shards if not s.owner.is_alive()
+            ), None)
+            if shard is None:
+                shard = self._open_shard()
+                self._shards.append(shard)
+            shard.owner = threading.current_thread()
+            self._local.shard = shard
+            self._local.generation = self._generation
+        return shard
+
+    def _open_shard(self):
+        directory = self.directory
+        if directory:
+            return MmapShard(os.path.join(directory, '%d_%d.db' % (
+                os.getpid(), threading.get_ident()
+            )))
+        return MemoryShard()
+
+    def _shard_items(self):
+        directory = self.directory
+        if not directory:
+            with self._lock:
+                shards = list(self._shards)
+            for shard in shards:
+                yield from shard.items()
+            return
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            with open(path, 'rb') as shard_file:
+                data = shard_file.read()
+            if len(data) >= 8:
+                for key, _, value in read_entries(data):
+                    yield key, value
+
+    def collect(self):
+        """ Return {metric name: {(suffix, labels): summed value}} """
+        values = defaultdict(lambda: defaultdict(float))
+        for key, value in self._shard_items():
+            name, suffix, labels = key.split('\t', 2)
+            values[name][(suffix, labels)] += value
+        return values
+
+    def exposition(self):
+        """ Return every metric in the Prometheus text format """
+        values = self.collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append('# HELP %s %s' % (metric.name, metric.documentation))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            for name, labels, value in metric.samples(values[metric.name]):
+                lines.append('%s%s %s' % (
+                    name, '{%s}' % labels if labels else '',
+                    _format_value(value)
+                ))
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """ Forget every value of this process, e.g. between tests """
+        with self._lock:
+            for shard in self._shards:
+                if isinstance(shard, MmapShard):
+                    shard.close()
+            self._shards = []
+            self._generation += 1
+
+
+REGISTRY = MetricsRegistry()
+
+# view: 'RecipeViewSet.list', 'CreateTokenView' 처럼 class.action
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by view, method and status',
+    ('view', 'method', 'status'),
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by view', ('view',),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries', 'SQL queries per request by view', ('view',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_DURATION = Counter(
+    'db_query_duration_seconds_total', 'Time spent in SQL by view',
+    ('view',),
+)
+# cache: 'response'(recipe API response cache), 'token'(auth token cache)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result',
+    ('cache', 'result'),
+)
+# reason: 'token'(잘못된 token), 'credentials'(로그인 실패)
+AUTH_FAILURES = Counter(
+    'auth_failures_total', 'Failed authentications by reason', ('reason',),
+)
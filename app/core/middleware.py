@@ -0,0 +1,233 @@
+# request 측정 middleware
+#
+# RequestTimingMiddleware: request별 SQL query 수, SQL 시간, serialize 시간,
+# render 시간
+# - serialize: serializer.data (TimedSerializerMixin을 쓴 serializer),
+#   그 안에서 나간 SQL 시간은 빼고 db에만 셈
+# - render: view가 끝난 뒤 DRF renderer의 JSON encoding
+# settings.py의 REQUEST_TIMING으로 설정. SAMPLE_RATE 비율의 request만 측정하고
+# 나머지는 random() 한번 말고는 아무것도 안 함
+# 측정한 request는
+# - Server-Timing header (browser devtools의 Timing tab에 보임)
+# - core.timing logger에 key=value 한 줄
+# 로 남김
+#
+# MetricsMiddleware: 모든 request의 latency, query 수를 core.metrics에 기록
+
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics
+
+logger = logging.getLogger('core.timing')
+
+# 측정 중인 request의 RequestTiming (serializer에서 찾음)
+_local = threading.local()
+
+
+class QueryTimer:
+    """ connection.execute_wrapper() that counts and times the queries """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestTiming:
+    """ Timings of one sampled request, all durations in seconds """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.queries = QueryTimer()
+        self.serialize = 0.0
+        self._serialize_depth = 0
+        self.render = 0.0
+        self._render_started = None
+
+    @contextmanager
+    def serializing(self):
+        """ Add the time spent in the block, minus its SQL, to serialize """
+        # nested serializer의 .data는 바깥 것에 포함되니 한번만 셈
+        self._serialize_depth += 1
+        start = time.perf_counter()
+        sql_start = self.queries.duration
+        try:
+            yield
+        finally:
+            self._serialize_depth -= 1
+            if not self._serialize_depth:
+                self.serialize += time.perf_counter() - start - (
+                    self.queries.duration - sql_start
+                )
+
+    def render_started(self):
+        self._render_started = time.perf_counter()
+
+    def rendered(self, response):
+        # SimpleTemplateResponse의 post render callback
+        self.render += time.perf_counter() - self._render_started
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """ Return the Server-Timing header value, durations in ms """
+        return ', '.join([
+            'db;dur=%.1f;desc="%d queries"' % (
+                self.queries.duration * 1000, self.queries.count
+            ),
+            'serialize;dur=%.1f' % (self.serialize * 1000),
+            'render;dur=%.1f' % (self.render * 1000),
+            'total;dur=%.1f' % (self.total * 1000),
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries.count,
+            'db_ms': round(self.queries.duration * 1000, 2),
+            'serialize_ms': round(self.serialize * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+def is_sampled(config):
+    """ Return whether this request should be timed """
+    rate = config['SAMPLE_RATE'] if config['ENABLED'] else 0
+    # 1.0, 0이면 random()도 부르지 않음
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def current_timing():
+    """ Return the RequestTiming of the request being timed, or None """
+    return getattr(_local, 'timing', None)
+
+
+class TimedSerializerMixin:
+    """ Count serializer.data towards the serialize timing of the request """
+
+    @property
+    def data(self):
+        timing = current_timing()
+        if timing is None:
+            return super().data
+        with timing.serializing():
+            return super().data
+
+
+class RequestTimingMiddleware:
+    """ Time the SQL, serializers and rendering of a sample of requests """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.REQUEST_TIMING
+        if not is_sampled(config):
+            return self.get_response(request)
+
+        timing = request.timing = _local.timing = RequestTiming()
+        try:
+            with ExitStack() as stack:
+                # 다른 DB alias를 쓰는 query도 같이 셈
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.queries)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.timing = None
+        timing.finish()
+
+        if config['HEADER']:
+            response['Server-Timing'] = timing.server_timing()
+        self.log(request, response, timing)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Response는 view가 끝난 뒤 여기를 지나서 render됨
+        timing = getattr(request, 'timing', None)
+        if timing is not None:
+            timing.render_started()
+            response.add_post_render_callback(timing.rendered)
+        return response
+
+    def log(self, request, response, timing):
+        resolver_match = getattr(request, 'resolver_match', None)
+        values = dict(
+            timing.as_dict(),
+            method=request.method,
+            path=request.path,
+            view=resolver_match.view_name if resolver_match else '-',
+            status=response.status_code,
+        )
+        logger.info(
+            'method=%(method)s path=%(path)s view=%(view)s status=%(status)d '
+            'queries=%(queries)d db_ms=%(db_ms).2f '
+            'serialize_ms=%(serialize_ms).2f render_ms=%(render_ms).2f '
+            'total_ms=%(total_ms).2f', values, extra={'timing': values}
+        )
+
+
+def view_label(request):
+    """ Return 'ViewClass.action' of the resolved view, or 'unresolved' """
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        # 404는 path별로 label이 늘어나지 않게 하나로 묶음
+        return 'unresolved'
+    func = resolver_match.func
+    view_class = getattr(func, 'cls', None) or getattr(
+        func, 'view_class', None
+    )
+    if view_class is None:
+        return resolver_match.view_name
+    # ViewSet.as_view()는 method -> action mapping을 들고 있음
+    action = (getattr(func, 'actions', None) or {}).get(
+        request.method.lower()
+    )
+    if action is None:
+        return view_class.__name__
+    return '%s.%s' % (view_class.__name__, action)
+
+
+class MetricsMiddleware:
+    """ Record latency and SQL usage of every request in core.metrics """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS['ENABLED']:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        queries = QueryTimer()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        view = view_label(request)
+        metrics.REQUESTS.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        metrics.REQUEST_LATENCY.observe(duration, view=view)
+        metrics.REQUEST_QUERIES.observe(queries.count, view=view)
+        metrics.DB_DURATION.inc(queries.duration, view=view)
+        return response
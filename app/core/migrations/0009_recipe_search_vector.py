@@ -0,0 +1,96 @@
+# Generated by Django 2.1.15 on 2026-10-18 13:21
+
+from itertools import islice
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+# core.search.UPDATE_SEARCH_VECTORS_SQL의 이 시점 사본
+# migration은 나중에 core.search가 바뀌어도 그대로 돌아야 함
+UPDATE_SEARCH_VECTORS_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(tag.name, ' ')
+        FROM core_recipe_tags link
+        JOIN core_tag tag ON tag.id = link.tag_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM core_recipe_ingredients link
+        JOIN core_ingredient ingredient ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B')
+WHERE id = ANY(%(ids)s)
+'''
+
+
+def fill_search_vectors(apps, schema_editor):
+    """ Compute search_vector of the existing recipes in batches """
+    Recipe = apps.get_model('core', 'Recipe')
+    ids = Recipe.objects.values_list('id', flat=True).iterator()
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(islice(ids, 1000))
+            if not batch:
+                break
+            cursor.execute(UPDATE_SEARCH_VECTORS_SQL, {
+                'config': settings.RECIPE_SEARCH['CONFIG'],
+                'ids': batch,
+            })
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """ Enable pg_trgm for typo tolerant name search when it is available """
+    # extension이 없거나 권한이 없으면 trigram 없이 full text만 사용
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS core_tag_name_trgm_idx '
+            'ON core_tag USING gin (name gin_trgm_ops)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS core_ingredient_name_trgm_idx '
+            'ON core_ingredient USING gin (name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS core_tag_name_trgm_idx')
+        cursor.execute('DROP INDEX IF EXISTS core_ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sync_timestamps_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 2.1.15 on 2026-10-18 13:38
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.utils import timezone
+
+
+def fill_recipe_counts(apps, schema_editor):
+    """ Count the existing links of every tag and ingredient """
+    # core.counters 대신 historical model로 직접 셈
+    Recipe = apps.get_model('core', 'Recipe')
+    for name, field, column in (
+        ('Tag', 'tags', 'tag_id'),
+        ('Ingredient', 'ingredients', 'ingredient_id'),
+    ):
+        model = apps.get_model('core', name)
+        through = Recipe._meta.get_field(field).remote_field.through
+        links = through.objects.filter(
+            **{column: OuterRef('pk')}
+        ).order_by().values(column).annotate(count=Count('*'))
+        # link가 없는 것은 default 0 그대로
+        model.objects.filter(
+            pk__in=through.objects.values(column)
+        ).update(
+            recipe_count=Subquery(links.values('count')),
+            updated_at=timezone.now()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', '-name', 'id'], name='core_ingr_user_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', '-name', 'id'], name='core_tag_user_popular_idx'),
+        ),
+        migrations.RunPython(fill_recipe_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,130 @@
+# 0009_recipe_search_vector에 DB vendor 확인을 더한 것
+#
+# 0009는 GIN index, pg_trgm 등 Postgres에서만 되는 step이라 SQLite 등에서는
+# migrate가 실패함. 이미 적용된 0009는 고치지 않고 이 migration이 대신함
+# (replaces). 0009가 적용된 DB는 그대로, 새 DB는 이 migration을 실행
+# Postgres가 아니면 search_vector column만 만들고 나머지는 건너뜀
+# (recipe.search의 in-memory index 사용)
+
+from itertools import islice
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, transaction
+from django.db.utils import DatabaseError
+
+# core.search.UPDATE_SEARCH_VECTORS_SQL의 이 시점 사본
+# migration은 나중에 core.search가 바뀌어도 그대로 돌아야 함
+UPDATE_SEARCH_VECTORS_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(tag.name, ' ')
+        FROM core_recipe_tags link
+        JOIN core_tag tag ON tag.id = link.tag_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM core_recipe_ingredients link
+        JOIN core_ingredient ingredient ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B')
+WHERE id = ANY(%(ids)s)
+'''
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """ AddIndex that only touches the database on PostgreSQL """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+def fill_search_vectors(apps, schema_editor):
+    """ Compute search_vector of the existing recipes in batches """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    ids = Recipe.objects.values_list('id', flat=True).iterator()
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            batch = list(islice(ids, 1000))
+            if not batch:
+                break
+            cursor.execute(UPDATE_SEARCH_VECTORS_SQL, {
+                'config': settings.RECIPE_SEARCH['CONFIG'],
+                'ids': batch,
+            })
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """ Enable pg_trgm for typo tolerant name search when it is available """
+    # extension이 없거나 권한이 없으면 trigram 없이 full text만 사용
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+        try:
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            return
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS core_tag_name_trgm_idx '
+            'ON core_tag USING gin (name gin_trgm_ops)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS core_ingredient_name_trgm_idx '
+            'ON core_ingredient USING gin (name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP INDEX IF EXISTS core_tag_name_trgm_idx')
+        cursor.execute('DROP INDEX IF EXISTS core_ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    dependencies = [
+        ('core', '0008_sync_timestamps_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        AddPostgresIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_idx'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 # settings.py에서 setting을 가져오는 recommmended way
 from django.conf import settings
@@ -58,9 +60,25 @@ class User(AbstractBaseUser, PermissionsMixin):
     # username_field의 default값을 username을 email로 바꿈
     USERNAME_FIELD = 'email'
 
+
+class RecipeCountMixin:
+    """ Keep save() from overwriting the maintained recipe_count """
+
+    def save(self, *args, **kwargs):
+        # recipe_count는 core.counters가 F()로만 바꿈. 메모리에 있는
+        # 옛 값으로 덮어쓰지 않도록 UPDATE에서 뺌
+        if not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'recipe_count'
+            ]
+        super().save(*args, **kwargs)
+
+
 """ 새 모델 만들때마다 migration 커맨드 돌리고
 admin.py에 model register 필요 """
-class Tag(models.Model):
+class Tag(RecipeCountMixin, models.Model):
     """ Tag to be used for a recipe """
     name = models.CharField(max_length=255)
     # user foriegn key를 assign할건데
@@ -74,19 +92,60 @@ class Tag(models.Model):
         # CASCADE: Tag랑 같이 지워진다
         on_delete = models.CASCADE
     )
+    # delta sync에서 바뀐 것만 보내기 위해
+    updated_at = models.DateTimeField(auto_now=True)
+    # 이 tag를 쓰는 recipe 수. core.signals가 link 변경 때 F()로 갱신
+    # 틀어지면 repair_recipe_counts command로 다시 계산
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        # BaseRecipeAttrViewSet: user로 filter, -name, id로 order
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_tag_user_name_idx'
+            ),
+            # ?ordering=popular
+            models.Index(
+                fields=['user', '-recipe_count', '-name', 'id'],
+                name='core_tag_user_popular_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_tag_user_updated_idx'
+            ),
+        ]
 
     # Optional
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(RecipeCountMixin, models.Model):
     """ Ingredient to be used in a recipe """
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'],
+                name='core_ingredient_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', '-recipe_count', '-name', 'id'],
+                name='core_ingr_user_popular_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_ingr_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -108,5 +167,85 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
 
+    # ETag/Last-Modified용. M2M이 바뀌어도 core.signals에서 updated_at을 갱신
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # ?search= 용 full text. title(A) + tag, ingredient 이름(B)
+    # core.search.update_search_vectors가 save, M2M 변경 때 다시 계산
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # RecipeViewSet: user로 filter, id로 order
+        # M2M through table의 (tag_id, recipe_id) 역방향 index는
+        # auto-created model이라 migration 0006에서 RunSQL로 만듦
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+            # delta sync: updated_since 이후에 바뀐 recipe
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='core_recipe_user_updated_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='core_recipe_search_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class Tombstone(models.Model):
+    """ Record of a deleted tag, ingredient or recipe for delta sync """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    # 지워진 object는 없으니 FK 대신 id만 남김
+    # core.signals에서 post_delete 때 만들어짐
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete = models.CASCADE
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted_at'],
+                name='core_tombstone_user_del_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '%s %s' % (self.kind, self.object_id)
+
+
+class SlowQuery(models.Model):
+    """ A slow statement of the recipe API and its EXPLAIN output """
+    # core.slowqueries가 background thread에서 만들고, 최근 것만 남김
+    created_at = models.DateTimeField(auto_now_add=True)
+    # 'RecipeViewSet.list' 처럼 class.action
+    view = models.CharField(max_length=255)
+    duration_ms = models.FloatField()
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    plan = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name_plural = 'slow queries'
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return '%s %.0fms' % (self.view, self.duration_ms)
@@ -0,0 +1,137 @@
+# API request sampling profiler
+#
+# ProfilingMixin을 쓴 view는 PROFILING['SAMPLE_RATE'] 비율의 request 또는
+# PROFILING['HEADER'] header에 PROFILING['SECRET'] 값을 보낸 request를
+# profile 함 (SECRET이 없으면 header로는 못 켬)
+# profile 하는 동안 다른 thread가 INTERVAL_MS마다 sys._current_frames()로
+# request thread의 stack을 읽어서 셈. 함수마다 hook을 거는 cProfile과 달리
+# request thread는 거의 느려지지 않음
+#
+# 결과는 OUTPUT_DIR에 collapsed stack ("a;b;c 12") file로 남김
+# 최근 MAX_FILES개만 남기고 오래된 것부터 지움
+#   flamegraph.pl profiles/*.folded > flame.svg  (speedscope에도 바로 열림)
+
+import glob
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+# 같은 ms에 끝난 request끼리 file 이름이 겹치지 않게
+_sequence = itertools.count()
+
+
+def frame_name(frame):
+    """ Return 'module:function' of the frame """
+    return '%s:%s' % (
+        frame.f_globals.get('__name__', '?'), frame.f_code.co_name
+    )
+
+
+class StackSampler:
+    """ Count the stacks of one thread from a background thread """
+
+    def __init__(self, interval):
+        # 초
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """ Sample the calling thread, from the caller's frame down """
+        self._target = threading.get_ident()
+        # 이 frame보다 바깥(WSGI server 등)은 매번 같으니 잘라냄
+        self._base = sys._getframe(1)
+        self._thread = threading.Thread(
+            target=self._run, name='stack-sampler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._base = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                return
+            self.stacks[self._collapse(frame)] += 1
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None:
+            names.append(frame_name(frame))
+            if frame is self._base:
+                break
+            frame = frame.f_back
+        # root -> leaf 순서
+        return ';'.join(reversed(names))
+
+    def write(self, path):
+        """ Write the collapsed stacks, one 'frame;frame count' per line """
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write('%s %d\n' % (stack, count))
+
+
+def is_profiled(request, config):
+    """ Return whether the request should be profiled """
+    if not config['ENABLED']:
+        return False
+    header, secret = config['HEADER'], config['SECRET']
+    if header and secret:
+        # 아무나 profile을 켜서 disk를 채우지 못하게 secret이 맞아야 함
+        value = request.META.get('HTTP_' + header.upper().replace('-', '_'))
+        if value and constant_time_compare(value, secret):
+            return True
+    rate = config['SAMPLE_RATE']
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class ProfilingMixin:
+    """ Profile a sample of the view's requests into collapsed stack files """
+
+    def dispatch(self, request, *args, **kwargs):
+        config = settings.PROFILING
+        if not is_profiled(request, config):
+            return super().dispatch(request, *args, **kwargs)
+
+        sampler = StackSampler(config['INTERVAL_MS'] / 1000)
+        sampler.start()
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+        finally:
+            sampler.stop()
+
+        action = getattr(self, 'action', None) or request.method.lower()
+        os.makedirs(config['OUTPUT_DIR'], exist_ok=True)
+        name = '%s.%s-%d-%d-%d.folded' % (
+            self.__class__.__name__, action, int(time.time() * 1000),
+            os.getpid(), next(_sequence)
+        )
+        sampler.write(os.path.join(config['OUTPUT_DIR'], name))
+        prune_profiles(config['OUTPUT_DIR'], config['MAX_FILES'])
+        return response
+
+
+def prune_profiles(directory, max_files):
+    """ Delete the oldest profile files beyond max_files """
+    paths = glob.glob(os.path.join(directory, '*.folded'))
+    if len(paths) <= max_files:
+        return
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:len(paths) - max_files]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # 다른 worker가 먼저 지움
+            pass
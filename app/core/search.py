@@ -0,0 +1,74 @@
+# Recipe.search_vector 관리와 Postgres 검색 기능 확인
+#
+# search_vector = title(weight A) + tag, ingredient 이름(weight B)
+# 이름은 다른 table에 있어서 generated column이나 SearchVector('tags__name')
+# 으로는 만들 수 없음 -> UPDATE 한번에 subquery로 이름을 모아서 계산
+# core.signals에서 recipe save, M2M 변경, tag/ingredient 이름 변경 때 부름
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+
+# 검색 대상(title, tag/ingredient 이름)이 바뀐 recipe들. DB 밖에 index를
+# 두는 search backend(recipe.search)가 받아서 갱신. SQLite에서도 보냄
+search_documents_changed = Signal(providing_args=['recipe_ids'])
+
+UPDATE_SEARCH_VECTORS_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(tag.name, ' ')
+        FROM core_recipe_tags link
+        JOIN core_tag tag ON tag.id = link.tag_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM core_recipe_ingredients link
+        JOIN core_ingredient ingredient ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = core_recipe.id
+    ), '')), 'B')
+WHERE id = ANY(%(ids)s)
+'''
+
+# connection alias -> pg_trgm 설치 여부
+_trigram_available = {}
+
+
+def search_config():
+    return settings.RECIPE_SEARCH['CONFIG']
+
+
+def full_text_available():
+    """ Return whether the database supports the search_vector column """
+    return connection.vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids):
+    """ Recompute search_vector of the recipes with one UPDATE """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    search_documents_changed.send(sender=None, recipe_ids=recipe_ids)
+    if not full_text_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(UPDATE_SEARCH_VECTORS_SQL, {
+            'config': search_config(),
+            'ids': recipe_ids,
+        })
+
+
+def trigram_available():
+    """ Return whether the pg_trgm extension is installed """
+    if not full_text_available():
+        return False
+    if connection.alias not in _trigram_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_available[connection.alias] = \
+                cursor.fetchone() is not None
+
+    return _trigram_available[connection.alias]
@@ -0,0 +1,225 @@
+# core model들의 signal receiver 모음
+# CoreConfig.ready()에서 import 되면서 연결된다
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.core.signals import setting_changed
+from django.db.models.signals import (
+    post_save, post_delete, pre_delete, m2m_changed
+)
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import authentication, metrics, search
+from core.counters import COUNTED, adjust_recipe_counts
+from core.models import Tag, Ingredient, Recipe, Tombstone
+
+# bulk_create, COPY 처럼 model signal 없이 user의 data를 한번에 바꿨을 때
+# 보내는 signal (예: import_recipes command). cache 등은 이걸 받아서 갱신
+# recipe_ids: 내용이 바뀐 recipe들 (있으면 search_vector를 다시 계산)
+bulk_changed = Signal(providing_args=['user', 'recipe_ids'])
+
+
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """ Drop a deleted or changed token from the auth cache """
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    """ Drop the user's tokens when the user changes (e.g. deactivated) """
+    # 새 user는 아직 token이 없음
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        authentication.invalidate_token(key)
+
+
+@receiver(setting_changed)
+def reset_token_cache(setting, **kwargs):
+    """ Rebuild the token cache when its settings change in tests """
+    if setting == 'TOKEN_AUTH_CACHE':
+        authentication.reset_token_cache()
+
+
+@receiver(setting_changed)
+def reset_metrics(setting, **kwargs):
+    """ Start over with empty shards when the metrics settings change """
+    if setting == 'METRICS':
+        metrics.REGISTRY.reset()
+
+
+@receiver(user_login_failed)
+def count_login_failure(sender, credentials, **kwargs):
+    """ Count failed email/password logins, e.g. POST /api/user/token/ """
+    metrics.AUTH_FAILURES.inc(reason='credentials')
+
+
+def touch_recipes(recipe_ids):
+    """ Bump updated_at and search_vector of the recipes, no post_save """
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now()
+        )
+        search.update_search_vectors(recipe_ids)
+
+
+def _linked_recipe_ids(instance):
+    """ Return the ids of the recipes a tag or ingredient is linked to """
+    return list(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """ Treat adding/removing tags or ingredients as a recipe change """
+    if not reverse:
+        # recipe.tags.add(...): instance가 Recipe
+        if action.startswith('post_'):
+            instance.updated_at = timezone.now()
+            touch_recipes([instance.pk])
+        return
+
+    # tag.recipe_set.add(...): instance가 Tag/Ingredient, pk_set이 recipe id
+    if action == 'pre_clear':
+        # clear는 post_clear에서 pk_set이 None이라 미리 기억해둠
+        instance._cleared_recipe_ids = _linked_recipe_ids(instance)
+    elif action == 'post_clear':
+        touch_recipes(getattr(instance, '_cleared_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_rename(sender, instance, created, **kwargs):
+    """ Recipe details embed the names, so a rename changes the recipes """
+    if not created:
+        touch_recipes(_linked_recipe_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_on_delete(sender, instance, **kwargs):
+    """ Remember the recipes a deleted tag or ingredient was linked to """
+    # post_delete에서는 through table row가 이미 cascade로 지워져 있음
+    instance._linked_recipe_ids = _linked_recipe_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def touch_recipes_on_delete(sender, instance, **kwargs):
+    """ Deleting a tag or ingredient unlinks it from its recipes """
+    # cascade로 지워져서 m2m_changed가 안 옴. 이름이 빠진 뒤에 search 갱신
+    touch_recipes(getattr(instance, '_linked_recipe_ids', []))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """ Recompute the search vector after the title may have changed """
+    search.update_search_vectors([instance.pk])
+
+
+@receiver(bulk_changed)
+def update_bulk_changed_search_vectors(sender, recipe_ids=None, **kwargs):
+    """ bulk_create and UPDATE skip post_save, refresh the given recipes """
+    if recipe_ids:
+        search.update_search_vectors(recipe_ids)
+
+
+# through table -> (recipe_count를 세는 model, FK column)
+COUNTED_LINKS = {
+    through: (model, column) for model, (through, column) in COUNTED.items()
+}
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_recipes_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """ Keep Tag/Ingredient.recipe_count equal to their number of links """
+    model, column = COUNTED_LINKS[sender]
+    if not reverse:
+        # recipe.tags.add(...): pk_set이 tag id
+        links = sender.objects.filter(recipe_id=instance.pk)
+        if action == 'pre_remove':
+            # remove()는 link가 없던 id도 pk_set에 넣어서 보냄
+            instance._uncounted_ids = list(links.filter(
+                **{column + '__in': pk_set}
+            ).values_list(column, flat=True))
+        elif action == 'pre_clear':
+            instance._uncounted_ids = list(
+                links.values_list(column, flat=True)
+            )
+        elif action in ('post_remove', 'post_clear'):
+            adjust_recipe_counts(model, dict.fromkeys(
+                getattr(instance, '_uncounted_ids', []), -1
+            ))
+        elif action == 'post_add':
+            # add()는 이미 있던 link를 pk_set에서 뺌
+            adjust_recipe_counts(model, dict.fromkeys(pk_set, 1))
+        return
+
+    # tag.recipe_set.add(...): instance가 Tag/Ingredient, pk_set이 recipe id
+    if action == 'pre_remove':
+        instance._uncounted = sender.objects.filter(
+            **{column: instance.pk, 'recipe_id__in': pk_set}
+        ).count()
+    elif action == 'post_remove':
+        adjust_recipe_counts(
+            model, {instance.pk: -getattr(instance, '_uncounted', 0)}
+        )
+    elif action == 'post_clear':
+        model.objects.filter(pk=instance.pk).update(recipe_count=0)
+    elif action == 'post_add':
+        adjust_recipe_counts(model, {instance.pk: len(pk_set)})
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_counted_links(sender, instance, **kwargs):
+    """ Remember the tags and ingredients of a recipe being deleted """
+    # link는 cascade로 지워져서 m2m_changed가 안 옴
+    instance._counted_links = {
+        model: list(through.objects.filter(
+            recipe_id=instance.pk
+        ).values_list(column, flat=True))
+        for model, (through, column) in COUNTED.items()
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def count_recipes_on_delete(sender, instance, **kwargs):
+    """ A deleted recipe no longer counts for its tags and ingredients """
+    for model, pks in getattr(instance, '_counted_links', {}).items():
+        adjust_recipe_counts(model, dict.fromkeys(pks, -1))
+
+
+TOMBSTONE_KINDS = {
+    Recipe: Tombstone.RECIPE,
+    Tag: Tombstone.TAG,
+    Ingredient: Tombstone.INGREDIENT,
+}
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_tombstone(sender, instance, **kwargs):
+    """ Remember the deletion so sync clients can drop the object """
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        kind=TOMBSTONE_KINDS[sender],
+        object_id=instance.pk,
+    )
+
+
+@receiver(post_delete, sender=get_user_model())
+def delete_user_tombstones(sender, instance, **kwargs):
+    """ Drop the tombstones recorded while the user's objects cascaded """
+    # user를 지울 때 cascade로 지워진 recipe들의 tombstone이 방금 생겼음
+    Tombstone.objects.filter(user_id=instance.pk).delete()
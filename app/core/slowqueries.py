@@ -0,0 +1,165 @@
+# recipe API의 느린 query 기록
+#
+# SlowQueryLogMixin을 쓴 view는 dispatch 동안 cursor를 감싸서
+# SLOW_QUERIES['THRESHOLD_MS']보다 오래 걸린 statement를 모음
+# 모은 statement는 background thread가 EXPLAIN (ANALYZE, BUFFERS)를 다시
+# 실행해서 plan과 함께 core.SlowQuery에 저장 (admin에서 봄)
+# SlowQuery는 최근 MAX_ENTRIES개만 남기는 ring buffer
+#
+# EXPLAIN ANALYZE는 statement를 실제로 실행하니까 SELECT만 ANALYZE 하고,
+# 쓰기 statement는 plan만 (EXPLAIN) 구함. 항상 rollback
+
+import logging
+import queue
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core.models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryRecorder:
+    """ connection.execute_wrapper() collecting statements over a threshold """
+
+    def __init__(self, threshold):
+        # 초
+        self.threshold = threshold
+        self.entries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+        # executemany는 EXPLAIN 할 수 없음
+        if duration >= self.threshold and not many:
+            self.entries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': params,
+                'duration_ms': duration * 1000,
+            })
+        return result
+
+
+def explain(alias, sql, params):
+    """ Return the EXPLAIN output of the statement, '' if unsupported """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return ''
+    analyze = sql.lstrip()[:6].upper() == 'SELECT'
+    with transaction.atomic(using=alias):
+        with connection.cursor() as cursor:
+            # 느린 query를 한번 더 실행하는 것이니 오래 붙잡지 않게
+            cursor.execute('SET LOCAL statement_timeout = %s', [
+                settings.SLOW_QUERIES['EXPLAIN_TIMEOUT_MS']
+            ])
+            cursor.execute('EXPLAIN %s%s' % (
+                '(ANALYZE, BUFFERS) ' if analyze else '', sql
+            ), params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        # ANALYZE가 바꾼 것은 남기지 않음
+        transaction.set_rollback(True, using=alias)
+    return plan
+
+
+class SlowQueryLog:
+    """ Explain and store slow statements, on a background thread by default
+
+    The queue is bounded; statements arriving while it is full are dropped
+    rather than slowing the requests down.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self.queue = queue.Queue(self.queue_size)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, view, entries):
+        """ Record the entries of one request of the view """
+        background = settings.SLOW_QUERIES['BACKGROUND']
+        for entry in entries:
+            entry = dict(entry, view=view)
+            if not background:
+                self.capture(entry)
+                continue
+            self._start_worker()
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                logger.warning('Slow query queue is full, dropped %s', view)
+
+    def _start_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='slow-query-log', daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            entry = self.queue.get()
+            try:
+                self.capture(entry)
+            except Exception:
+                logger.exception('Could not record a slow query')
+            finally:
+                # 이 thread의 connection도 CONN_MAX_AGE, 끊긴 connection 처리
+                for connection in connections.all():
+                    connection.close_if_unusable_or_obsolete()
+                self.queue.task_done()
+
+    def capture(self, entry):
+        """ Explain one statement and store it, dropping the oldest ones """
+        alias = entry['alias']
+        try:
+            plan = explain(alias, entry['sql'], entry['params'])
+        except Exception as error:
+            # statement_timeout 등. plan 없이라도 남김
+            plan = 'EXPLAIN failed: %s' % error
+        slow_query = SlowQuery.objects.using(alias).create(
+            view=entry['view'],
+            duration_ms=entry['duration_ms'],
+            sql=entry['sql'],
+            params=repr(entry['params']) if entry['params'] else '',
+            plan=plan,
+        )
+        # 최근 MAX_ENTRIES개만 남김. id는 process가 여럿이어도 증가함
+        SlowQuery.objects.using(alias).filter(
+            id__lte=slow_query.id - settings.SLOW_QUERIES['MAX_ENTRIES']
+        ).delete()
+        return slow_query
+
+
+slow_query_log = SlowQueryLog()
+
+
+class SlowQueryLogMixin:
+    """ Record the slow statements run by the view's actions """
+
+    def dispatch(self, request, *args, **kwargs):
+        config = settings.SLOW_QUERIES
+        if not config['ENABLED']:
+            return super().dispatch(request, *args, **kwargs)
+
+        recorder = SlowQueryRecorder(config['THRESHOLD_MS'] / 1000)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = super().dispatch(request, *args, **kwargs)
+
+        if recorder.entries:
+            # action은 dispatch 안에서 정해짐 (없으면 method 이름)
+            action = getattr(self, 'action', None) or request.method.lower()
+            slow_query_log.submit(
+                '%s.%s' % (self.__class__.__name__, action), recorder.entries
+            )
+        return response
@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+from core.authentication import TokenUserCache
+
+ME_URL = reverse('user:me')
+
+
+class TokenUserCacheTests(TestCase):
+    """ Test the in-process token LRU """
+
+    def test_evicts_least_recently_used(self):
+        """ Test the cache never holds more than max_size tokens """
+        cache = TokenUserCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+    @patch('core.authentication.time.monotonic')
+    def test_entries_expire(self, mock_monotonic):
+        """ Test entries are dropped after the TTL """
+        mock_monotonic.return_value = 100
+        cache = TokenUserCache(max_size=2, ttl=60)
+        cache.set('a', 1)
+
+        mock_monotonic.return_value = 161
+        self.assertIsNone(cache.get('a'))
+
+    @override_settings(CACHES={
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    })
+    def test_shared_cache_backend(self):
+        """ Test entries are shared through the Django cache framework """
+        first = TokenUserCache(max_size=2, ttl=60, cache_alias='shared')
+        second = TokenUserCache(max_size=2, ttl=60, cache_alias='shared')
+        first.set('a', 1)
+        self.assertEqual(second.get('a'), 1)
+
+        first.delete('a')
+        self.assertIsNone(second.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ Test authenticating API requests with cached tokens """
+
+    def setUp(self):
+        authentication.get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass',
+            name='Test'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_cached_token_skips_auth_queries(self):
+        """ Test the second request does not look the token up again """
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        # ManageUserView는 request.user를 그대로 돌려주니 쿼리가 없어야 함
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_cached_user_not_shared(self):
+        """ Test each request gets its own user and token instances """
+        auth = authentication.CachedTokenAuthentication()
+        auth.authenticate_credentials(self.token.key)
+        first, first_token = auth.authenticate_credentials(self.token.key)
+        # request 처리 중에 바꾼 값, 생긴 related object cache
+        first.name = 'Changed'
+        first._state.fields_cache['leaked'] = object()
+
+        second, second_token = auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(second, first)
+        self.assertIsNot(second._state, first._state)
+        self.assertNotIn('leaked', second._state.fields_cache)
+        self.assertEqual(second.name, 'Test')
+        self.assertEqual(second, self.user)
+        self.assertIs(second_token.user, second)
+
+    def test_deleted_token_rejected(self):
+        """ Test a deleted token stops working straight away """
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """ Test a deactivated user stops working straight away """
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_update_refreshes_cached_user(self):
+        """ Test updating the profile is seen by the next request """
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New name')
+
+    def test_invalid_token_rejected(self):
+        """ Test an unknown token is not authenticated """
+        self.client.credentials(HTTP_AUTHORIZATION='Token missing')
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
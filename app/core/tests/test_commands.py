@@ -1,10 +1,12 @@
-""" We may not want to actually connect to a database while testing. 
-In such cases, we can mock a database connection 
+""" We may not want to actually connect to a database while testing.
+In such cases, we can mock a database connection
 https://www.mlr2d.org/modules/djangorestapi/09_command_to_wait_for_db
 """
 
+from io import StringIO
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
@@ -13,27 +15,68 @@ from django.test import TestCase
 class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """ Test if the connection works when db is available """
-        # DB가 available한지는 default db retrieve가 가능한지 안한지
+        # DB가 available한지는 실제로 connection을 열고 SELECT 1이 되는지
 
         """  Mock is used to change the default return value of a method at certain parts of the code
         mock을 하기 위해 db와 connection하는 코드를 찾음 """
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
             # 부를 때 사용되는 code 위치, 사용되는 함수 __getitem__
-            
-            # connection handler mocking
-            # 임의로 True로 mocking함
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+            # 돌려받는 connection은 MagicMock
+            call_command('wait_for_db', stdout=StringIO())
+            gi.assert_called_once_with('default')
+            conn = gi.return_value
+            self.assertEqual(conn.ensure_connection.call_count, 1)
+            cursor = conn.cursor.return_value.__enter__.return_value
+            cursor.execute.assert_called_once_with('SELECT 1')
 
     @patch('time.sleep', return_value = True)
     def test_wait_for_db(self, mock_time_sleep):
         """ Test if connection works when db is not connected """
-        # 원래는 DB가 unavailable하면 1초동안 sleep을 하는데
+        # 원래는 DB가 unavailable하면 backoff만큼 sleep을 하는데
         # 테스트할 떄는 굳이 기다릴 필요 없으니 안 기다림 ==> time.sleep을 그냥 true로 바꿔버림
         with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            # make the patch return error for first five calls
-            # and return true on sixth call 
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+            # make the probe fail for the first five attempts
+            # and succeed on the sixth
+            conn = gi.return_value
+            conn.ensure_connection.side_effect = [OperationalError] * 5 + [None]
+            out = StringIO()
+            call_command('wait_for_db', stdout=out)
+            self.assertEqual(conn.ensure_connection.call_count, 6)
+            self.assertEqual(mock_time_sleep.call_count, 5)
+            # 실패한 connection은 닫고 다시 연결
+            self.assertEqual(conn.close.call_count, 5)
+            self.assertIn('(6 attempts)', out.getvalue())
+
+    @patch('random.uniform', side_effect=lambda low, high: high)
+    @patch('time.sleep', return_value = True)
+    def test_wait_for_db_backoff(self, mock_time_sleep, mock_uniform):
+        """ Test the retry delay doubles up to the max interval """
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.ensure_connection.side_effect = \
+                [OperationalError] * 5 + [None]
+            call_command(
+                'wait_for_db', interval=0.5, max_interval=5, stdout=StringIO()
+            )
+            delays = [args[0] for args, kwargs in mock_time_sleep.call_args_list]
+            self.assertEqual(delays, [0.5, 1, 2, 4, 5])
+
+    @patch('time.sleep', return_value = True)
+    def test_wait_for_db_timeout(self, mock_time_sleep):
+        """ Test the command gives up after the timeout """
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            gi.return_value.ensure_connection.side_effect = OperationalError
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', timeout=0, stdout=StringIO())
+            mock_time_sleep.assert_not_called()
+
+    def test_wait_for_multiple_databases(self):
+        """ Test every alias given with --databases is probed """
+        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
+            call_command(
+                'wait_for_db', databases=['default', 'replica'],
+                stdout=StringIO()
+            )
+            self.assertEqual(
+                [args[0] for args, kwargs in gi.call_args_list],
+                ['default', 'replica']
+            )
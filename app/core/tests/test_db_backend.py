@@ -0,0 +1,142 @@
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.db import connection, OperationalError
+from django.test import SimpleTestCase
+
+from core.db.backends.postgresql import base
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Postgres backend only')
+class PostgresBackendTests(SimpleTestCase):
+    """ Test the pooling and health checks of the Postgres backend """
+    # pg_terminate_backend는 default connection으로 실행
+    allow_database_queries = True
+
+    def setUp(self):
+        self.addCleanup(base.close_pools)
+
+    def make_wrapper(self, **settings):
+        """ Return a new DatabaseWrapper for the test database """
+        settings_dict = dict(connection.settings_dict, **settings)
+        # django.contrib.postgres가 connection_created에서 alias로
+        # connections[alias]를 찾아서 존재하는 alias를 사용
+        wrapper = base.DatabaseWrapper(settings_dict, alias=connection.alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pool_reuses_connection(self):
+        """ Test closing a pooled connection hands it back for reuse """
+        wrapper = self.make_wrapper(POOL={'MIN_SIZE': 1, 'MAX_SIZE': 2})
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertFalse(raw.closed)
+
+        wrapper.ensure_connection()
+
+        self.assertIs(wrapper.connection, raw)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def connect_in_thread(self, **pool):
+        """ Connect a new wrapper on another thread, return its outcome """
+        outcome = {}
+
+        def connect():
+            wrapper = base.DatabaseWrapper(
+                dict(connection.settings_dict, POOL=pool),
+                alias=connection.alias
+            )
+            try:
+                wrapper.ensure_connection()
+                outcome['connection'] = wrapper.connection
+            except OperationalError as error:
+                outcome['error'] = error
+            finally:
+                wrapper.close()
+
+        thread = threading.Thread(target=connect)
+        thread.start()
+        return thread, outcome
+
+    def test_exhausted_pool_times_out(self):
+        """ Test a thread waits for a free connection, then gives up """
+        pool = {'MIN_SIZE': 1, 'MAX_SIZE': 1, 'TIMEOUT': 0.1}
+        wrapper = self.make_wrapper(POOL=pool)
+        wrapper.ensure_connection()
+
+        thread, outcome = self.connect_in_thread(**pool)
+        thread.join()
+
+        self.assertIn('Timed out', str(outcome['error']))
+
+    def test_exhausted_pool_waits_for_return(self):
+        """ Test a waiting thread gets the connection handed back """
+        pool = {'MIN_SIZE': 1, 'MAX_SIZE': 1, 'TIMEOUT': 5}
+        wrapper = self.make_wrapper(POOL=pool)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+
+        thread, outcome = self.connect_in_thread(**pool)
+        time.sleep(0.1)
+        wrapper.close()
+        thread.join()
+
+        self.assertIs(outcome['connection'], raw)
+
+    def test_pool_discards_closed_connection(self):
+        """ Test a connection closed while pooled is not handed out """
+        wrapper = self.make_wrapper(POOL={'MIN_SIZE': 1, 'MAX_SIZE': 2})
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        raw.close()
+
+        wrapper.ensure_connection()
+
+        self.assertIsNot(wrapper.connection, raw)
+        self.assertFalse(wrapper.connection.closed)
+
+    @patch('core.db.backends.postgresql.base.time.monotonic')
+    def test_pool_health_checks_idle_connection(self, mock_monotonic):
+        """ Test an idle pooled connection that died is replaced """
+        mock_monotonic.return_value = 1000
+        wrapper = self.make_wrapper(POOL={
+            'MIN_SIZE': 1, 'MAX_SIZE': 2, 'HEALTH_CHECK_AFTER': 30,
+        })
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        pid = raw.get_backend_pid()
+        wrapper.close()
+        # 서버 쪽에서 connection을 끊음 (DB 재시작, idle timeout 흉내)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+
+        mock_monotonic.return_value = 1031
+        wrapper.ensure_connection()
+
+        self.assertIsNot(wrapper.connection, raw)
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    @patch('core.db.backends.postgresql.base.time.monotonic')
+    def test_persistent_connection_health_check(self, mock_monotonic):
+        """ Test an idle persistent connection that died is dropped """
+        mock_monotonic.return_value = 1000
+        wrapper = self.make_wrapper(CONN_MAX_AGE=60)
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_terminate_backend(%s)',
+                [wrapper.connection.get_backend_pid()]
+            )
+
+        mock_monotonic.return_value = 1031
+        wrapper.close_if_unusable_or_obsolete()
+
+        self.assertIsNone(wrapper.connection)
@@ -0,0 +1,200 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Tag, Ingredient, Recipe
+
+
+class ImportRecipesTests(TestCase):
+    """ Test the import_recipes command """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(text)
+        return path
+
+    def test_import_ndjson(self):
+        """ Test recipes are created with deduplicated tags """
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        rows = [
+            {'title': 'Curry', 'time_minutes': 10, 'price': '5.50',
+             'tags': ['Vegan', 'Dinner'], 'ingredients': ['Rice']},
+            {'title': 'Salad', 'time_minutes': 5, 'price': '3.00',
+             'link': 'https://x.com', 'tags': ['Vegan', 'Vegan'],
+             'ingredients': []},
+        ]
+        path = self.write(
+            'recipes.ndjson', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+        out = StringIO()
+
+        call_command(
+            'import_recipes', self.user.email, path, batch_size=1, stdout=out
+        )
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in recipes], ['Curry', 'Salad'])
+        self.assertEqual(recipes[1].link, 'https://x.com')
+        self.assertEqual(
+            sorted(recipes[0].tags.values_list('name', flat=True)),
+            ['Dinner', 'Vegan']
+        )
+        self.assertEqual(list(recipes[1].tags.all()), [existing])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            list(recipes[0].ingredients.values_list('name', flat=True)),
+            ['Rice']
+        )
+        self.assertIn('Imported 2 recipes, 1 tags, 1 ingredients, 4 links',
+                      out.getvalue())
+        self.assertIn('rows/sec', out.getvalue())
+        existing.refresh_from_db()
+        self.assertEqual(existing.recipe_count, 2)
+
+    def test_import_csv(self):
+        """ Test names in CSV cells are split on the separator """
+        path = self.write(
+            'recipes.csv',
+            'id,title,time_minutes,price,link,tags,ingredients\n'
+            '7,Curry,10,5.50,,Vegan|Dinner,Rice|Salt\n'
+        )
+
+        call_command('import_recipes', self.user.email, path,
+                     stdout=StringIO())
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name', flat=True)),
+            ['Rice', 'Salt']
+        )
+
+    def test_rows_stamped_at_commit(self):
+        """ Test imported rows share one updated_at taken before commit """
+        # INSERT 때 시간이 남으면 import 중에 sync한 client가 놓침
+        Tag.objects.create(user=self.user, name='Vegan')
+        path = self.write(
+            'recipes.ndjson',
+            json.dumps({'title': 'Curry', 'time_minutes': 10,
+                        'price': '5.50', 'tags': ['Vegan'],
+                        'ingredients': ['Rice']}) + '\n' +
+            json.dumps({'title': 'Salad', 'time_minutes': 5,
+                        'price': '3.00', 'tags': ['Quick']}) + '\n'
+        )
+
+        call_command('import_recipes', self.user.email, path,
+                     batch_size=1, stdout=StringIO())
+
+        stamps = set(Recipe.objects.values_list('updated_at', flat=True))
+        stamps.update(Tag.objects.values_list('updated_at', flat=True))
+        stamps.update(
+            Ingredient.objects.values_list('updated_at', flat=True)
+        )
+        self.assertEqual(len(stamps), 1)
+
+    def test_invalid_row_rolls_back(self):
+        """ Test nothing is imported when a row is invalid """
+        path = self.write(
+            'recipes.ndjson',
+            json.dumps({'title': 'Curry', 'time_minutes': 10,
+                        'price': '5.50', 'tags': ['Vegan']}) + '\n' +
+            json.dumps({'title': 'Bad', 'time_minutes': 'soon',
+                        'price': '1.00'}) + '\n'
+        )
+
+        with self.assertRaisesMessage(CommandError, 'Row 2, time_minutes'):
+            call_command('import_recipes', self.user.email, path,
+                         batch_size=1, stdout=StringIO())
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_non_object_row(self):
+        """ Test an NDJSON line that is not an object is reported """
+        path = self.write(
+            'recipes.ndjson',
+            json.dumps({'title': 'Curry', 'time_minutes': 10,
+                        'price': '5.50'}) + '\n' +
+            json.dumps(['Bad', 10, '1.00']) + '\n'
+        )
+
+        with self.assertRaisesMessage(
+                CommandError, 'Line 2: expected an object, got list'):
+            call_command('import_recipes', self.user.email, path,
+                         stdout=StringIO())
+
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_names_must_be_a_list(self):
+        """ Test a string or number instead of a list of names fails """
+        for tags in ('Vegan', 5):
+            path = self.write('recipes.ndjson', json.dumps(
+                {'title': 'Curry', 'time_minutes': 10, 'price': '5.50',
+                 'tags': tags}
+            ) + '\n')
+
+            with self.assertRaisesMessage(
+                    CommandError, 'Row 1, tags: expected a list'):
+                call_command('import_recipes', self.user.email, path,
+                             stdout=StringIO())
+
+        self.assertFalse(Tag.objects.exists())
+
+    def test_name_too_long(self):
+        """ Test a name longer than the column is reported with its row """
+        path = self.write('recipes.ndjson', json.dumps(
+            {'title': 'Curry', 'time_minutes': 10, 'price': '5.50',
+             'ingredients': ['Rice', 'x' * 256]}
+        ) + '\n')
+
+        with self.assertRaisesMessage(
+                CommandError, 'Row 1, ingredients: '):
+            call_command('import_recipes', self.user.email, path,
+                         stdout=StringIO())
+
+        self.assertFalse(Ingredient.objects.exists())
+
+    @patch('core.management.commands.import_recipes.connection')
+    def test_requires_postgres(self, connection):
+        """ Test other databases are refused before anything is read """
+        connection.vendor = 'sqlite'
+        path = self.write('recipes.ndjson', '')
+
+        with self.assertRaisesMessage(CommandError, 'requires PostgreSQL'):
+            call_command('import_recipes', self.user.email, path)
+
+    def test_unknown_user(self):
+        """ Test importing for a missing user fails """
+        path = self.write('recipes.ndjson', '')
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'nobody@x.com', path)
+
+    @patch('recipe.cache.bump_generation')
+    def test_import_invalidates_cache(self, bump_generation):
+        """ Test cached API responses are refreshed after an import """
+        path = self.write('recipes.ndjson', json.dumps(
+            {'title': 'Curry', 'time_minutes': 10, 'price': '5.50'}
+        ) + '\n')
+
+        call_command('import_recipes', self.user.email, path,
+                     stdout=StringIO())
+
+        bump_generation.assert_called_once_with(self.user.pk)
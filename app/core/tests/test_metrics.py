@@ -0,0 +1,193 @@
+import multiprocessing
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.metrics import Counter, Histogram, MetricsRegistry
+from core.models import Tag
+
+METRICS_URL = reverse('metrics')
+TAGS_URL = reverse('recipe:tag-list')
+TOKEN_URL = reverse('user:token')
+
+METRICS = {
+    'ENABLED': True, 'MULTIPROCESS_DIR': None, 'TOKEN': None, 'PUBLIC': False
+}
+
+
+def lines(text):
+    return set(text.splitlines())
+
+
+@override_settings(METRICS=METRICS)
+class MetricsRegistryTests(SimpleTestCase):
+    """ Test counters, histograms and the text format """
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.counter = Counter(
+            'jobs_total', 'Jobs', ('kind',), registry=self.registry
+        )
+        self.histogram = Histogram(
+            'job_seconds', 'Job time', buckets=(0.1, 1),
+            registry=self.registry
+        )
+
+    def test_exposition(self):
+        """ Test values are rendered with HELP, TYPE and cumulative buckets """
+        self.counter.inc(kind='a')
+        self.counter.inc(2, kind='b"c')
+        self.histogram.observe(0.05)
+        self.histogram.observe(0.1)
+        self.histogram.observe(3)
+
+        text = self.registry.exposition()
+
+        self.assertEqual(text.splitlines(), [
+            '# HELP jobs_total Jobs',
+            '# TYPE jobs_total counter',
+            'jobs_total{kind="a"} 1.0',
+            'jobs_total{kind="b\\"c"} 2.0',
+            '# HELP job_seconds Job time',
+            '# TYPE job_seconds histogram',
+            'job_seconds_bucket{le="0.1"} 2.0',
+            'job_seconds_bucket{le="1.0"} 2.0',
+            'job_seconds_bucket{le="+Inf"} 3.0',
+            'job_seconds_sum 3.15',
+            'job_seconds_count 3.0',
+        ])
+
+    def test_wrong_labels(self):
+        """ Test missing or unknown labels are rejected """
+        with self.assertRaises(ValueError):
+            self.counter.inc()
+        with self.assertRaises(ValueError):
+            self.counter.inc(kind='a', other='b')
+
+    def test_threads_are_summed(self):
+        """ Test every thread writes its own shard and reads sum them """
+        def work():
+            for _ in range(1000):
+                self.counter.inc(kind='a')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.counter.inc(kind='a')
+
+        self.assertIn('jobs_total{kind="a"} 4001.0',
+                      lines(self.registry.exposition()))
+        # 끝난 thread의 shard는 다음 thread가 이어받음
+        self.assertLessEqual(len(self.registry._shards), 5)
+
+    def test_multiprocess(self):
+        """ Test values of other processes are read from their files """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        def work():
+            for _ in range(5000):
+                self.counter.inc(kind='a')
+            self.histogram.observe(0.5)
+
+        with override_settings(METRICS=dict(
+                METRICS, MULTIPROCESS_DIR=directory)):
+            self.registry.reset()
+            context = multiprocessing.get_context('fork')
+            children = [context.Process(target=work) for _ in range(2)]
+            for child in children:
+                child.start()
+            for child in children:
+                child.join()
+            self.counter.inc(kind='a')
+
+            text = lines(self.registry.exposition())
+            self.registry.reset()
+
+        self.assertIn('jobs_total{kind="a"} 10001.0', text)
+        self.assertIn('job_seconds_bucket{le="1.0"} 2.0', text)
+
+
+@override_settings(METRICS=METRICS, RECIPE_RESPONSE_CACHE={
+    'ENABLED': True, 'ALIAS': 'default', 'TIMEOUT': 60
+})
+class MetricsApiTests(TestCase):
+    """ Test GET /metrics and the recorded request metrics """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client = APIClient()
+
+    def test_request_metrics(self):
+        """ Test requests are recorded by view, cache and auth failures """
+        self.client.force_authenticate(self.user)
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        self.client.get(TAGS_URL)
+        self.client.credentials()
+        self.client.post(TOKEN_URL, {
+            'email': 'test@londonappdev.com', 'password': 'wrong'
+        })
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        text = lines(res.content.decode())
+        self.assertTrue({
+            'http_requests_total{view="TagViewSet.list",method="GET",'
+            'status="200"} 2.0',
+            'http_requests_total{view="TagViewSet.list",method="GET",'
+            'status="401"} 1.0',
+            'http_requests_total{view="CreateTokenView",method="POST",'
+            'status="400"} 1.0',
+            'http_request_duration_seconds_count{view="TagViewSet.list"} 3.0',
+            'cache_requests_total{cache="response",result="hit"} 1.0',
+            'cache_requests_total{cache="response",result="miss"} 1.0',
+            'auth_failures_total{reason="token"} 1.0',
+            'auth_failures_total{reason="credentials"} 1.0',
+        } <= text, text)
+
+    @override_settings(METRICS=dict(METRICS, TOKEN='secret'))
+    def test_metrics_token(self):
+        """ Test a configured token is required """
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(res.status_code, 200)
+
+    def test_metrics_without_token(self):
+        """ Test only local and internal clients are answered by default """
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='::1')
+        self.assertEqual(res.status_code, 200)
+
+        with self.settings(INTERNAL_IPS=['10.0.0.7']):
+            res = self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.7')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS=dict(METRICS, PUBLIC=True))
+    def test_public_metrics(self):
+        """ Test METRICS['PUBLIC'] opens /metrics to every client """
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 200)
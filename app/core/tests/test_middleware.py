@@ -0,0 +1,97 @@
+import re
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import is_sampled
+from core.models import Tag
+from recipe.serializers import TagSerializer
+
+TAGS_URL = reverse('recipe:tag-list')
+
+TIMED = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'HEADER': True}
+
+
+@override_settings(RECIPE_RESPONSE_CACHE={
+    'ENABLED': False, 'ALIAS': 'default', 'TIMEOUT': 60
+})
+class RequestTimingMiddlewareTests(TestCase):
+    """ Test the Server-Timing header and the timing log """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    @override_settings(REQUEST_TIMING=TIMED)
+    def test_sampled_request(self):
+        """ Test a sampled request gets a header and a log line """
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            res = self.client.get(TAGS_URL)
+
+        header = res['Server-Timing']
+        match = re.match(
+            r'db;dur=[\d.]+;desc="(\d+) queries", serialize;dur=[\d.]+, '
+            r'render;dur=[\d.]+, total;dur=[\d.]+$', header
+        )
+        self.assertIsNotNone(match, header)
+        self.assertEqual(int(match.group(1)), 1)
+        self.assertEqual(len(logs.records), 1)
+        timing = logs.records[0].timing
+        self.assertEqual(timing['queries'], 1)
+        self.assertEqual(timing['view'], 'recipe:tag-list')
+        self.assertEqual(timing['status'], 200)
+        self.assertIn('queries=1 ', logs.output[0])
+
+    @override_settings(REQUEST_TIMING=TIMED)
+    def test_serializer_time(self):
+        """ Test serializer.data is reported as its own serialize entry """
+        def slow(tag):
+            time.sleep(0.05)
+            return {'id': tag.id, 'name': tag.name}
+
+        with patch.object(TagSerializer, 'to_representation',
+                          side_effect=slow), \
+                self.assertLogs('core.timing', 'INFO') as logs:
+            res = self.client.get(TAGS_URL)
+
+        timing = logs.records[0].timing
+        self.assertGreaterEqual(timing['serialize_ms'], 50)
+        self.assertLess(timing['render_ms'], 50)
+        self.assertIn('serialize_ms=', logs.output[0])
+        self.assertIn('serialize;dur=', res['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING=dict(TIMED, HEADER=False))
+    def test_header_disabled(self):
+        """ Test HEADER=False only logs """
+        with self.assertLogs('core.timing', 'INFO'):
+            res = self.client.get(TAGS_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    @override_settings(REQUEST_TIMING=dict(TIMED, SAMPLE_RATE=0))
+    def test_not_sampled(self):
+        """ Test requests outside the sample are left alone """
+        with patch('core.middleware.logger') as mock_logger:
+            res = self.client.get(TAGS_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
+        self.assertFalse(hasattr(res.wsgi_request, 'timing'))
+        mock_logger.info.assert_not_called()
+
+    @patch('core.middleware.random.random')
+    def test_sample_rate(self, mock_random):
+        """ Test the sample rate and the ENABLED switch """
+        mock_random.return_value = 0.3
+        self.assertTrue(is_sampled(dict(TIMED, SAMPLE_RATE=0.5)))
+        self.assertFalse(is_sampled(dict(TIMED, SAMPLE_RATE=0.2)))
+        self.assertFalse(is_sampled(dict(TIMED, ENABLED=False)))
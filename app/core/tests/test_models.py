@@ -86,4 +86,25 @@ class ModelTests(TestCase):
             time_minutes = 5,
             price = 5.00
         )
-        self.assertEqual(str(recipe), recipe.title)
\ No newline at end of file
+        self.assertEqual(str(recipe), recipe.title)
+
+    def test_recipe_touched_on_m2m_change(self):
+        """ Test linking a tag from either side bumps recipe.updated_at """
+        user = sample_user()
+        recipe = models.Recipe.objects.create(
+            user = user,
+            title = "Steak and mushroom sauce",
+            time_minutes = 5,
+            price = 5.00
+        )
+        tag = models.Tag.objects.create(user = user, name = "Vegan")
+        updated_at = recipe.updated_at
+
+        recipe.tags.add(tag)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
+
+        updated_at = recipe.updated_at
+        tag.recipe_set.clear()
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
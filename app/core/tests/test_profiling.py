@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.profiling import StackSampler, is_profiled
+
+ME_URL = reverse('user:me')
+
+PROFILING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0,
+    'HEADER': 'X-Profile',
+    'SECRET': 'letmein',
+    'MAX_FILES': 2,
+    'INTERVAL_MS': 1,
+    'OUTPUT_DIR': None,
+}
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class StackSamplerTests(SimpleTestCase):
+    """ Test the stacks are sampled from the starting frame down """
+
+    def test_samples_stacks(self):
+        sampler = StackSampler(0.001)
+        sampler.start()
+        busy(0.1)
+        sampler.stop()
+
+        self.assertTrue(sampler.stacks)
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertTrue(stack.startswith(
+            'core.tests.test_profiling:test_samples_stacks;'
+            'core.tests.test_profiling:busy'
+        ), stack)
+
+    def test_is_profiled(self):
+        """ Test the header secret, the sample rate and the ENABLED switch """
+        request = RequestFactory().get('/', HTTP_X_PROFILE='letmein')
+        guess = RequestFactory().get('/', HTTP_X_PROFILE='1')
+        plain = RequestFactory().get('/')
+
+        self.assertTrue(is_profiled(request, PROFILING))
+        self.assertFalse(is_profiled(guess, PROFILING))
+        self.assertFalse(is_profiled(plain, PROFILING))
+        self.assertFalse(is_profiled(request, dict(PROFILING, HEADER=None)))
+        self.assertFalse(is_profiled(request, dict(PROFILING, SECRET=None)))
+        self.assertFalse(is_profiled(request, dict(PROFILING, ENABLED=False)))
+        with patch('core.profiling.random.random', return_value=0.3):
+            self.assertTrue(
+                is_profiled(plain, dict(PROFILING, SAMPLE_RATE=0.5))
+            )
+
+
+class ProfilingApiTests(TestCase):
+    """ Test profiled requests of the user API leave a collapsed stack file """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.settings = override_settings(
+            PROFILING=dict(PROFILING, OUTPUT_DIR=self.directory)
+        )
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+
+    def test_profile_by_header(self):
+        """ Test the secret header writes a file, without naming it """
+        res = self.client.get(ME_URL, HTTP_X_PROFILE='letmein')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.has_header('X-Profile'))
+        [name] = os.listdir(self.directory)
+        self.assertTrue(name.startswith('ManageUserView.get-'), name)
+        with open(os.path.join(self.directory, name)) as profile:
+            for line in profile:
+                self.assertRegex(line, r'^\S.* \d+\n$')
+                self.assertTrue(line.startswith('core.profiling:dispatch'))
+
+    def test_oldest_files_pruned(self):
+        """ Test only MAX_FILES profiles are kept """
+        for _ in range(4):
+            self.client.get(ME_URL, HTTP_X_PROFILE='letmein')
+
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_not_profiled(self):
+        """ Test requests without the secret are left alone """
+        self.client.get(ME_URL)
+        self.client.get(ME_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(os.listdir(self.directory), [])
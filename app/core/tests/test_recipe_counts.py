@@ -0,0 +1,145 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+
+
+def sample_recipe(user, title='Curry'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class RecipeCountTests(TestCase):
+    """ Test recipe_count follows the links of tags and ingredients """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+
+    def assertCounts(self, vegan, dinner):
+        self.vegan.refresh_from_db()
+        self.dinner.refresh_from_db()
+        self.assertEqual(
+            (self.vegan.recipe_count, self.dinner.recipe_count),
+            (vegan, dinner)
+        )
+
+    def test_forward_changes(self):
+        """ Test add/remove/clear/set on recipe.tags """
+        curry = sample_recipe(self.user)
+        soup = sample_recipe(self.user, 'Soup')
+
+        curry.tags.add(self.vegan, self.dinner)
+        soup.tags.add(self.vegan)
+        self.assertCounts(2, 1)
+
+        # link가 없는 dinner를 지워도 count는 그대로
+        soup.tags.remove(self.vegan, self.dinner)
+        self.assertCounts(1, 1)
+
+        curry.tags.clear()
+        self.assertCounts(0, 0)
+
+        curry.tags.set([self.dinner])
+        soup.tags.set([self.vegan, self.dinner])
+        soup.tags.set([self.dinner])
+        self.assertCounts(0, 2)
+
+    def test_reverse_changes(self):
+        """ Test add/remove/clear on tag.recipe_set """
+        curry = sample_recipe(self.user)
+        soup = sample_recipe(self.user, 'Soup')
+        stew = sample_recipe(self.user, 'Stew')
+
+        self.vegan.recipe_set.add(curry, soup, stew)
+        self.assertCounts(3, 0)
+
+        self.vegan.recipe_set.remove(curry)
+        self.vegan.recipe_set.remove(curry)
+        self.assertCounts(2, 0)
+
+        self.vegan.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+    def test_delete_recipe(self):
+        """ Test deleting a recipe decrements its tags and ingredients """
+        curry = sample_recipe(self.user)
+        curry.tags.add(self.vegan)
+        curry.ingredients.add(self.rice)
+        sample_recipe(self.user, 'Soup').tags.add(self.vegan)
+
+        curry.delete()
+
+        self.assertCounts(1, 0)
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.recipe_count, 0)
+
+    def test_save_keeps_recipe_count(self):
+        """ Test saving a stale instance does not overwrite the count """
+        stale = Tag.objects.get(id=self.vegan.id)
+        sample_recipe(self.user).tags.add(self.vegan)
+
+        stale.name = 'Plant based'
+        stale.save()
+
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.name, 'Plant based')
+        self.assertEqual(self.vegan.recipe_count, 1)
+
+
+class RepairRecipeCountsTests(TestCase):
+    """ Test the repair_recipe_counts command """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.other = get_user_model().objects.create_user(
+            'other@x.com', 'pass'
+        )
+
+    def corrupt(self, user):
+        tag = Tag.objects.create(user=user, name='Vegan')
+        sample_recipe(user).tags.add(tag)
+        Tag.objects.filter(id=tag.id).update(recipe_count=5)
+        return tag
+
+    def test_repair(self):
+        """ Test wrong counts are recomputed from the links """
+        tag = self.corrupt(self.user)
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        Ingredient.objects.filter(id=ingredient.id).update(recipe_count=-1)
+        out = StringIO()
+
+        call_command('repair_recipe_counts', stdout=out)
+
+        tag.refresh_from_db()
+        ingredient.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertEqual(ingredient.recipe_count, 0)
+        self.assertIn('Fixed 1 tags', out.getvalue())
+        self.assertIn('Fixed 1 ingredients', out.getvalue())
+
+    def test_repair_one_user(self):
+        """ Test --user leaves the other users alone """
+        mine = self.corrupt(self.user)
+        theirs = self.corrupt(self.other)
+
+        call_command(
+            'repair_recipe_counts', user=self.user.email, stdout=StringIO()
+        )
+
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.recipe_count, 1)
+        self.assertEqual(theirs.recipe_count, 5)
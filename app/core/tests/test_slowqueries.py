@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import SlowQuery, Tag
+from core.slowqueries import SlowQueryLog
+
+TAGS_URL = reverse('recipe:tag-list')
+
+SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 0,
+    'MAX_ENTRIES': 100,
+    'BACKGROUND': False,
+    'EXPLAIN_TIMEOUT_MS': 5000,
+}
+
+
+@override_settings(SLOW_QUERIES=SLOW_QUERIES, RECIPE_RESPONSE_CACHE={
+    'ENABLED': False, 'ALIAS': 'default', 'TIMEOUT': 60
+})
+class SlowQueryLogTests(TestCase):
+    """ Test slow statements of the recipe API are explained and stored """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_select_is_explained_with_analyze(self):
+        """ Test a slow SELECT is stored with its EXPLAIN ANALYZE plan """
+        self.client.get(TAGS_URL)
+
+        slow_query = SlowQuery.objects.get()
+        self.assertEqual(slow_query.view, 'TagViewSet.list')
+        self.assertIn('core_tag', slow_query.sql)
+        self.assertIn(str(self.user.id), slow_query.params)
+        self.assertIn('actual time', slow_query.plan)
+
+    def test_write_is_not_analyzed(self):
+        """ Test a slow INSERT only gets its plan, nothing is run twice """
+        self.client.post(TAGS_URL, {'name': 'Dinner'})
+
+        slow_query = SlowQuery.objects.get(sql__startswith='INSERT')
+        self.assertEqual(slow_query.view, 'TagViewSet.create')
+        self.assertIn('Insert on core_tag', slow_query.plan)
+        self.assertNotIn('actual time', slow_query.plan)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+
+    @override_settings(SLOW_QUERIES=dict(SLOW_QUERIES, MAX_ENTRIES=2))
+    def test_oldest_entries_are_dropped(self):
+        """ Test only the latest MAX_ENTRIES statements are kept """
+        for _ in range(3):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(SlowQuery.objects.count(), 2)
+
+    @override_settings(SLOW_QUERIES=dict(SLOW_QUERIES, THRESHOLD_MS=10000))
+    def test_fast_queries_are_ignored(self):
+        """ Test statements under the threshold are not stored """
+        self.client.get(TAGS_URL)
+
+        self.assertFalse(SlowQuery.objects.exists())
+
+    @override_settings(SLOW_QUERIES=dict(SLOW_QUERIES, BACKGROUND=True))
+    def test_background_worker(self):
+        """ Test the entries are handed to the worker thread """
+        log = SlowQueryLog()
+        entry = {'alias': 'default', 'sql': 'SELECT 1', 'params': None,
+                 'duration_ms': 1.0}
+
+        with patch.object(log, 'capture') as mock_capture:
+            log.submit('TagViewSet.list', [entry])
+            log.queue.join()
+
+        mock_capture.assert_called_once_with(
+            dict(entry, view='TagViewSet.list')
+        )
+
+    def test_admin_shows_plan(self):
+        """ Test the admin lists the statements and shows their plan """
+        self.client.get(TAGS_URL)
+        slow_query = SlowQuery.objects.get()
+        admin_user = get_user_model().objects.create_superuser(
+            'admin@londonappdev.com', 'password123'
+        )
+        self.client.force_login(admin_user)
+
+        res = self.client.get(reverse('admin:core_slowquery_changelist'))
+        self.assertContains(res, 'TagViewSet.list')
+
+        res = self.client.get(
+            reverse('admin:core_slowquery_change', args=[slow_query.id])
+        )
+        self.assertContains(res, 'actual time')
@@ -0,0 +1,38 @@
+import ipaddress
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from core import metrics
+
+
+def is_internal(request):
+    """ Return whether the request comes from this host or INTERNAL_IPS """
+    address = request.META.get('REMOTE_ADDR', '')
+    if address in settings.INTERNAL_IPS:
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+@require_GET
+def metrics_view(request):
+    """ Export the metrics of every worker in the Prometheus text format """
+    config = settings.METRICS
+    token = config.get('TOKEN')
+    if token:
+        # Prometheus scrape config의 bearer_token
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not constant_time_compare(header, 'Bearer %s' % token):
+            return HttpResponseForbidden()
+    elif not (config.get('PUBLIC') or settings.DEBUG or is_internal(request)):
+        # token이 없으면 view 이름, 실패 수 등이 밖으로 보이지 않게
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics.REGISTRY.exposition(), content_type=metrics.CONTENT_TYPE
+    )
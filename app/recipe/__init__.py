@@ -1,3 +1,5 @@
 # Migration 폴더는 삭제함. 모든 app의 migration을 Core앱에 모아놓을 것이라서
 # admin.py, model.py 도 같은 이유로 삭제
-# test.py 삭제. 폴더로 만들거임
\ No newline at end of file
+# test.py 삭제. 폴더로 만들거임
+
+default_app_config = 'recipe.apps.RecipeConfig'
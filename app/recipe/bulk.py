@@ -0,0 +1,301 @@
+# 여러 object를 request 하나로 만들고/고치고/지우는 bulk API
+#
+# POST   <prefix>/bulk/  [{...}, {...}]              -> 201, 만든 object들
+# PATCH  <prefix>/bulk/  [{"id": 1, ...}, ...]        -> 200, 고친 object들
+# DELETE <prefix>/bulk/  [1, 2, 3]                     -> 204
+#
+# batch 전체를 ListSerializer 하나로 validate하고 object마다 query를 보내지
+# 않고 bulk_create, UPDATE ... CASE, through table bulk_create로 씀
+# 하나라도 틀리면 아무것도 저장하지 않고 item 순서대로 error list를 돌려줌
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core.counters import COUNTED, adjust_recipe_counts
+from core.middleware import TimedSerializerMixin
+from core.models import Recipe
+from core.signals import bulk_changed
+
+
+def set_m2m_links(field, wanted, created=False):
+    """ Make the links of each object equal {pk: set of related pks}
+
+    Only the difference with the current through table rows is written:
+    one SELECT, at most one DELETE and one INSERT for the whole batch.
+    recipe_count of the related objects is adjusted by the same diff.
+    Return the pks of the objects whose links changed.
+    """
+    through = field.remote_field.through
+    # recipe_id, tag_id (또는 ingredient_id)
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+
+    current = defaultdict(set)
+    # 방금 만든 object는 link가 없으니 SELECT 생략
+    if not created:
+        rows = through.objects.filter(**{source + '__in': list(wanted)})
+        for source_pk, target_pk in rows.values_list(source, target):
+            current[source_pk].add(target_pk)
+
+    removed = Q()
+    added = []
+    changed = set()
+    # related object pk -> 늘어난/줄어든 link 수
+    deltas = Counter()
+    for pk, targets in wanted.items():
+        gone = current[pk] - targets
+        new = targets - current[pk]
+        if gone:
+            removed |= Q(**{source: pk, target + '__in': gone})
+        added.extend(
+            through(**{source: pk, target: target_pk}) for target_pk in new
+        )
+        deltas.update(new)
+        deltas.subtract(gone)
+        if gone or new:
+            changed.add(pk)
+
+    if removed:
+        through.objects.filter(removed).delete()
+    if added:
+        through.objects.bulk_create(added)
+    # m2m_changed를 안 보내니 core.signals 대신 여기서 recipe_count 갱신
+    if field.related_model in COUNTED:
+        adjust_recipe_counts(field.related_model, deltas)
+    return changed
+
+
+def apply_m2m_diff(instance, name, objs):
+    """ Link instance.<name> to objs, writing only the added/removed rows
+
+    Unlike manager.set() this reads the current links with one query and
+    does nothing else when they are unchanged. m2m_changed is still sent
+    for the rows that are written, like add() and remove() would.
+    """
+    field = instance._meta.get_field(name)
+    through = field.remote_field.through
+    source = field.m2m_column_name()
+    target = field.m2m_reverse_name()
+
+    current = set(through.objects.filter(
+        **{source: instance.pk}
+    ).values_list(target, flat=True))
+    wanted = {obj.pk for obj in objs}
+    removed = current - wanted
+    added = wanted - current
+
+    def send(action, pk_set):
+        m2m_changed.send(
+            sender=through, instance=instance, action=action, reverse=False,
+            model=field.related_model, pk_set=pk_set, using=instance._state.db
+        )
+
+    if removed:
+        send('pre_remove', removed)
+        through.objects.filter(
+            **{source: instance.pk, target + '__in': removed}
+        ).delete()
+        send('post_remove', removed)
+    if added:
+        send('pre_add', added)
+        through.objects.bulk_create([
+            through(**{source: instance.pk, target: pk}) for pk in added
+        ])
+        send('post_add', added)
+
+
+class BulkListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """ ListSerializer that saves the whole batch with bulk queries """
+
+    def _m2m_fields(self):
+        return self.child.Meta.model._meta.many_to_many
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        m2m_names = {field.name for field in self._m2m_fields()}
+        instances = [
+            model(**{
+                key: value for key, value in item.items()
+                if key not in m2m_names
+            })
+            for item in validated_data
+        ]
+        # Postgres는 RETURNING으로 pk를 채워줌 -> through table에 바로 사용
+        model.objects.bulk_create(instances)
+        self._write_m2m(instances, validated_data, created=True)
+        return instances
+
+    def update(self, instances, validated_data):
+        """ Update instances, validated_data is in the same order """
+        model = self.child.Meta.model
+        m2m_names = {field.name for field in self._m2m_fields()}
+        # column별로 CASE WHEN id = ... THEN ... 를 모아 UPDATE 한번
+        whens = defaultdict(list)
+        for instance, item in zip(instances, validated_data):
+            for key, value in item.items():
+                if key in m2m_names:
+                    continue
+                setattr(instance, key, value)
+                whens[key].append(When(pk=instance.pk, then=Value(value)))
+
+        columns = {
+            key: Case(
+                *cases, default=F(key), output_field=model._meta.get_field(key)
+            )
+            for key, cases in whens.items()
+        }
+        # .update()는 auto_now를 채우지 않음
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                columns[field.name] = now
+                for instance in instances:
+                    setattr(instance, field.attname, now)
+
+        model.objects.filter(
+            pk__in=[instance.pk for instance in instances]
+        ).update(**columns)
+        self._write_m2m(instances, validated_data)
+        return instances
+
+    def _write_m2m(self, instances, validated_data, created=False):
+        for field in self._m2m_fields():
+            wanted = {
+                instance.pk: {obj.pk for obj in item[field.name]}
+                for instance, item in zip(instances, validated_data)
+                if field.name in item
+            }
+            if wanted:
+                set_m2m_links(field, wanted, created)
+
+
+class BulkModelMixin:
+    """ Create, update and delete a batch of objects at <prefix>/bulk/ """
+
+    def get_bulk_max_size(self):
+        return settings.RECIPE_BULK['MAX_BATCH_SIZE']
+
+    def check_batch(self, data):
+        """ Reject a body that is not a list or is too large """
+        if not isinstance(data, list) or not data:
+            raise ValidationError(
+                {'non_field_errors': ['Expected a non-empty list of items.']}
+            )
+        # body 전체는 이미 parse 되었지만 validation, INSERT 크기를 제한
+        max_size = self.get_bulk_max_size()
+        if len(data) > max_size:
+            raise ValidationError({'non_field_errors': [
+                'Send at most %d items per request.' % max_size
+            ]})
+
+    def get_bulk_queryset(self):
+        """ Return the user's objects, without the list query params """
+        # get_queryset()은 ?assigned_only= 등 list filter가 걸려 있어서
+        # 방금 만든 object나 있는 object가 빠질 수 있음
+        return self.queryset.filter(user=self.request.user)
+
+    def get_bulk_instances(self, ids):
+        """ Return the user's objects in the order of ids or raise errors """
+        # JSON true/false도 int의 subclass라 따로 막음 (true == 1)
+        def is_id(pk):
+            return isinstance(pk, int) and not isinstance(pk, bool)
+
+        # prefetch는 response 만들 때만 필요
+        found = self.get_bulk_queryset().prefetch_related(None).in_bulk(
+            [pk for pk in ids if is_id(pk)]
+        )
+        errors, seen = [], set()
+        for pk in ids:
+            if not is_id(pk):
+                errors.append({'id': ['A valid integer is required.']})
+                continue
+            if pk not in found:
+                errors.append({'id': ['Not found.']})
+            elif pk in seen:
+                errors.append({'id': ['Duplicate id.']})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise ValidationError(errors)
+
+        return [found[pk] for pk in ids]
+
+    def get_bulk_response_data(self, instances):
+        """ Serialize the saved objects read back with get_bulk_queryset() """
+        pks = [instance.pk for instance in instances]
+        saved = self.get_bulk_queryset().in_bulk(pks)
+        return self.get_serializer(
+            [saved[pk] for pk in pks], many=True
+        ).data
+
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk')
+    def bulk_create(self, request):
+        """ Create a list of objects """
+        self.check_batch(request.data)
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_bulk_create(serializer)
+        return Response(
+            self.get_bulk_response_data(serializer.instance),
+            status=status.HTTP_201_CREATED
+        )
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request):
+        """ Partially update a list of objects identified by "id" """
+        self.check_batch(request.data)
+        instances = self.get_bulk_instances([
+            item.get('id') if isinstance(item, dict) else None
+            for item in request.data
+        ])
+        serializer = self.get_serializer(
+            instances, data=request.data, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            self.perform_bulk_update(serializer)
+        return Response(self.get_bulk_response_data(serializer.instance))
+
+    @bulk_create.mapping.delete
+    def bulk_destroy(self, request):
+        """ Delete a list of objects given by id """
+        self.check_batch(request.data)
+        instances = self.get_bulk_instances(request.data)
+        with transaction.atomic():
+            self.perform_bulk_destroy(instances)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def perform_bulk_create(self, serializer):
+        serializer.save(user=self.request.user)
+        self.bulk_changed(serializer.instance)
+
+    def perform_bulk_update(self, serializer):
+        serializer.save()
+        self.bulk_changed(serializer.instance)
+
+    def perform_bulk_destroy(self, instances):
+        # delete()는 object마다 post_delete signal을 보냄 (cache, tombstone)
+        self.get_bulk_queryset().prefetch_related(None).filter(
+            pk__in=[instance.pk for instance in instances]
+        ).delete()
+
+    def bulk_changed(self, instances):
+        # bulk_create, UPDATE는 model signal을 안 보냄
+        model = self.queryset.model
+        recipe_ids = None
+        if model is Recipe:
+            recipe_ids = [instance.pk for instance in instances]
+        bulk_changed.send(
+            sender=model, user=self.request.user, recipe_ids=recipe_ids
+        )
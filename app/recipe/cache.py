@@ -0,0 +1,156 @@
+# user별 API response cache
+#
+# key에 user의 generation 번호가 들어감. Tag/Ingredient/Recipe가 바뀌면
+# signal에서 generation만 +1 하면 되니까 key를 찾아서 지울 필요가 없다 (O(1))
+# 옛 generation의 response들은 TIMEOUT이 지나면 cache에서 알아서 사라짐
+
+import calendar
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode, quote_etag, http_date
+from rest_framework.response import Response
+
+from core import metrics
+
+
+def _config():
+    return settings.RECIPE_RESPONSE_CACHE
+
+
+def _cache():
+    return caches[_config()['ALIAS']]
+
+
+def _generation_key(user_id):
+    return 'recipe:generation:%s' % user_id
+
+
+def _new_generation():
+    # generation key만 evict 됐을 때 옛날 번호로 돌아가지 않도록 시간 기반
+    return int(time.time() * 1000)
+
+
+def get_generation(user_id):
+    """ Return the current cache generation of the user """
+    cache = _cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), None)
+        generation = cache.get(key)
+
+    return generation
+
+
+def bump_generation(user_id):
+    """ Invalidate every cached response of the user """
+    cache = _cache()
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # key가 없으면 incr이 ValueError
+        cache.set(key, _new_generation(), None)
+
+
+def invalidate_user(user_id):
+    """ Bump the user's generation now and again after the commit """
+    # 지금 bump: 이 transaction 안에서 읽는 response는 cache를 안 봄
+    # commit 후 bump: commit 전에 다른 request가 옛 row로 만들어서 새
+    # generation에 넣어둔 response를 버림
+    bump_generation(user_id)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_generation(user_id))
+
+
+def response_cache_key(request, view):
+    """ Return the cache key of the request for the view """
+    # query param 순서가 달라도 같은 key, detail이면 pk도 포함
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    lookup = urlencode(sorted(view.kwargs.items()))
+    digest = hashlib.md5((query + '#' + lookup).encode()).hexdigest()
+    return 'recipe:response:%s:%s:%s:%s:%s' % (
+        request.user.pk,
+        get_generation(request.user.pk),
+        view.__class__.__name__,
+        view.action,
+        digest,
+    )
+
+
+class CachedResponseMixin:
+    """ Cache the responses of cached_actions per user and query params
+
+    Views that implement get_validators() also get ETag/Last-Modified
+    headers and 304 answers. The validators are cached with the data, so
+    a conditional request that hits the cache runs no SQL either.
+    """
+    cached_actions = ('list',)
+
+    def get_validators(self):
+        """ Return (etag, last_modified datetime) or None if unsupported """
+        return None
+
+    def cached_response(self, request, build_response):
+        """ Return the cached response or build, cache and return it """
+        enabled = _config()['ENABLED'] and self.action in self.cached_actions
+        entry = None
+        if enabled:
+            key = response_cache_key(request, self)
+            entry = _cache().get(key)
+            metrics.CACHE_REQUESTS.inc(
+                cache='response', result='miss' if entry is None else 'hit'
+            )
+
+        if entry is not None:
+            # cache hit: SQL 없이 바로 응답
+            data, validators = entry
+        else:
+            validators = self.get_validators()
+
+        if validators is not None:
+            # If-None-Match/If-Modified-Since가 맞으면 serialize 없이 304
+            not_modified = get_conditional_response(
+                request, **self._conditional_kwargs(validators)
+            )
+            if not_modified is not None:
+                return self._set_validator_headers(not_modified, validators)
+
+        if entry is not None:
+            response = Response(data)
+        else:
+            response = build_response()
+            if enabled and response.status_code == 200:
+                # ReturnList/ReturnDict는 pickle할 때 serializer 참조를 버림
+                _cache().set(
+                    key, (response.data, validators), _config()['TIMEOUT']
+                )
+
+        if validators is not None and response.status_code == 200:
+            self._set_validator_headers(response, validators)
+        return response
+
+    def _conditional_kwargs(self, validators):
+        etag, last_modified = validators
+        if last_modified is not None:
+            last_modified = calendar.timegm(last_modified.utctimetuple())
+        return {'etag': quote_etag(etag), 'last_modified': last_modified}
+
+    def _set_validator_headers(self, response, validators):
+        kwargs = self._conditional_kwargs(validators)
+        response['ETag'] = kwargs['etag']
+        if kwargs['last_modified'] is not None:
+            response['Last-Modified'] = http_date(kwargs['last_modified'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(CachedResponseMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
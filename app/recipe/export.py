@@ -0,0 +1,92 @@
+# user의 recipe 전체를 NDJSON/CSV로 stream하는 generator들
+#
+# recipe를 server-side cursor(.iterator)로 chunk 단위로 읽고
+# chunk마다 tags, ingredients 이름을 through table에서 한번에 가져옴
+# iterator()는 prefetch_related를 무시해서 (Django 2.1) 직접 batch 처리
+# 메모리에는 항상 chunk 하나만 있으므로 recipe 개수와 상관없이 일정함
+
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from core.models import Recipe
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+COLUMNS = EXPORT_FIELDS + ('tags', 'ingredients')
+# CSV에서 여러 이름을 한 칸에 넣을 때 구분자
+NAME_SEPARATOR = '|'
+
+
+def _names_by_recipe(through, column, recipe_ids):
+    """ Return {recipe id: [names]} of one M2M for a chunk of recipes """
+    names = defaultdict(list)
+    rows = through.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', column + '__name'
+    ).order_by(column + '__name')
+    for recipe_id, name in rows:
+        names[recipe_id].append(name)
+
+    return names
+
+
+def iter_recipe_chunks(user, chunk_size):
+    """ Yield lists of recipe dicts with tag and ingredient names """
+    rows = Recipe.objects.filter(user=user).order_by('id').values_list(
+        *EXPORT_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        recipe_ids = [row[0] for row in chunk]
+        tags = _names_by_recipe(Recipe.tags.through, 'tag', recipe_ids)
+        ingredients = _names_by_recipe(
+            Recipe.ingredients.through, 'ingredient', recipe_ids
+        )
+        recipes = []
+        for row in chunk:
+            recipe = dict(zip(EXPORT_FIELDS, row))
+            recipe['tags'] = tags.get(recipe['id'], [])
+            recipe['ingredients'] = ingredients.get(recipe['id'], [])
+            recipes.append(recipe)
+        yield recipes
+
+
+def iter_ndjson(user, chunk_size):
+    """ Yield the recipes of the user as newline delimited JSON """
+    for recipes in iter_recipe_chunks(user, chunk_size):
+        # socket write를 줄이기 위해 chunk 단위로 yield
+        yield ''.join(
+            json.dumps(recipe, default=str) + '\n' for recipe in recipes
+        )
+
+
+class _Echo:
+    """ File-like object csv.writer writes to, returning the line """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(user, chunk_size):
+    """ Yield the recipes of the user as CSV with a header row """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for recipes in iter_recipe_chunks(user, chunk_size):
+        yield ''.join(
+            writer.writerow(
+                [recipe[field] for field in EXPORT_FIELDS] + [
+                    NAME_SEPARATOR.join(recipe['tags']),
+                    NAME_SEPARATOR.join(recipe['ingredients']),
+                ]
+            )
+            for recipe in recipes
+        )
+
+
+# ?output= 값 -> (generator, content type, 파일 확장자)
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (iter_csv, 'text/csv', 'csv'),
+}
@@ -0,0 +1,67 @@
+# serializer에서 쓰는 custom relation field
+#
+# DRF의 PrimaryKeyRelatedField(many=True)는 id 하나마다 queryset.get()을
+# 불러서 tags가 10개면 쿼리 10번, 게다가 다른 user의 tag도 통과시킴
+# 여기서는 request user의 object만 filter(pk__in=...) 쿼리 한번으로 가져옴
+
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+
+class UserOwnedManyRelatedField(serializers.ManyRelatedField):
+    """ Resolve every submitted pk with one query """
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk {pk_values} - objects do not exist.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = []
+        for item in data:
+            # JSON true/false는 int의 subclass라 따로 거름
+            if isinstance(item, bool) or not isinstance(item, (int, str)):
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+            try:
+                pks.append(int(item))
+            except ValueError:
+                self.child_relation.fail(
+                    'incorrect_type', data_type=type(item).__name__
+                )
+        # 같은 id를 두 번 보내도 한 번만, 순서는 유지
+        pks = list(dict.fromkeys(pks))
+
+        found = self.child_relation.get_queryset().in_bulk(pks)
+        missing = [pk for pk in pks if pk not in found]
+        if missing:
+            # 틀린 id를 하나씩이 아니라 한번에 알려줌
+            self.fail('does_not_exist', pk_values=', '.join(
+                '"%s"' % pk for pk in missing
+            ))
+
+        # 가져온 instance를 그대로 M2M 저장에 사용 (다시 조회 안함)
+        return [found[pk] for pk in pks]
+
+
+class UserOwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Primary key relation limited to objects of the request user """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(user=request.user)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserOwnedManyRelatedField(**list_kwargs)
@@ -0,0 +1,148 @@
+# process 메모리에 user별로 만들어 두는 index의 공통 부분
+# (recipe.search의 inverted index, recipe.similarity의 feature matrix)
+#
+# - 처음 쓸 때 DB에서 한번에 만들고 LRU로 user 수를 제한
+# - signal로 받은 변경은 commit 후에 queue에 넣었다가 다음 사용 전에 반영
+#   (rollback된 변경이 index에 들어가지 않게)
+# - index마다 recipe.cache의 generation을 기억. queue에 없는 변경으로
+#   generation이 바뀌었으면 (queryset.update(), 다른 process 등) 다시 만듦
+# - on_commit queue는 이 process의 변경만 받음. 다른 worker의 변경은
+#   generation으로만 알 수 있어서 RECIPE_RESPONSE_CACHE['ALIAS']가
+#   공유 cache여야 함. process별 cache면 max_age()가 지난 index를 다시 만듦
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+
+from recipe import cache
+
+
+class UserIndexes:
+    """ Per-user in-process indexes kept current with committed changes
+
+    Subclasses implement load_documents(), build_index(), max_users() and
+    max_age(). An index must provide add(recipe_id, document) and
+    remove(recipe_id) and have a writable generation attribute.
+    """
+    # 이보다 많이 쌓이면 하나씩 반영하는 것보다 다시 만드는 게 나음
+    max_queued = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # user id -> index, 오래 안 쓴 user부터 버림
+        self.indexes = OrderedDict()
+        # commit 됐지만 아직 index에 반영 안 된 변경
+        self.changed = set()
+        self.deleted = []
+
+    def load_documents(self, **filters):
+        """ Return {recipe id: (user id, document)} of filtered recipes """
+        raise NotImplementedError
+
+    def build_index(self, generation, documents):
+        """ Return a new index of (recipe id, document) pairs """
+        raise NotImplementedError
+
+    def max_users(self):
+        """ Return how many users' indexes are kept at most """
+        raise NotImplementedError
+
+    def max_age(self):
+        """ Return the seconds after which an index is rebuilt, 0 never """
+        raise NotImplementedError
+
+    def _fresh(self, index, generation):
+        if index.generation != generation:
+            return False
+        max_age = self.max_age()
+        return not max_age or time.monotonic() - index.built_at < max_age
+
+    def get_index(self, user_id):
+        """ Return the up to date index of the user, build it if needed """
+        self.apply_changes()
+        generation = cache.get_generation(user_id)
+        with self.lock:
+            index = self.indexes.get(user_id)
+            if index is not None and self._fresh(index, generation):
+                self.indexes.move_to_end(user_id)
+                return index
+
+        documents = self.load_documents(user_id=user_id)
+        index = self.build_index(generation, (
+            (recipe_id, document)
+            for recipe_id, (_, document) in documents.items()
+        ))
+        index.built_at = time.monotonic()
+        with self.lock:
+            self.indexes[user_id] = index
+            while len(self.indexes) > self.max_users():
+                self.indexes.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+            self.changed.clear()
+            self.deleted.clear()
+
+    def _loaded(self, user_id):
+        with self.lock:
+            return self.indexes.get(user_id)
+
+    def recipes_changed(self, recipe_ids):
+        """ Re-read the recipes once the transaction commits """
+        recipe_ids = list(recipe_ids)
+
+        def queue():
+            with self.lock:
+                self.changed.update(recipe_ids)
+                self._check_queue()
+        transaction.on_commit(queue)
+
+    def recipe_deleted(self, recipe_id, user_id):
+        """ Drop the recipe once the transaction commits """
+        def queue():
+            with self.lock:
+                self.deleted.append((recipe_id, user_id))
+                self._check_queue()
+        transaction.on_commit(queue)
+
+    def _check_queue(self):
+        # 너무 많이 쌓였으면 전부 버리고 다음에 쓸 때 새로 만듦
+        # (index를 아무도 안 쓰는 동안 계속 쌓이지 않게)
+        if len(self.changed) + len(self.deleted) > self.max_queued:
+            self.indexes.clear()
+            self.changed.clear()
+            self.deleted.clear()
+
+    def apply_changes(self):
+        """ Apply the queued changes to the loaded indexes """
+        with self.lock:
+            changed, self.changed = self.changed, set()
+            deleted, self.deleted = self.deleted, []
+            loaded = list(self.indexes)
+        users = set()
+        if changed and loaded:
+            # 변경된 recipe 수와 상관없이 load_documents 한번
+            documents = self.load_documents(
+                id__in=changed, user_id__in=loaded
+            )
+            for recipe_id, (user_id, document) in documents.items():
+                index = self._loaded(user_id)
+                if index is not None:
+                    index.add(recipe_id, document)
+                    users.add(user_id)
+        # 변경 후 삭제된 recipe는 위에서 안 읽히고 여기서 빠짐
+        for recipe_id, user_id in deleted:
+            index = self._loaded(user_id)
+            if index is not None:
+                index.remove(recipe_id)
+                users.add(user_id)
+        # queue에 들어온 변경들의 generation bump는 이미 끝났으니
+        # 지금 값이 이 index가 반영한 generation
+        for user_id in users:
+            index = self._loaded(user_id)
+            if index is not None:
+                index.generation = cache.get_generation(user_id)
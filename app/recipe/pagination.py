@@ -0,0 +1,168 @@
+# Recipe 앱 viewset들을 위한 pagination
+# settings.py의 RECIPE_PAGINATION으로 mode, page size를 설정한다
+
+import json
+import operator
+from functools import lru_cache, reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ConfigurablePageSizeMixin:
+    """ Read the page size limits from settings.RECIPE_PAGINATION """
+    # ?page_size=20 처럼 client가 page size를 고를 수 있음
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        """ Return the page size, None disables pagination """
+        config = settings.RECIPE_PAGINATION
+        # PAGE_SIZE가 0이면 client가 page_size를 줄 때만 paginate
+        self.page_size = config['PAGE_SIZE'] or None
+        self.max_page_size = config['MAX_PAGE_SIZE']
+        return super().get_page_size(request)
+
+
+class RecipeCursorPagination(ConfigurablePageSizeMixin, CursorPagination):
+    """ Keyset pagination, every page costs the same and needs no COUNT
+
+    DRF's cursor only holds the first ordering field and skips rows with
+    the same value by an offset capped at offset_cutoff. With orderings
+    like ('-recipe_count', '-name', 'id') thousands of rows can share the
+    first value, so the cursor here holds the values of every ordering
+    field and pages with a tuple comparison instead. The last field is
+    unique, so the offset is always 0.
+    """
+    # viewset마다 pagination_ordering으로 덮어씀
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # CursorPagination.paginate_queryset에서 position filter만 바꿈
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(
+                self._after(self._decode_position(current_position), reverse)
+            )
+
+        # 다음 page가 있는지 보려고 하나 더 가져옴
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _after(self, values, reverse):
+        """ Return a Q of the rows following the position in the ordering """
+        # (a, b, c) > (x, y, z)
+        #   == a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        # field마다 방향이 달라서 row 값 비교 대신 풀어서 씀
+        conditions = []
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            conditions.append(
+                Q(**equal) & Q(**{'%s__%s' % (name, lookup): value})
+            )
+            equal[name] = value
+        return reduce(operator.or_, conditions)
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _get_position_from_instance(self, instance, ordering):
+        # ordering의 모든 field 값. 마지막 field(id)가 unique라 겹치지 않음
+        return json.dumps([
+            instance[name] if isinstance(instance, dict)
+            else getattr(instance, name)
+            for name in (order.lstrip('-') for order in ordering)
+        ], default=str)
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        order[1:] if order.startswith('-') else '-' + order
+        for order in ordering
+    )
+
+
+class RecipePageNumberPagination(ConfigurablePageSizeMixin,
+                                 PageNumberPagination):
+    """ Classic ?page=N pagination with a total count """
+
+
+@lru_cache(maxsize=None)
+def _pagination_class(mode, ordering):
+    if mode == 'cursor':
+        # ordering별로 class를 하나씩 만들어서 cache
+        return type(
+            'RecipeCursorPagination',
+            (RecipeCursorPagination,),
+            {'ordering': ordering}
+        )
+    if mode == 'page':
+        return RecipePageNumberPagination
+
+    return None
+
+
+def get_pagination_class(ordering):
+    """ Return the pagination class configured for the given ordering """
+    return _pagination_class(
+        settings.RECIPE_PAGINATION['MODE'],
+        tuple(ordering)
+    )
+
+
+class ConfiguredPaginationMixin:
+    """ Paginate a viewset the way settings.RECIPE_PAGINATION says """
+    # cursor pagination의 ordering. 마지막 field는 unique해야 함
+    pagination_ordering = ('-id',)
+
+    @property
+    def pagination_class(self):
+        """ Return the pagination class configured in settings """
+        return get_pagination_class(self.pagination_ordering)
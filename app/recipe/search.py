@@ -0,0 +1,217 @@
+# RecipeViewSet ?search= backend들
+# settings.RECIPE_SEARCH['BACKEND']에 class의 dotted path를 설정
+#
+# PostgresSearchBackend: Recipe.search_vector + GIN index (기본값)
+# InvertedIndexSearchBackend: process 메모리 안의 user별 inverted index
+#   Postgres full text search를 못 쓰는 CI, SQLite 배포용
+#   token -> recipe id posting list를 정렬된 array('i')로 저장해서
+#   list of int보다 메모리가 훨씬 작고 교집합은 bisect로 구함
+
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, TrigramSimilarity
+)
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+
+from core import search as core_search
+from core.models import Tag, Ingredient, Recipe
+from recipe.indexes import UserIndexes
+
+TOKEN_RE = re.compile(r'\w+')
+# 모든 posting list가 비었을 때 공유하는 빈 array
+EMPTY_POSTING = array('i')
+
+
+def tokenize(text):
+    """ Return the set of lower cased words of the text """
+    return {token.casefold() for token in TOKEN_RE.findall(text)}
+
+
+class BaseSearchBackend:
+    """ Find the recipes of a user matching a search term """
+    # True면 결과가 relevance 순서라 cursor pagination을 쓸 수 없음
+    ranked = False
+
+    def search(self, queryset, term, user):
+        """ Return the recipes of queryset matching term """
+        raise NotImplementedError
+
+    def documents_changed(self, recipe_ids):
+        """ Called when title or tag/ingredient names of recipes changed """
+
+    def document_deleted(self, recipe_id, user_id):
+        """ Called when a recipe was deleted """
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """ Full text search over Recipe.search_vector """
+    ranked = True
+
+    def search(self, queryset, term, user):
+        config = settings.RECIPE_SEARCH['CONFIG']
+        query = SearchQuery(term, config=config)
+        # GIN index(core_recipe_search_idx)를 타고 rank 순서로
+        matches = queryset.annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).filter(search_vector=query).order_by('-rank', '-id')
+        if not core_search.trigram_available() or matches.exists():
+            return matches
+
+        # 결과가 없으면 오타일 수 있으니 tag/ingredient 이름을 trigram으로
+        threshold = settings.RECIPE_SEARCH['TRIGRAM_THRESHOLD']
+        similar = Q()
+        for model, through, column in (
+            (Tag, Recipe.tags.through, 'tag_id'),
+            (Ingredient, Recipe.ingredients.through, 'ingredient_id'),
+        ):
+            names = model.objects.filter(user=user).annotate(
+                similarity=TrigramSimilarity('name', term)
+            ).filter(similarity__gt=threshold)
+            similar |= Q(id__in=through.objects.filter(
+                **{column + '__in': names.values('id')}
+            ).values('recipe_id'))
+
+        return queryset.filter(similar)
+
+
+def load_documents(**filters):
+    """ Return {recipe id: (user id, tokens)} of the filtered recipes """
+    texts = {}
+    recipes = Recipe.objects.filter(**filters)
+    for pk, user_id, title in recipes.values_list('id', 'user_id', 'title'):
+        texts[pk] = (user_id, [title])
+
+    # recipe 하나씩이 아니라 through table마다 쿼리 한번
+    recipe_filters = {
+        'recipe__' + key: value for key, value in filters.items()
+    }
+    for through, name in ((Recipe.tags.through, 'tag__name'),
+                          (Recipe.ingredients.through, 'ingredient__name')):
+        rows = through.objects.filter(**recipe_filters).values_list(
+            'recipe_id', name
+        )
+        for recipe_id, text in rows:
+            if recipe_id in texts:
+                texts[recipe_id][1].append(text)
+
+    return {
+        pk: (user_id, frozenset(tokenize(' '.join(parts))))
+        for pk, (user_id, parts) in texts.items()
+    }
+
+
+class UserIndex:
+    """ Inverted index of the recipes of one user """
+
+    def __init__(self, generation, documents):
+        # 이 index가 반영한 recipe.cache의 generation
+        self.generation = generation
+        self.lock = threading.Lock()
+        # recipe id -> tokens, 수정/삭제 때 posting에서 빼기 위해 기억
+        self.documents = {}
+        postings = defaultdict(list)
+        for recipe_id, tokens in documents:
+            self.documents[recipe_id] = tokens
+            for token in tokens:
+                postings[token].append(recipe_id)
+        # token -> 정렬된 recipe id array
+        self.postings = {
+            token: array('i', sorted(ids)) for token, ids in postings.items()
+        }
+
+    def add(self, recipe_id, tokens):
+        with self.lock:
+            self._remove(recipe_id)
+            self.documents[recipe_id] = tokens
+            for token in tokens:
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = array('i')
+                insort(posting, recipe_id)
+
+    def remove(self, recipe_id):
+        with self.lock:
+            self._remove(recipe_id)
+
+    def _remove(self, recipe_id):
+        for token in self.documents.pop(recipe_id, ()):
+            posting = self.postings[token]
+            del posting[bisect_left(posting, recipe_id)]
+            if not posting:
+                del self.postings[token]
+
+    def search(self, tokens):
+        """ Return the ids of the recipes containing every token """
+        with self.lock:
+            # 가장 짧은 posting list를 돌면서 나머지에 있는지 bisect로 확인
+            postings = sorted(
+                (self.postings.get(token, EMPTY_POSTING) for token in tokens),
+                key=len
+            )
+            if not postings:
+                return []
+            shortest, others = postings[0], postings[1:]
+            return [
+                recipe_id for recipe_id in shortest
+                if all(_contains(posting, recipe_id) for posting in others)
+            ]
+
+
+def _contains(posting, recipe_id):
+    i = bisect_left(posting, recipe_id)
+    return i < len(posting) and posting[i] == recipe_id
+
+
+class InvertedIndexSearchBackend(UserIndexes, BaseSearchBackend):
+    """ Search an in-memory inverted index of each user's recipes
+
+    An index is built with three queries the first time a user searches
+    and is kept current as described in recipe.indexes. The indexes live
+    in the process, so this backend is meant for tests, CI and single
+    process SQLite deployments.
+    """
+
+    def search(self, queryset, term, user):
+        tokens = tokenize(term)
+        if not tokens:
+            return queryset.none()
+        ids = self.get_index(user.pk).search(tokens)
+        return queryset.filter(id__in=ids)
+
+    def load_documents(self, **filters):
+        return load_documents(**filters)
+
+    def build_index(self, generation, documents):
+        return UserIndex(generation, documents)
+
+    def max_users(self):
+        return settings.RECIPE_SEARCH['INDEX_MAX_USERS']
+
+    def max_age(self):
+        return settings.RECIPE_SEARCH['INDEX_MAX_AGE']
+
+    def documents_changed(self, recipe_ids):
+        self.recipes_changed(recipe_ids)
+
+    def document_deleted(self, recipe_id, user_id):
+        self.recipe_deleted(recipe_id, user_id)
+
+
+_backends = {}
+
+
+def get_search_backend():
+    """ Return the backend configured in settings.RECIPE_SEARCH """
+    path = settings.RECIPE_SEARCH['BACKEND']
+    backend = _backends.get(path)
+    if backend is None:
+        # in-memory index는 process에 하나만 있어야 함
+        backend = _backends.setdefault(path, import_string(path)())
+    return backend
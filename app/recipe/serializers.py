@@ -1,31 +1,37 @@
 from rest_framework import serializers
 # Meta 클래스에서 model을 맞춰줘야 하기 때문에 대상 model import함
+from core.middleware import TimedSerializerMixin
 from core.models import Tag, Ingredient, Recipe
+from recipe.bulk import BulkListSerializer, apply_m2m_diff
+from recipe.fields import UserOwnedPrimaryKeyRelatedField
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for tag objects """
     
     class Meta:
         model = Tag
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
+        # many=True일 때 bulk API용 ListSerializer
+        list_serializer_class = BulkListSerializer
         extra_kwargs = {
             'id' : {'read_only':True},
         }
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for ingredient objects """
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name')
+        fields = ('id', 'name', 'recipe_count')
+        list_serializer_class = BulkListSerializer
         extra_kwargs = {
             'id' : {'read_only': True}
         }
 
     
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """ Serializer for recipe objects """
     # ingredients, tags는 Recipe 모델의 field가 아니니
     # Reference해줘야 한다
@@ -33,14 +39,15 @@ class RecipeSerializer(serializers.ModelSerializer):
     # PrimaryKeyRelatedField
     # 모든 field만 가져오는 게 아니고 PrimaryKey, 즉 여기선
     # Id만을 가져온다
-    ingredients = serializers.PrimaryKeyRelatedField(
+    # request user의 것만, 보낸 id 전체를 쿼리 한번으로 확인
+    ingredients = UserOwnedPrimaryKeyRelatedField(
         # Many to Many
         many = True, 
         # list ingredient objects with their primary key, id
         queryset = Ingredient.objects.all()
     )
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = UserOwnedPrimaryKeyRelatedField(
         many = True,
         queryset = Tag.objects.all()
     )
@@ -48,13 +55,36 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe 
         fields = ('id','title','ingredients','tags','time_minutes','price','link')
+        list_serializer_class = BulkListSerializer
         extra_kwargs = {
             'id' : {'read_only': True}
         }
 
+    def update(self, instance, validated_data):
+        """ Update the recipe, writing only the changed M2M links """
+        # ModelSerializer.update는 set()으로 바뀌지 않은 link까지
+        # 지우고 다시 넣음. 보낸 field만 diff를 구해서 바뀐 row만 씀
+        links = {
+            name: validated_data.pop(name)
+            for name in ('tags', 'ingredients')
+            if name in validated_data
+        }
+        instance = super().update(instance, validated_data)
+        for name, objs in links.items():
+            apply_m2m_diff(instance, name, objs)
+
+        return instance
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """ Serialize a recipe detail """
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
-    
\ No newline at end of file
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """ Serialize a recipe with its similarity to another recipe """
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('similarity',)
@@ -0,0 +1,99 @@
+# recipe API의 cache를 model 변경에 맞춰 invalidate하는 signal receiver
+# RecipeConfig.ready()에서 import 되면서 연결된다
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.models import Tag, Ingredient, Recipe
+from core.search import search_documents_changed
+from core.signals import bulk_changed
+from recipe import cache
+from recipe.search import get_search_backend
+from recipe.similarity import similar_recipes
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """ Invalidate the owner's cached responses """
+    cache.invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_responses_m2m(sender, instance, action, **kwargs):
+    """ Invalidate the owner's cached responses when links change """
+    # recipe.tags.add()면 instance가 Recipe, tag.recipe_set.add()면 Tag
+    # 둘 다 user_id가 있음
+    if action.startswith('post_'):
+        cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_new_user_responses(sender, instance, created, **kwargs):
+    """ Start a fresh generation for a new user """
+    # 지워진 user의 id가 재사용되어도 옛 cache를 보지 않게
+    if created:
+        cache.bump_generation(instance.pk)
+
+
+@receiver(bulk_changed)
+def invalidate_bulk_changed_responses(sender, user, **kwargs):
+    """ Invalidate the user's cached responses after a bulk load """
+    cache.invalidate_user(user.pk)
+
+
+@receiver(search_documents_changed)
+def update_search_documents(sender, recipe_ids, **kwargs):
+    """ Let the search backend re-read the changed recipes """
+    get_search_backend().documents_changed(recipe_ids)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_search_document(sender, instance, **kwargs):
+    """ Let the search backend drop the deleted recipe """
+    get_search_backend().document_deleted(instance.pk, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_similar_recipes(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """ Re-read the features of the recipes whose links changed """
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        similar_recipes.recipes_changed([instance.pk])
+    elif action == 'post_clear':
+        # core.signals가 pre_clear에서 기억해 둔 recipe들
+        similar_recipes.recipes_changed(
+            getattr(instance, '_cleared_recipe_ids', [])
+        )
+    else:
+        similar_recipes.recipes_changed(pk_set)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_similar_recipes_on_delete(sender, instance, **kwargs):
+    """ A deleted tag or ingredient is unlinked without m2m_changed """
+    similar_recipes.recipes_changed(
+        getattr(instance, '_linked_recipe_ids', [])
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_similar_recipe(sender, instance, **kwargs):
+    similar_recipes.recipe_deleted(instance.pk, instance.user_id)
+
+
+@receiver(bulk_changed)
+def update_bulk_changed_similar_recipes(sender, recipe_ids=None, **kwargs):
+    """ bulk_create and COPY write links without m2m_changed """
+    if recipe_ids:
+        similar_recipes.recipes_changed(recipe_ids)
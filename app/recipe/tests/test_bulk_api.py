@@ -0,0 +1,231 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+
+
+def sample_recipe(user, title='Curry'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class BulkApiTests(TestCase):
+    """ Test the bulk endpoints of the recipe API """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+
+    def test_bulk_create_recipes(self):
+        """ Test a list of recipes is created with its links """
+        payload = [
+            {'title': 'Recipe %d' % i, 'time_minutes': i, 'price': '1.00',
+             'tags': [self.vegan.id, self.dinner.id],
+             'ingredients': [self.rice.id]}
+            for i in range(10)
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['title'] for r in res.data],
+                         [p['title'] for p in payload])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 10)
+        recipe = Recipe.objects.get(id=res.data[3]['id'])
+        self.assertEqual(set(recipe.tags.all()), {self.vegan, self.dinner})
+        self.assertEqual(list(recipe.ingredients.all()), [self.rice])
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.recipe_count, 10)
+
+    def test_bulk_create_queries_do_not_grow(self):
+        """ Test the writes do not run a query per recipe """
+        def payload(count):
+            return [
+                {'title': 'Recipe', 'time_minutes': 1, 'price': '1.00',
+                 'tags': [], 'ingredients': []}
+                for _ in range(count)
+            ]
+
+        # savepoint 2 + INSERT 1 + search_vector UPDATE 1
+        # + response (recipes, tags, ingredients) 3
+        with self.assertNumQueries(7):
+            self.client.post(RECIPES_BULK_URL, payload(2), format='json')
+        with self.assertNumQueries(7):
+            self.client.post(RECIPES_BULK_URL, payload(20), format='json')
+
+    def test_bulk_create_reports_item_errors(self):
+        """ Test invalid items are reported by position, nothing is saved """
+        payload = [
+            {'title': 'Good', 'time_minutes': 1, 'price': '1.00',
+             'tags': [], 'ingredients': []},
+            {'title': 'Bad', 'time_minutes': 'soon', 'price': '1.00',
+             'tags': [], 'ingredients': []},
+        ]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(RECIPE_BULK={'MAX_BATCH_SIZE': 2})
+    def test_bulk_batch_size_limit(self):
+        """ Test batches above the limit are rejected """
+        res = self.client.post(
+            TAGS_BULK_URL, [{'name': 'a'}, {'name': 'b'}, {'name': 'c'}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_bulk_requires_list(self):
+        """ Test a single object body is rejected """
+        res = self.client.post(TAGS_BULK_URL, {'name': 'a'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_recipes(self):
+        """ Test fields and links of many recipes are updated """
+        curry = sample_recipe(self.user, 'Curry')
+        curry.tags.add(self.vegan)
+        soup = sample_recipe(self.user, 'Soup')
+        soup.tags.add(self.vegan)
+        past = timezone.now() - timezone.timedelta(days=1)
+        Recipe.objects.update(updated_at=past)
+
+        res = self.client.patch(RECIPES_BULK_URL, [
+            {'id': curry.id, 'title': 'Red curry', 'tags': [self.dinner.id]},
+            {'id': soup.id, 'price': '7.50'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        curry.refresh_from_db()
+        soup.refresh_from_db()
+        self.assertEqual(curry.title, 'Red curry')
+        self.assertEqual(list(curry.tags.all()), [self.dinner])
+        self.assertEqual(str(soup.price), '7.50')
+        self.assertEqual(soup.title, 'Soup')
+        self.assertEqual(list(soup.tags.all()), [self.vegan])
+        self.assertGreater(soup.updated_at, past)
+        self.assertEqual(res.data[0]['tags'], [self.dinner.id])
+        # curry의 link가 vegan -> dinner로 옮겨감
+        self.vegan.refresh_from_db()
+        self.dinner.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+        self.assertEqual(self.dinner.recipe_count, 1)
+
+    def test_bulk_update_other_users_recipe(self):
+        """ Test recipes of another user are reported as not found """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        recipe = sample_recipe(self.user)
+        foreign = sample_recipe(other, 'Foreign')
+
+        res = self.client.patch(RECIPES_BULK_URL, [
+            {'id': recipe.id, 'title': 'Mine'},
+            {'id': foreign.id, 'title': 'Stolen'},
+            {'title': 'No id'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        self.assertIn('id', res.data[2])
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.title, 'Foreign')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Curry')
+
+    def test_bulk_rename_tags_touches_recipes(self):
+        """ Test renaming tags in bulk marks their recipes as changed """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(self.vegan)
+        past = timezone.now() - timezone.timedelta(days=1)
+        Recipe.objects.update(updated_at=past)
+
+        res = self.client.patch(TAGS_BULK_URL, [
+            {'id': self.vegan.id, 'name': 'Plant based'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.vegan.id, 'name': 'Plant based', 'recipe_count': 1}
+        ])
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, past)
+
+    def test_bulk_ignores_list_filters(self):
+        """ Test ?assigned_only= does not hide the objects of a bulk call """
+        url = TAGS_BULK_URL + '?assigned_only=1'
+
+        res = self.client.post(url, [{'name': 'Lunch'}], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['name'] for tag in res.data], ['Lunch'])
+
+        res = self.client.patch(url, [
+            {'id': self.vegan.id, 'name': 'Plant based'},
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.delete(url, [self.dinner.id], format='json')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Tag.objects.filter(id=self.dinner.id).exists())
+
+    def test_bulk_delete_recipes(self):
+        """ Test a list of recipes is deleted """
+        first = sample_recipe(self.user)
+        second = sample_recipe(self.user)
+        kept = sample_recipe(self.user)
+
+        res = self.client.delete(
+            RECIPES_BULK_URL, [first.id, second.id], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recipe.objects.all()), [kept])
+        self.assertEqual(
+            set(Tombstone.objects.values_list('object_id', flat=True)),
+            {first.id, second.id}
+        )
+
+    def test_bulk_delete_missing(self):
+        """ Test nothing is deleted when an id is unknown """
+        recipe = sample_recipe(self.user)
+
+        res = self.client.delete(
+            RECIPES_BULK_URL, [recipe.id, recipe.id + 100], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_boolean_ids_rejected(self):
+        """ Test JSON booleans are not taken as ids 1 and 0 """
+        recipe = sample_recipe(self.user)
+        Recipe.objects.filter(id=recipe.id).update(id=1)
+
+        res = self.client.delete(RECIPES_BULK_URL, [True], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.patch(RECIPES_BULK_URL, [
+            {'id': True, 'title': 'Changed'},
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Recipe.objects.get(id=1).title, 'Curry')
@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+NO_RESPONSE_CACHE = {'ENABLED': False, 'ALIAS': 'default', 'TIMEOUT': 60}
+RESPONSE_CACHE = dict(NO_RESPONSE_CACHE, ENABLED=True)
+
+
+def detail_url(recipe_id):
+    """ Return recipe detail URL """
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=RESPONSE_CACHE)
+class ConditionalGetTests(TestCase):
+    """ Test ETag and Last-Modified handling of the recipe API """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5.00
+        )
+
+    def test_list_sends_validators(self):
+        """ Test the recipe list has ETag and Last-Modified headers """
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+    @override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+    def test_list_not_modified_single_query(self):
+        """ Test an unchanged list is answered 304 from one aggregate """
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_not_modified_from_cache(self):
+        """ Test a cached list is answered 304 without SQL """
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_after_m2m_change(self):
+        """ Test adding a tag to a recipe changes the list ETag """
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_modified_after_delete(self):
+        """ Test deleting a recipe changes the list ETag """
+        Recipe.objects.create(
+            user=self.user, title='Steak', time_minutes=10, price=5.00
+        )
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.delete()
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_query(self):
+        """ Test a filtered list does not share the unfiltered ETag """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': str(tag.id)}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+    def test_detail_if_modified_since(self):
+        """ Test the detail answers If-Modified-Since with 304 """
+        url = detail_url(self.recipe.id)
+        last_modified = self.client.get(url)['Last-Modified']
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_after_tag_rename(self):
+        """ Test renaming a tag changes the details that embed it """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        tag.name = 'Plant based'
+        tag.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Plant based')
+
+    @override_settings(RECIPE_RESPONSE_CACHE=NO_RESPONSE_CACHE)
+    def test_detail_modified_after_tag_recount(self):
+        """ Test another recipe using the tag changes the detail ETag """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10, price=5.00
+        ).tags.add(tag)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['recipe_count'], 2)
+
+    def test_detail_missing_recipe(self):
+        """ Test a missing recipe is still a 404 """
+        res = self.client.get(detail_url(self.recipe.id + 1000))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.views import RecipeViewSet
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def content(res):
+    """ Return the joined body of a streaming response """
+    return b''.join(res.streaming_content).decode()
+
+
+class ExportApiTests(TestCase):
+    """ Test the streaming export of the recipe API """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5.50
+        )
+        self.recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Dinner'),
+        )
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice')
+        )
+
+    def test_export_ndjson(self):
+        """ Test the default export is one JSON object per line """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=1.00
+        )
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = content(res).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]), {
+            'id': self.recipe.id,
+            'title': 'Curry',
+            'time_minutes': 10,
+            'price': '5.50',
+            'link': '',
+            'tags': ['Dinner', 'Vegan'],
+            'ingredients': ['Rice'],
+        })
+
+    def test_export_csv(self):
+        """ Test the CSV export joins names with a separator """
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry')
+        self.assertEqual(rows[0]['tags'], 'Dinner|Vegan')
+        self.assertEqual(rows[0]['ingredients'], 'Rice')
+
+    def test_export_invalid_output(self):
+        """ Test an unknown output format is rejected """
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_queries_per_chunk(self):
+        """ Test tags and ingredients are fetched once per chunk """
+        for i in range(4):
+            Recipe.objects.create(
+                user=self.user, title='Recipe %d' % i,
+                time_minutes=1, price=1.00
+            )
+
+        chunk_size = RecipeViewSet.export_chunk_size
+        RecipeViewSet.export_chunk_size = 2
+        self.addCleanup(
+            setattr, RecipeViewSet, 'export_chunk_size', chunk_size
+        )
+        res = self.client.get(EXPORT_URL)
+        # recipe cursor 1번 + chunk 3개 x (tags, ingredients)
+        with self.assertNumQueries(7):
+            lines = content(res).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        ids = [json.loads(line)['id'] for line in lines]
+        self.assertEqual(ids, sorted(ids))
@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, title):
+    """ Create and return a sample recipe """
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class PaginationApiTests(TestCase):
+    """ Test paginating the recipe API lists """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url):
+        """ Follow the next links and return all results and the queries """
+        results = []
+        queries = []
+        while url:
+            # 같은 page를 반복하는 cursor에서 끝나지 않는 것 방지
+            self.assertLess(len(results), 10000, 'next never ends')
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            queries.extend(q['sql'] for q in ctx.captured_queries)
+            results.extend(res.data['results'])
+            url = res.data['next']
+
+        return results, queries
+
+    def test_unpaginated_by_default(self):
+        """ Test lists stay plain lists when no page size is configured """
+        sample_recipe(self.user, 'Curry')
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data), 1)
+
+    def test_recipes_cursor_pagination(self):
+        """ Test walking the recipes with a cursor """
+        recipes = [sample_recipe(self.user, 'Recipe %d' % i) for i in range(5)]
+
+        results, queries = self._walk(RECIPE_URL + '?page_size=2')
+
+        ids = [recipe.id for recipe in reversed(recipes)]
+        self.assertEqual([item['id'] for item in results], ids)
+        # keyset pagination이라 page 쿼리에 COUNT(*)가 없어야 함
+        # (COUNT는 ETag용 aggregate 쿼리에만 있음)
+        page_queries = [q for q in queries if 'LIMIT' in q.upper()]
+        self.assertEqual(len(page_queries), 3)
+        self.assertFalse([q for q in page_queries if 'COUNT(' in q.upper()])
+        self.assertFalse([
+            q for q in queries
+            if 'COUNT(' in q.upper() and 'MAX(' not in q.upper()
+        ])
+
+    def test_tags_cursor_pagination(self):
+        """ Test walking tags ordered by -name, id with a cursor """
+        for name in ('Vegan', 'Dessert', 'Dessert', 'Breakfast', 'Curry'):
+            Tag.objects.create(user=self.user, name=name)
+
+        results, queries = self._walk(TAGS_URL + '?page_size=2')
+
+        expected = Tag.objects.order_by('-name', 'id')
+        self.assertEqual(
+            [item['id'] for item in results],
+            [tag.id for tag in expected]
+        )
+
+    def test_popular_cursor_with_many_ties(self):
+        """ Test more tied recipe counts than DRF's offset cutoff """
+        # DRF cursor는 첫 field로만 위치를 잡고 offset이 1000까지라
+        # recipe_count가 같은 tag가 1000개를 넘으면 같은 page가 반복됐음
+        Tag.objects.bulk_create([
+            Tag(user=self.user, name='Tag %04d' % i) for i in range(1300)
+        ])
+        popular = Tag.objects.create(user=self.user, name='Used')
+        popular.recipe_set.add(sample_recipe(self.user, 'Curry'))
+
+        results, _ = self._walk(TAGS_URL + '?ordering=popular&page_size=100')
+
+        expected = Tag.objects.order_by('-recipe_count', '-name', 'id')
+        self.assertEqual(
+            [item['id'] for item in results],
+            list(expected.values_list('id', flat=True))
+        )
+        self.assertEqual(results[0]['id'], popular.id)
+
+    def test_cursor_previous_link(self):
+        """ Test the previous link returns the page before """
+        for i in range(5):
+            Tag.objects.create(user=self.user, name='Tag %d' % i)
+        first = self.client.get(TAGS_URL + '?page_size=2')
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(res.data['previous'])
+
+    @override_settings(RECIPE_PAGINATION={
+        'MODE': 'cursor', 'PAGE_SIZE': 3, 'MAX_PAGE_SIZE': 4,
+    })
+    def test_page_size_settings(self):
+        """ Test the configured default and maximum page size """
+        for i in range(6):
+            sample_recipe(self.user, 'Recipe %d' % i)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(len(res.data['results']), 3)
+
+        res = self.client.get(RECIPE_URL + '?page_size=100')
+        self.assertEqual(len(res.data['results']), 4)
+
+    @override_settings(RECIPE_PAGINATION={
+        'MODE': 'page', 'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 100,
+    })
+    def test_page_number_mode(self):
+        """ Test the page number mode reports a total count """
+        for i in range(3):
+            sample_recipe(self.user, 'Recipe %d' % i)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(len(res.data['results']), 2)
+
+    @override_settings(RECIPE_PAGINATION={
+        'MODE': 'none', 'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 100,
+    })
+    def test_pagination_disabled(self):
+        """ Test the pagination can be switched off """
+        for i in range(3):
+            sample_recipe(self.user, 'Recipe %d' % i)
+
+        res = self.client.get(RECIPE_URL + '?page_size=1')
+        self.assertEqual(len(res.data), 3)
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -173,6 +175,57 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
 
+    def test_create_recipe_with_other_users_tag(self):
+        """ Test tags of another user can not be linked """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        tag = sample_tag(other, 'Foreign')
+        payload = {
+            'title': 'Curry', 'tags': [tag.id],
+            'time_minutes': 10, 'price': 5.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', res.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_reports_missing_ids_together(self):
+        """ Test every unknown id is listed in one error """
+        tag = sample_tag(self.user)
+        payload = {
+            'title': 'Curry', 'tags': [tag.id, tag.id + 100, tag.id + 200],
+            'time_minutes': 10, 'price': 5.00
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        message = str(res.data['tags'][0])
+        self.assertIn(str(tag.id + 100), message)
+        self.assertIn(str(tag.id + 200), message)
+
+    def test_create_recipe_tag_lookup_query_count_constant(self):
+        """ Test submitted tags are resolved in one query """
+        def create(tag_count):
+            tags = [
+                sample_tag(self.user, 'Tag %d' % i) for i in range(tag_count)
+            ]
+            payload = {
+                'title': 'Curry', 'tags': [tag.id for tag in tags],
+                'time_minutes': 10, 'price': 5.00
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPE_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            # id로 tag를 찾는 쿼리만 (M2M 저장, response 쿼리 제외)
+            lookups = [
+                query for query in ctx.captured_queries
+                if 'FROM "core_tag" WHERE' in query['sql']
+            ]
+            return len(lookups)
+
+        self.assertEqual(create(1), 1)
+        self.assertEqual(create(5), 1)
+
     # Updating recipes
     """ Update는 ModelViewset에 빌트인되어있어서
     perform_create 안 넣어줘도 그냥 pass된다 """
@@ -215,4 +268,152 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(recipe.price, payload['price'])
         # payload에 tags가 없음
         tags = recipe.tags.all()
-        self.assertEqual(len(tags), 0)
\ No newline at end of file
+        self.assertEqual(len(tags), 0)
+
+    def _through_writes(self, ctx):
+        """ Return the INSERT/DELETE queries on the M2M through tables """
+        return [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith(('INSERT', 'DELETE')) and
+            ('"core_recipe_tags"' in query['sql'] or
+             '"core_recipe_ingredients"' in query['sql'])
+        ]
+
+    def test_update_unchanged_tags_writes_no_links(self):
+        """ Test a PUT with the same tags does not rewrite the links """
+        recipe = sample_recipe(self.user)
+        tag = sample_tag(self.user)
+        ingredient = sample_ingredient(self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        payload = {
+            'title': 'Renamed', 'time_minutes': 10, 'price': 5.00,
+            'tags': [tag.id], 'ingredients': [ingredient.id]
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.put(detail_url(recipe.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._through_writes(ctx), [])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Renamed')
+
+    def test_patch_without_tags_skips_links(self):
+        """ Test a PATCH without tags does not touch the through tables """
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(sample_tag(self.user))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(detail_url(recipe.id), {'title': 'Renamed'})
+
+        # response의 tags 조회 말고는 through table을 건드리지 않음
+        self.assertFalse([
+            query for query in ctx.captured_queries
+            if 'FROM "core_recipe_tags" WHERE' in query['sql']
+        ])
+        self.assertEqual(self._through_writes(ctx), [])
+        self.assertEqual(recipe.tags.count(), 1)
+
+    def test_update_tags_writes_only_delta(self):
+        """ Test changing tags deletes and inserts only the difference """
+        recipe = sample_recipe(self.user)
+        kept = sample_tag(self.user, 'Kept')
+        dropped = sample_tag(self.user, 'Dropped')
+        added = sample_tag(self.user, 'Added')
+        recipe.tags.add(kept, dropped)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.patch(
+                detail_url(recipe.id), {'tags': [kept.id, added.id]}
+            )
+
+        writes = self._through_writes(ctx)
+        self.assertEqual(
+            [sql.split()[0] for sql in writes], ['DELETE', 'INSERT']
+        )
+        self.assertIn('(%d, %d)' % (recipe.id, added.id), writes[1])
+        self.assertNotIn('(%d, %d)' % (recipe.id, kept.id), writes[1])
+        self.assertEqual(set(recipe.tags.all()), {kept, added})
+
+    def _count_queries(self, url):
+        """ Return the number of queries a GET request to url runs """
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_list_recipes_query_count_constant(self):
+        """ Test listing recipes does not query per recipe (N+1) """
+        tag = sample_tag(self.user)
+        ingredient = sample_ingredient(self.user)
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        few = self._count_queries(RECIPE_URL)
+
+        for i in range(10):
+            recipe = sample_recipe(self.user, title='Recipe %d' % i)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        many = self._count_queries(RECIPE_URL)
+
+        self.assertEqual(few, many)
+        # ETag aggregate + recipes + tags + ingredients
+        self.assertLessEqual(many, 4)
+
+    def test_view_recipe_detail_query_count(self):
+        """ Test the recipe detail prefetches nested tags and ingredients """
+        recipe = sample_recipe(self.user)
+        for name in ('Vegan', 'Dessert', 'Spicy'):
+            recipe.tags.add(sample_tag(self.user, name))
+            recipe.ingredients.add(sample_ingredient(self.user, name))
+
+        self.assertLessEqual(self._count_queries(detail_url(recipe.id)), 4)
+
+    def test_filter_recipes_by_tags(self):
+        """ Test returning recipes with any of the given tags """
+        recipe1 = sample_recipe(self.user, title='Thai vegetable curry')
+        recipe2 = sample_recipe(self.user, title='Aubergine with tahini')
+        recipe3 = sample_recipe(self.user, title='Fish and chips')
+        tag1 = sample_tag(self.user, 'Vegan')
+        tag2 = sample_tag(self.user, 'Vegetarian')
+        recipe1.tags.add(tag1)
+        recipe2.tags.add(tag2)
+
+        res = self.client.get(
+            RECIPE_URL, {'tags': '{},{}'.format(tag1.id, tag2.id)}
+        )
+
+        ids = [item['id'] for item in res.data]
+        self.assertEqual(ids, [recipe2.id, recipe1.id])
+        self.assertNotIn(recipe3.id, ids)
+
+    def test_filter_recipes_by_all_tags_and_ingredient(self):
+        """ Test returning recipes having every given tag and ingredient """
+        tag1 = sample_tag(self.user, 'Vegan')
+        tag2 = sample_tag(self.user, 'Dessert')
+        ingredient = sample_ingredient(self.user, 'Cocoa')
+        both = sample_recipe(self.user, title='Vegan brownies')
+        both.tags.add(tag1, tag2)
+        both.ingredients.add(ingredient)
+        no_ingredient = sample_recipe(self.user, title='Vegan sorbet')
+        no_ingredient.tags.add(tag1, tag2)
+        one_tag = sample_recipe(self.user, title='Vegan cocoa soup')
+        one_tag.tags.add(tag1)
+        one_tag.ingredients.add(ingredient)
+
+        # ETag aggregate + recipes + tags + ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL, {
+                'tags': '{},{}'.format(tag1.id, tag2.id),
+                'ingredients': str(ingredient.id),
+                'match': 'all',
+            })
+
+        self.assertEqual([item['id'] for item in res.data], [both.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """ Test filtering by a non numeric id is a bad request """
+        res = self.client.get(RECIPE_URL, {'tags': 'vegan'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
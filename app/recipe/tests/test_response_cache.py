@@ -0,0 +1,156 @@
+from django.contrib.auth import get_user_model
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+RESPONSE_CACHE = {'ENABLED': True, 'ALIAS': 'default', 'TIMEOUT': 60}
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=RESPONSE_CACHE)
+class ResponseCacheTests(TestCase):
+    """ Test caching the recipe API list responses per user """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        # force_authenticate 대신 실제 token으로 (auth도 cache됨)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5.00
+        )
+
+    def test_cache_hit_runs_no_sql(self):
+        """ Test a repeated list request is served without SQL """
+        for url in (TAGS_URL, INGREDIENTS_URL, RECIPE_URL):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(first.data, second.data)
+
+    def test_query_params_cached_separately(self):
+        """ Test different query params are different cache entries """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        Recipe.objects.create(
+            user=self.user, title='Steak', time_minutes=10, price=5.00
+        )
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, {'tags': str(tag.id)})
+
+        self.assertEqual([item['id'] for item in res.data], [self.recipe.id])
+
+    def test_create_invalidates(self):
+        """ Test creating a tag through the API shows up in the list """
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([item['name'] for item in res.data], ['Vegan'])
+
+    def test_m2m_change_invalidates(self):
+        """ Test adding a tag to a recipe shows up in the recipe list """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['tags'], [tag.id])
+
+    def test_reverse_m2m_change_invalidates(self):
+        """ Test linking from the ingredient side invalidates too """
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.client.get(RECIPE_URL)
+        ingredient.recipe_set.add(self.recipe)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['ingredients'], [ingredient.id])
+
+    def test_delete_invalidates(self):
+        """ Test deleting a recipe removes it from the list """
+        self.client.get(RECIPE_URL)
+        self.client.delete(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_cache_is_per_user(self):
+        """ Test users never see each other's cached responses """
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com',
+            'testpass'
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    @override_settings(RECIPE_RESPONSE_CACHE={
+        'ENABLED': False, 'ALIAS': 'default', 'TIMEOUT': 60,
+    })
+    def test_cache_disabled(self):
+        """ Test the cache can be switched off """
+        self.client.get(TAGS_URL)
+        with self.assertNumQueries(1):
+            self.client.get(TAGS_URL)
+
+
+class ResponseCacheCommitTests(TransactionTestCase):
+    """ Test writes in a transaction invalidate again after the commit """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+
+    @patch('recipe.cache.bump_generation')
+    def test_bump_after_commit(self, bump_generation):
+        """ Test responses cached from pre-commit rows are dropped """
+        with transaction.atomic():
+            Recipe.objects.create(
+                user=self.user, title='Curry', time_minutes=10, price=5.00
+            )
+            self.assertEqual(bump_generation.call_count, 1)
+
+        self.assertEqual(bump_generation.call_count, 2)
+        bump_generation.assert_called_with(self.user.pk)
+
+    @patch('recipe.cache.bump_generation')
+    def test_no_bump_after_rollback(self, bump_generation):
+        """ Test a rolled back write is not bumped twice """
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                Recipe.objects.create(
+                    user=self.user, title='Curry', time_minutes=10,
+                    price=5.00
+                )
+                raise ValueError
+
+        self.assertEqual(bump_generation.call_count, 1)
@@ -0,0 +1,114 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.search import trigram_available
+from core.models import Recipe, Tag, Ingredient
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, title):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Postgres full text search')
+class RecipeSearchTests(TestCase):
+    """ Test ?search= of the recipe list """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, term, **params):
+        res = self.client.get(RECIPE_URL, dict(params, search=term))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def ids(self, res):
+        return [recipe['id'] for recipe in res.data]
+
+    def test_search_title(self):
+        """ Test recipes are found by words of the title, stemmed """
+        curry = sample_recipe(self.user, 'Thai green curry')
+        sample_recipe(self.user, 'Pancakes')
+
+        res = self.search('curries')
+
+        self.assertEqual(self.ids(res), [curry.id])
+
+    def test_search_tag_and_ingredient_names(self):
+        """ Test recipes are found by their tag and ingredient names """
+        by_tag = sample_recipe(self.user, 'Pancakes')
+        by_tag.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        by_ingredient = sample_recipe(self.user, 'Omelette')
+        by_ingredient.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Spinach')
+        )
+
+        self.assertEqual(self.ids(self.search('breakfast')), [by_tag.id])
+        self.assertEqual(self.ids(self.search('spinach')), [by_ingredient.id])
+
+    def test_search_ranks_title_first(self):
+        """ Test a title match ranks above a tag match """
+        tagged = sample_recipe(self.user, 'Pancakes')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        titled = sample_recipe(self.user, 'Vegan burger')
+        # 더 오래된 recipe가 rank 때문에 먼저 나오는지 확인
+        Recipe.objects.filter(id=titled.id).update(id=tagged.id - 1)
+
+        res = self.search('vegan')
+
+        self.assertEqual(self.ids(res), [tagged.id - 1, tagged.id])
+
+    def test_search_follows_renames_and_deletes(self):
+        """ Test the index follows tag renames and deletions """
+        recipe = sample_recipe(self.user, 'Pancakes')
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe.tags.add(tag)
+
+        tag.name = 'Brunch'
+        tag.save()
+        self.assertEqual(self.ids(self.search('breakfast')), [])
+        self.assertEqual(self.ids(self.search('brunch')), [recipe.id])
+
+        tag.delete()
+        self.assertEqual(self.ids(self.search('brunch')), [])
+
+    def test_search_limited_to_user(self):
+        """ Test other users' recipes are not found """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        sample_recipe(other, 'Thai green curry')
+
+        self.assertEqual(self.ids(self.search('curry')), [])
+
+    def test_search_paginates_by_page_number(self):
+        """ Test paged search results use page numbers, not a cursor """
+        for i in range(3):
+            sample_recipe(self.user, 'Curry %d' % i)
+
+        res = self.search('curry', page_size=2)
+
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_search_typo_in_tag_name(self):
+        """ Test a misspelt tag name still finds the recipe """
+        if not trigram_available():
+            self.skipTest('pg_trgm is not installed')
+        recipe = sample_recipe(self.user, 'Pancakes')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+
+        self.assertEqual(self.ids(self.search('brekfast')), [recipe.id])
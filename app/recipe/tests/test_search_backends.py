@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.search import UserIndex, get_search_backend, tokenize
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+MEMORY_SEARCH = dict(
+    settings.RECIPE_SEARCH,
+    BACKEND='recipe.search.InvertedIndexSearchBackend',
+)
+
+
+def sample_recipe(user, title):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class UserIndexTests(TestCase):
+    """ Test the inverted index data structure """
+
+    def setUp(self):
+        self.index = UserIndex(1, [
+            (3, frozenset(tokenize('Thai green curry'))),
+            (1, frozenset(tokenize('Green salad'))),
+            (2, frozenset(tokenize('Red curry'))),
+        ])
+
+    def test_postings_are_sorted(self):
+        """ Test the posting lists are sorted ids """
+        self.assertEqual(list(self.index.postings['green']), [1, 3])
+        self.assertEqual(list(self.index.postings['curry']), [2, 3])
+
+    def test_search_matches_every_token(self):
+        """ Test a search returns only documents with all tokens """
+        self.assertEqual(self.index.search({'green', 'curry'}), [3])
+        self.assertEqual(self.index.search({'green', 'tofu'}), [])
+
+    def test_add_replaces_document(self):
+        """ Test adding an indexed id replaces its old tokens """
+        self.index.add(1, frozenset(tokenize('Green curry')))
+
+        self.assertEqual(self.index.search({'curry'}), [1, 2, 3])
+        self.assertEqual(self.index.search({'salad'}), [])
+        self.assertNotIn('salad', self.index.postings)
+
+    def test_remove_document(self):
+        """ Test a removed document is no longer found """
+        self.index.remove(3)
+
+        self.assertEqual(self.index.search({'curry'}), [2])
+        self.assertNotIn('thai', self.index.postings)
+
+
+@override_settings(RECIPE_SEARCH=MEMORY_SEARCH)
+class InvertedIndexSearchApiTests(TestCase):
+    """ Test ?search= with the in-memory backend """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        get_search_backend().clear()
+
+    def search(self, term, **params):
+        res = self.client.get(RECIPE_URL, dict(params, search=term))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def ids(self, res):
+        return [recipe['id'] for recipe in res.data]
+
+    def test_search_title_tags_and_ingredients(self):
+        """ Test recipes are found by title, tag and ingredient words """
+        curry = sample_recipe(self.user, 'Thai green curry')
+        curry.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        omelette = sample_recipe(self.user, 'Omelette')
+        omelette.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Spinach')
+        )
+
+        self.assertEqual(self.ids(self.search('CURRY')), [curry.id])
+        self.assertEqual(self.ids(self.search('dinner thai')), [curry.id])
+        self.assertEqual(self.ids(self.search('spinach')), [omelette.id])
+        self.assertEqual(self.ids(self.search('spinach thai')), [])
+
+    def test_search_limited_to_user(self):
+        """ Test other users' recipes are not found """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        sample_recipe(other, 'Thai green curry')
+
+        self.assertEqual(self.ids(self.search('curry')), [])
+
+    def test_search_follows_changes(self):
+        """ Test the index follows renames and deletions """
+        recipe = sample_recipe(self.user, 'Pancakes')
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        recipe.tags.add(tag)
+        self.assertEqual(self.ids(self.search('breakfast')), [recipe.id])
+
+        tag.name = 'Brunch'
+        tag.save()
+        self.assertEqual(self.ids(self.search('breakfast')), [])
+        self.assertEqual(self.ids(self.search('brunch')), [recipe.id])
+
+        recipe.delete()
+        self.assertEqual(self.ids(self.search('brunch')), [])
+
+    def test_search_keeps_cursor_pagination(self):
+        """ Test unranked results are paged with the regular cursor """
+        for i in range(3):
+            sample_recipe(self.user, 'Curry %d' % i)
+
+        res = self.search('curry', page_size=2)
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIn('cursor=', res.data['next'])
+        self.assertNotIn('count', res.data)
+
+
+@override_settings(RECIPE_SEARCH=MEMORY_SEARCH)
+class InvertedIndexUpdateTests(TransactionTestCase):
+    """ Test committed changes update the loaded index in place """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.backend = get_search_backend()
+        self.backend.clear()
+
+    def test_changes_applied_without_rebuild(self):
+        """ Test saves, link changes and deletes reuse the same index """
+        recipe = sample_recipe(self.user, 'Pancakes')
+        index = self.backend.get_index(self.user.pk)
+
+        curry = sample_recipe(self.user, 'Thai curry')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Breakfast'))
+        self.assertIs(self.backend.get_index(self.user.pk), index)
+        self.assertEqual(index.search({'curry'}), [curry.id])
+        self.assertEqual(index.search({'breakfast'}), [recipe.id])
+
+        curry.delete()
+        self.assertIs(self.backend.get_index(self.user.pk), index)
+        self.assertEqual(index.search({'curry'}), [])
+
+    def test_unreported_change_rebuilds(self):
+        """ Test a change without signals is picked up by a rebuild """
+        recipe = sample_recipe(self.user, 'Pancakes')
+        index = self.backend.get_index(self.user.pk)
+
+        Recipe.objects.filter(id=recipe.id).update(title='Waffles')
+        # queryset.update()는 signal이 없음, 다른 변경의 generation bump로 감지
+        Tag.objects.create(user=self.user, name='Breakfast')
+
+        rebuilt = self.backend.get_index(self.user.pk)
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.search({'waffles'}), [recipe.id])
@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Ingredient
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def sample_recipe(user, *ingredients):
+    recipe = Recipe.objects.create(
+        user=user, title='Sample recipe', time_minutes=10, price=5.00
+    )
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class ShoppingListApiTests(TestCase):
+    """ Test GET /recipes/shopping-list/ """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.eggs = Ingredient.objects.create(user=self.user, name='Eggs')
+        self.milk = Ingredient.objects.create(user=self.user, name='Milk')
+
+    def get(self, recipes):
+        return self.client.get(SHOPPING_LIST_URL, {
+            'recipes': ','.join(str(recipe.id) for recipe in recipes)
+        })
+
+    def test_shopping_list_counts_recipes(self):
+        """ Test each ingredient appears once with its recipe count """
+        omelette = sample_recipe(self.user, self.salt, self.eggs)
+        pancakes = sample_recipe(self.user, self.eggs, self.milk)
+        soup = sample_recipe(self.user, self.salt)
+        # 선택하지 않은 recipe는 세지 않음
+        sample_recipe(self.user, self.salt, self.milk)
+
+        with self.assertNumQueries(1):
+            res = self.get([omelette, pancakes, soup])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': self.eggs.id, 'name': 'Eggs', 'recipe_count': 2},
+            {'id': self.salt.id, 'name': 'Salt', 'recipe_count': 2},
+            {'id': self.milk.id, 'name': 'Milk', 'recipe_count': 1},
+        ])
+
+    def test_shopping_list_ignores_other_users_recipes(self):
+        """ Test recipes of other users add nothing """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        recipe = sample_recipe(
+            other, Ingredient.objects.create(user=other, name='Flour')
+        )
+
+        res = self.get([recipe])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_shopping_list_invalid_ids(self):
+        """ Test missing, malformed or too many ids are rejected """
+        for value in ('', '1,x', ','.join(str(i) for i in range(1, 1002))):
+            res = self.client.get(SHOPPING_LIST_URL, {'recipes': value})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
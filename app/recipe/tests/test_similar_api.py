@@ -0,0 +1,200 @@
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.similarity import FeatureMatrix, similar_recipes
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def sample_recipe(user, title='Sample recipe'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=5.00
+    )
+
+
+class FeatureMatrixTests(TestCase):
+    """ Test the similarity bit matrix """
+
+    def setUp(self):
+        self.matrix = FeatureMatrix(1, [
+            (1, frozenset('abc')),
+            (2, frozenset('ab')),
+            (3, frozenset('cd')),
+            (4, frozenset('xy')),
+        ])
+
+    def test_jaccard(self):
+        """ Test scores are shared / union features, best first """
+        self.assertEqual(
+            self.matrix.similar(1), [(2, 2 / 3), (3, 1 / 4)]
+        )
+
+    def test_cosine(self):
+        """ Test cosine scores are shared / sqrt of both sizes """
+        scores = dict(self.matrix.similar(1, metric='cosine'))
+
+        self.assertAlmostEqual(scores[2], 2 / 6 ** 0.5)
+        self.assertAlmostEqual(scores[3], 1 / 6 ** 0.5)
+
+    def test_limit_and_ties(self):
+        """ Test equal scores list the newest recipe first """
+        self.matrix.add(5, frozenset('ab'))
+
+        self.assertEqual(self.matrix.similar(1, limit=2), [
+            (5, 2 / 3), (2, 2 / 3)
+        ])
+
+    def test_add_grows_the_matrix(self):
+        """ Test adding many recipes and features past the capacity """
+        features = frozenset(range(200))
+        for recipe_id in range(10, 60):
+            self.matrix.add(recipe_id, features)
+
+        self.assertEqual(len(self.matrix.similar(10, limit=100)), 49)
+        self.assertEqual(self.matrix.similar(1), [(2, 2 / 3), (3, 1 / 4)])
+
+    def test_add_replaces_and_remove(self):
+        """ Test changed and removed recipes are scored accordingly """
+        self.matrix.add(4, frozenset('abcx'))
+        self.matrix.remove(2)
+
+        self.assertEqual(self.matrix.similar(1), [(4, 3 / 4), (3, 1 / 4)])
+        self.assertEqual(self.matrix.similar(2), [])
+
+
+class SimilarRecipeApiTests(TestCase):
+    """ Test GET /recipes/{id}/similar/ """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        similar_recipes.clear()
+
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.tofu = Ingredient.objects.create(user=self.user, name='Tofu')
+        self.curry = sample_recipe(self.user, 'Curry')
+        self.curry.tags.add(self.vegan, self.dinner)
+        self.curry.ingredients.add(self.tofu)
+
+    def test_similar_recipes_ranked(self):
+        """ Test recipes sharing more tags/ingredients come first """
+        stir_fry = sample_recipe(self.user, 'Stir fry')
+        stir_fry.tags.add(self.vegan, self.dinner)
+        salad = sample_recipe(self.user, 'Salad')
+        salad.tags.add(self.vegan)
+        sample_recipe(self.user, 'Steak')
+
+        res = self.client.get(similar_url(self.curry.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data], [stir_fry.id, salad.id]
+        )
+        self.assertAlmostEqual(res.data[0]['similarity'], 2 / 3)
+        self.assertEqual(
+            sorted(res.data[0]['tags']),
+            sorted([self.vegan.id, self.dinner.id])
+        )
+
+    def test_similar_metric_and_limit(self):
+        """ Test ?metric=cosine and ?limit= """
+        for title in ('Stir fry', 'Salad'):
+            sample_recipe(self.user, title).ingredients.add(self.tofu)
+
+        res = self.client.get(
+            similar_url(self.curry.id), {'metric': 'cosine', 'limit': 1}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertAlmostEqual(res.data[0]['similarity'], 1 / 3 ** 0.5)
+
+    def test_similar_invalid_params(self):
+        """ Test an unknown metric or a bad limit is rejected """
+        for params in ({'metric': 'euclid'}, {'limit': 0}, {'limit': 'x'}):
+            res = self.client.get(similar_url(self.curry.id), params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_similar_other_users_recipe(self):
+        """ Test another user's recipe is not found """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        recipe = sample_recipe(other)
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SimilarRecipeUpdateTests(TransactionTestCase):
+    """ Test committed link changes update the loaded matrix in place """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        similar_recipes.clear()
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.curry = sample_recipe(self.user, 'Curry')
+        self.curry.tags.add(self.tag)
+
+    def similar(self):
+        return similar_recipes.similar(self.user.pk, self.curry.pk)
+
+    def test_link_changes_applied_without_rebuild(self):
+        """ Test forward, reverse and deleting changes reuse the matrix """
+        self.assertEqual(self.similar(), [])
+        matrix = similar_recipes.get_index(self.user.pk)
+
+        salad = sample_recipe(self.user, 'Salad')
+        self.tag.recipe_set.add(salad)
+        self.assertEqual(self.similar(), [(salad.id, 1.0)])
+
+        tofu = Ingredient.objects.create(user=self.user, name='Tofu')
+        self.curry.ingredients.add(tofu)
+        self.assertEqual(self.similar(), [(salad.id, 0.5)])
+
+        self.tag.delete()
+        self.assertEqual(self.similar(), [])
+        self.assertIs(similar_recipes.get_index(self.user.pk), matrix)
+
+    def test_deleted_recipe_dropped(self):
+        """ Test a deleted recipe is no longer suggested """
+        salad = sample_recipe(self.user, 'Salad')
+        salad.tags.add(self.tag)
+        self.assertEqual(self.similar(), [(salad.id, 1.0)])
+
+        salad.delete()
+
+        self.assertEqual(self.similar(), [])
+
+    @override_settings(RECIPE_SIMILAR=dict(
+        settings.RECIPE_SIMILAR, MAX_AGE=60
+    ))
+    def test_other_worker_change_after_max_age(self):
+        """ Test changes this process never heard of show after MAX_AGE """
+        salad = sample_recipe(self.user, 'Salad')
+        self.assertEqual(self.similar(), [])
+        matrix = similar_recipes.get_index(self.user.pk)
+        # 다른 worker의 변경: 이 process에 signal도 generation bump도 없음
+        Recipe.tags.through.objects.create(recipe=salad, tag=self.tag)
+
+        self.assertIs(similar_recipes.get_index(self.user.pk), matrix)
+        with patch('recipe.indexes.time.monotonic',
+                   return_value=matrix.built_at + 61):
+            self.assertEqual(self.similar(), [(salad.id, 1.0)])
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+STATS_URL = reverse('recipe:stats-list')
+
+
+def sample_recipe(user, time_minutes, price):
+    return Recipe.objects.create(
+        user=user, title='Sample recipe',
+        time_minutes=time_minutes, price=price
+    )
+
+
+class PublicStatsApiTests(TestCase):
+    """ Test unauthenticated stats API access """
+
+    def test_login_required(self):
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateStatsApiTests(TestCase):
+    """ Test GET /stats/ """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_stats(self):
+        """ Test counts, averages, histogram and tag counts """
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dessert = Tag.objects.create(user=self.user, name='Dessert')
+        sample_recipe(self.user, 10, 4.00).tags.add(vegan)
+        sample_recipe(self.user, 20, 6.00).tags.add(vegan)
+        sample_recipe(self.user, 150, 11.00)
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        sample_recipe(other, 10, 100.00)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(
+            res.data['price'], {'avg': '7.00', 'min': '4.00', 'max': '11.00'}
+        )
+        self.assertEqual(res.data['time_minutes']['avg'], 60.0)
+        self.assertEqual(res.data['time_minutes']['min'], 10)
+        self.assertEqual(res.data['time_minutes']['max'], 150)
+        histogram = res.data['time_minutes']['histogram']
+        self.assertEqual(
+            [bucket['count'] for bucket in histogram], [1, 1, 0, 0, 1]
+        )
+        self.assertEqual(res.data['tags'], [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 2},
+            {'id': dessert.id, 'name': 'Dessert', 'recipe_count': 0},
+        ])
+
+    def test_stats_without_recipes(self):
+        """ Test a user without recipes gets zeros and nulls """
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['price']['avg'])
+        self.assertIsNone(res.data['time_minutes']['avg'])
+        self.assertEqual(res.data['tags'], [])
+
+    def test_stats_custom_buckets(self):
+        """ Test ?time_buckets= sets the histogram edges """
+        sample_recipe(self.user, 10, 4.00)
+        sample_recipe(self.user, 45, 4.00)
+
+        res = self.client.get(STATS_URL, {'time_buckets': '30'})
+
+        self.assertEqual(res.data['time_minutes']['histogram'], [
+            {'min': 0, 'max': 30, 'count': 1},
+            {'min': 30, 'max': None, 'count': 1},
+        ])
+
+        for value in ('0,30', 'x', ','):
+            res = self.client.get(STATS_URL, {'time_buckets': value})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_follow_recipe_writes(self):
+        """ Test cached stats are invalidated when a recipe is created """
+        self.client.get(STATS_URL)
+        sample_recipe(self.user, 10, 4.00)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 1)
@@ -0,0 +1,169 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+
+SYNC_URL = reverse('recipe:recipe-sync')
+
+RECIPE_SYNC = {'TOMBSTONE_RETENTION_DAYS': 30}
+
+
+@override_settings(RECIPE_SYNC=RECIPE_SYNC)
+class SyncApiTests(TestCase):
+    """ Test the delta sync endpoint of the recipe API """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5.00
+        )
+        self.recipe.tags.add(self.tag)
+
+    def backdate(self, days=1):
+        """ Move every existing row of the user into the past """
+        past = timezone.now() - timedelta(days=days)
+        Recipe.objects.filter(user=self.user).update(updated_at=past)
+        Tag.objects.filter(user=self.user).update(updated_at=past)
+        Ingredient.objects.filter(user=self.user).update(updated_at=past)
+        Tombstone.objects.filter(user=self.user).update(deleted_at=past)
+
+    def sync_token(self):
+        """ Return a token taken before any changes of the test """
+        res = self.client.get(SYNC_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data['token']
+
+    def test_full_sync_without_token(self):
+        """ Test the first sync returns everything of the user """
+        other = get_user_model().objects.create_user('other@x.com', 'pass')
+        Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=1.00
+        )
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['recipes']],
+                         [self.recipe.id])
+        self.assertEqual(res.data['recipes'][0]['tags'], [self.tag.id])
+        self.assertEqual([t['name'] for t in res.data['tags']], ['Vegan'])
+        self.assertEqual(res.data['deleted'],
+                         {'recipes': [], 'tags': [], 'ingredients': []})
+        self.assertTrue(res.data['token'].isdigit())
+
+    def test_delta_sync_returns_changes_only(self):
+        """ Test only rows changed after the token are returned """
+        token = self.sync_token()
+        self.backdate()
+        changed = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=20, price=3.00
+        )
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [changed.id])
+        self.assertEqual(res.data['tags'], [])
+        self.assertEqual([i['id'] for i in res.data['ingredients']],
+                         [ingredient.id])
+
+    def test_delta_sync_returns_recounted_tags(self):
+        """ Test a tag whose recipe_count changed is sent again """
+        token = self.sync_token()
+        self.backdate()
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=20, price=3.00
+        ).tags.add(self.tag)
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(
+            [(t['id'], t['recipe_count']) for t in res.data['tags']],
+            [(self.tag.id, 2)]
+        )
+
+    def test_delta_sync_returns_deletions(self):
+        """ Test deleted recipes and tags are reported as tombstones """
+        recipe_id, tag_id = self.recipe.id, self.tag.id
+        token = self.sync_token()
+        self.backdate()
+        self.recipe.delete()
+        self.tag.delete()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['recipes'], [])
+        self.assertEqual(res.data['deleted']['recipes'], [recipe_id])
+        self.assertEqual(res.data['deleted']['tags'], [tag_id])
+
+    def test_old_deletions_not_returned(self):
+        """ Test tombstones older than the token are left out """
+        self.recipe.delete()
+        self.backdate(days=2)
+        token = self.sync_token()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.data['deleted']['recipes'], [])
+
+    def test_tag_change_touches_recipe(self):
+        """ Test renaming a tag syncs the recipes using it """
+        token = self.sync_token()
+        self.backdate()
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']],
+                         [self.recipe.id])
+        self.assertEqual([t['name'] for t in res.data['tags']],
+                         ['Vegetarian'])
+
+    def test_invalid_token(self):
+        """ Test a malformed token is rejected """
+        res = self.client.get(SYNC_URL, {'since': 'yesterday'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_older_than_retention(self):
+        """ Test a token older than the kept tombstones needs a full sync """
+        token = self.sync_token()
+        self.backdate()
+
+        with override_settings(RECIPE_SYNC={'TOMBSTONE_RETENTION_DAYS': 0}):
+            res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        self.assertEqual(res.data['detail'].code, 'resync_required')
+
+        res = self.client.get(SYNC_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_prune_tombstones(self):
+        """ Test tombstones past the retention window are deleted """
+        self.recipe.delete()
+        self.backdate(days=31)
+        self.tag.delete()
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(Tombstone.objects.values_list('kind', flat=True)),
+            [Tombstone.TAG]
+        )
@@ -3,7 +3,7 @@ from django.urls import reverse
 from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Tag
+from core.models import Tag, Recipe
 from recipe.serializers import TagSerializer
 
 TAGS_URL = reverse('recipe:tag-list')
@@ -88,4 +88,77 @@ class PrivateTagsApiTests(TestCase):
         res = self.client.post(TAGS_URL, payload)
         # 맨 처음 할때는 400 대신 405가 들어오는데
         # views.py에서 ViewSet의 ListModelMixin에 CreateModelMixin을 추가해야 한다.
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_tags_assigned_to_recipes(self):
+        """ Test filtering tags by those assigned to recipes """
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            title='Eggs on toast',
+            time_minutes=10,
+            price=5.00,
+            user=self.user
+        )
+        recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        ids = [item['id'] for item in res.data]
+        self.assertEqual(ids, [tag1.id])
+        self.assertNotIn(tag2.id, ids)
+
+    def test_retrieve_tags_assigned_unique(self):
+        """ Test filtering tags by assigned returns unique items """
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Porridge'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minutes=5,
+                price=3.00,
+                user=self.user
+            )
+            recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(len(res.data), 1)
+
+
+class TagOrderingApiTests(TestCase):
+    """ Test ?ordering= of the tag list """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com',
+            'password123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tags_ordered_by_popularity(self):
+        """ Test ?ordering=popular lists the most used tags first """
+        rare = Tag.objects.create(user=self.user, name='Rare')
+        common = Tag.objects.create(user=self.user, name='Common')
+        unused = Tag.objects.create(user=self.user, name='Unused')
+        for title in ('Curry', 'Soup'):
+            recipe = Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=1.00
+            )
+            recipe.tags.add(common)
+        recipe.tags.add(rare)
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(tag['id'], tag['recipe_count']) for tag in res.data],
+            [(common.id, 2), (rare.id, 1), (unused.id, 0)]
+        )
+
+    def test_tags_invalid_ordering(self):
+        """ Test an unknown ordering is rejected """
+        res = self.client.get(TAGS_URL, {'ordering': 'newest'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -14,6 +14,8 @@ router = DefaultRouter()
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
 router.register('recipes', views.RecipeViewSet)
+# queryset이 없는 ViewSet이라 basename 필요
+router.register('stats', views.RecipeStatsViewSet, basename='stats')
 
 app_name = 'recipe'
 
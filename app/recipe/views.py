@@ -2,20 +2,91 @@
 
 # 요기 viewsets, mixins엔 이름처럼 다양한 viewset, mixin 있음
 # CUD 제외 R만 할거라서 GenericViewSet, ListModeMixin로 간단히 가능
+import hashlib
+from datetime import datetime, timedelta
+
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import (
+    Prefetch, Exists, OuterRef, Count, Max, Min, Avg, Q
+)
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from core.authentication import CachedTokenAuthentication
+from core.models import Tag, Ingredient, Recipe, Tombstone
+from core.profiling import ProfilingMixin
+from core.signals import touch_recipes
+from core.slowqueries import SlowQueryLogMixin
+from recipe import serializers, pagination
+from recipe.bulk import BulkModelMixin
+from recipe.export import EXPORT_FORMATS
+from recipe.search import get_search_backend
+from recipe.similarity import METRICS, JACCARD, similar_recipes
+from recipe.cache import CachedResponseMixin
+
+
+def _params_to_ints(name, value):
+    """ Convert a comma separated query param of IDs to a set of ints """
+    try:
+        return {int(str_id) for str_id in value.split(',') if str_id}
+    except ValueError:
+        raise ValidationError({name: 'Expected a comma separated list of IDs'})
+
+
+# sync token은 epoch 이후 microsecond. client에게는 그냥 불투명한 문자열
+SYNC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
-from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+def _encode_sync_token(moment):
+    return str((moment - SYNC_EPOCH) // timedelta(microseconds=1))
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+def _decode_sync_token(token):
+    try:
+        return SYNC_EPOCH + timedelta(microseconds=int(token))
+    except (ValueError, OverflowError):
+        raise ValidationError({'since': 'Invalid sync token'})
+
+
+class ResyncRequired(APIException):
+    """ The sync token is older than the kept tombstones """
+    status_code = 410
+    default_detail = 'Full resync required, sync again without since.'
+    default_code = 'resync_required'
+
+
+class BaseRecipeAttrViewSet(SlowQueryLogMixin,
+                            CachedResponseMixin,
+                            BulkModelMixin,
+                            pagination.ConfiguredPaginationMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """ Base viewset for user owned recipe attributes """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    # ?ordering= 값 -> order_by (cursor pagination의 ordering)
+    # 기본은 이름 역순, popular는 recipe에 많이 쓰인 순서. 같으면 id로 구분
+    orderings = {
+        'name': ('-name', 'id'),
+        'popular': ('-recipe_count', '-name', 'id'),
+    }
+
+    @property
+    def pagination_ordering(self):
+        request = getattr(self, 'request', None)
+        ordering = request.query_params.get('ordering', 'name') \
+            if request is not None else 'name'
+        if ordering not in self.orderings:
+            raise ValidationError({
+                'ordering': 'Choose one of %s' % ', '.join(self.orderings)
+            })
+        return self.orderings[ordering]
 
     """ AssertionError: 2 != 1 이 안나오려면
     (user가 걸러지지 않아서 2개 다 들어옴)
@@ -27,7 +98,18 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         """ Return objects for the current authenticated user only """
         # request에 들어있는 user의 attr만
         # 즉 test에서 force_authenticatioe된 setUp의 user만 들어옴
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        queryset = self.queryset.filter(user=self.request.user)
+        # ?assigned_only=1: recipe에 하나라도 쓰인 것만
+        # join + distinct 대신 through table에 EXISTS subquery
+        if self.request.query_params.get('assigned_only') in ('1', 'true'):
+            assigned = self.recipe_through.objects.filter(
+                **{self.recipe_through_field: OuterRef('pk')}
+            )
+            queryset = queryset.annotate(
+                assigned=Exists(assigned)
+            ).filter(assigned=True)
+
+        return queryset.order_by(*self.pagination_ordering)
 
     """ Create queryset을 지원하려면 이게 있어야 함
     (Create든 POST든 사용하면 이게 필요하다고 생각하면 됨)
@@ -37,33 +119,324 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         # DB에서 create하니가 serializer 사용
         serializer.save(user=self.request.user)
 
+    def perform_bulk_update(self, serializer):
+        super().perform_bulk_update(serializer)
+        # 이름이 바뀌면 그 이름을 담은 recipe detail도 바뀐 것 (post_save 대신)
+        touch_recipes(list(self.recipe_through.objects.filter(**{
+            self.recipe_through_field + '__in': serializer.instance
+        }).values_list('recipe_id', flat=True)))
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """ Manage tags in the database """
     # list model할땐 모든 인스턴스틀 가져올 queryset 필요
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    # assigned_only에서 EXISTS로 확인할 through table과 FK
+    recipe_through = Recipe.tags.through
+    recipe_through_field = 'tag'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """ Manage ingredients in the database """
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    recipe_through = Recipe.ingredients.through
+    recipe_through_field = 'ingredient'
 
 
 # List(R)만 지원하는 Tag, Ingredient와는 달리
 # CRUD를 다 지원하는 RecipeViewSet은 ModelViewSet로부터 extend
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfilingMixin,
+                    SlowQueryLogMixin,
+                    CachedResponseMixin,
+                    BulkModelMixin,
+                    pagination.ConfiguredPaginationMixin,
+                    viewsets.ModelViewSet):
     """ Manage recipes in the database """
     serializer_class = serializers.RecipeSerializer
     # action 중 하나, list
-    queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    # search_vector는 검색 조건에만 쓰고 response에는 필요 없으니 안 읽음
+    queryset = Recipe.objects.defer('search_vector')
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_ordering = ('-id',)
+    cached_actions = ('list', 'retrieve', 'similar', 'shopping_list')
 
     def get_queryset(self):
         """ Retrieve the recipes exclusively for the auth user """
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list':
+            queryset = self._filter_related(queryset)
+        # action에 따라 serializer가 필요한 M2M만 한번에 prefetch
+        # 안 하면 recipe 하나당 tags, ingredients 쿼리가 2개씩 더 나감 (N+1)
+        if self.action in ('list', 'sync', 'similar', 'bulk_create',
+                           'bulk_update'):
+            # RecipeSerializer는 PrimaryKeyRelatedField라 id만 있으면 됨
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only('id')),
+                Prefetch(
+                    'ingredients', queryset=Ingredient.objects.only('id')
+                ),
+            )
+        elif self.action == 'retrieve':
+            # RecipeDetailSerializer는 nested serializer라
+            # TagSerializer, IngredientSerializer의 field만 읽음
+            nested = ('id', 'name', 'recipe_count')
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.only(*nested)),
+                Prefetch(
+                    'ingredients',
+                    queryset=Ingredient.objects.only(*nested)
+                ),
+            )
+
+        queryset = queryset.order_by(*self.pagination_ordering)
+        if self.action == 'list' and self._search_term():
+            queryset = self._search(queryset, self._search_term())
+
+        return queryset
+
+    def get_bulk_queryset(self):
+        # list가 아니면 filter 없이 serializer용 prefetch만 걸림
+        return self.get_queryset()
+
+    @property
+    def pagination_class(self):
+        """ Use page numbers for ?search= since rank is not a cursor key """
+        pagination_class = super().pagination_class
+        if (self._search_term() and get_search_backend().ranked and
+                pagination_class is not None and
+                issubclass(pagination_class,
+                           pagination.RecipeCursorPagination)):
+            return pagination.RecipePageNumberPagination
+        return pagination_class
+
+    def _search_term(self):
+        return self.request.query_params.get('search', '').strip()
+
+    def _search(self, queryset, term):
+        """ Search title, tag and ingredient names with the backend """
+        return get_search_backend().search(queryset, term, self.request.user)
+
+    def _filter_related(self, queryset):
+        """ Filter recipes by ?tags= and ?ingredients= through tables """
+        params = self.request.query_params
+        # ?match=all 이면 모든 id를 가진 recipe, 기본은 하나라도 가진 recipe
+        match_all = params.get('match') == 'all'
+        related = (
+            ('tags', Recipe.tags.through, 'tag_id'),
+            ('ingredients', Recipe.ingredients.through, 'ingredient_id'),
+        )
+        for name, through, column in related:
+            if not params.get(name):
+                continue
+            ids = _params_to_ints(name, params[name])
+            # Python에서 set 교집합 하지 않고 through table subquery로
+            # 전체가 SQL 한번에 실행됨
+            recipe_ids = through.objects.filter(**{column + '__in': ids})
+            if match_all:
+                recipe_ids = recipe_ids.values('recipe_id').annotate(
+                    matched=Count(column)
+                ).filter(matched=len(ids))
+            queryset = queryset.filter(id__in=recipe_ids.values('recipe_id'))
+
+        return queryset
+
+    # 방금 시작한 transaction이 조금 늦게 commit되어도 다음 sync에서
+    # 놓치지 않도록 token을 이만큼 과거로 잡음 (겹치는 건 다시 보내도 무해)
+    sync_overlap = timedelta(seconds=5)
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """ Return what changed since the ?since= token of the last sync """
+        token = _encode_sync_token(timezone.now() - self.sync_overlap)
+        recipes = self.get_queryset()
+        tags = Tag.objects.filter(user=request.user).order_by('id')
+        ingredients = Ingredient.objects.filter(
+            user=request.user
+        ).order_by('id')
+        deleted = {'recipes': [], 'tags': [], 'ingredients': []}
+
+        # since가 없으면 처음 sync라서 전체를 보냄
+        if request.query_params.get('since'):
+            since = _decode_sync_token(request.query_params['since'])
+            # 그 사이 삭제 기록이 지워졌을 수 있어서 delta를 믿을 수 없음
+            retention = timedelta(
+                days=settings.RECIPE_SYNC['TOMBSTONE_RETENTION_DAYS']
+            )
+            if since < timezone.now() - retention:
+                raise ResyncRequired()
+            # (user, updated_at) index로 바뀐 것만
+            recipes = recipes.filter(updated_at__gte=since)
+            tags = tags.filter(updated_at__gte=since)
+            ingredients = ingredients.filter(updated_at__gte=since)
+            tombstones = Tombstone.objects.filter(
+                user=request.user, deleted_at__gte=since
+            ).values_list('kind', 'object_id')
+            for kind, object_id in tombstones:
+                deleted[kind + 's'].append(object_id)
+
+        return Response({
+            'token': token,
+            'recipes': serializers.RecipeSerializer(recipes, many=True).data,
+            'tags': serializers.TagSerializer(tags, many=True).data,
+            'ingredients': serializers.IngredientSerializer(
+                ingredients, many=True
+            ).data,
+            'deleted': deleted,
+        })
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """ Return the user's recipes sharing the most tags/ingredients """
+        return self.cached_response(
+            request, lambda: self._similar(request)
+        )
+
+    def _similar(self, request):
+        metric = request.query_params.get('metric', JACCARD)
+        if metric not in METRICS:
+            raise ValidationError({
+                'metric': 'Choose one of %s' % ', '.join(METRICS)
+            })
+        config = settings.RECIPE_SIMILAR
+        try:
+            limit = int(request.query_params.get('limit', config['LIMIT']))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({'limit': 'Expected a positive integer'})
+        limit = min(limit, config['MAX_LIMIT'])
+
+        # 다른 user의 recipe면 404
+        recipe = self.get_object()
+        scores = similar_recipes.similar(
+            request.user.pk, recipe.pk, metric, limit
+        )
+        recipes = self.get_queryset().in_bulk([pk for pk, _ in scores])
+        results = []
+        for pk, score in scores:
+            # matrix 반영 직전에 지워졌으면 건너뜀
+            if pk in recipes:
+                recipes[pk].similarity = score
+                results.append(recipes[pk])
+
+        return Response(
+            serializers.SimilarRecipeSerializer(results, many=True).data
+        )
+
+    # ?recipes= 로 받는 최대 recipe 수
+    shopping_list_max_recipes = 1000
+
+    @action(detail=False, methods=['get'], url_path='shopping-list',
+            url_name='shopping-list')
+    def shopping_list(self, request):
+        """ Return the ingredients of ?recipes= with how many need each """
+        return self.cached_response(
+            request, lambda: self._shopping_list(request)
+        )
+
+    def _shopping_list(self, request):
+        if not request.query_params.get('recipes'):
+            raise ValidationError({'recipes': 'This parameter is required.'})
+        ids = _params_to_ints('recipes', request.query_params['recipes'])
+        if len(ids) > self.shopping_list_max_recipes:
+            raise ValidationError({
+                'recipes': 'Ensure this has no more than %d IDs.' %
+                self.shopping_list_max_recipes
+            })
+
+        # recipe detail을 하나씩 받아서 합치지 않고 through table을
+        # GROUP BY ingredient 한번으로. filter가 annotate 앞이라 COUNT는
+        # 요청한 recipe들의 link만 셈. 다른 user의 recipe id는 무시됨
+        # (Ingredient.recipe_count는 전체 recipe 수라 이름을 다르게)
+        ingredients = Ingredient.objects.filter(
+            user=request.user, recipe__id__in=ids
+        ).annotate(
+            selected_count=Count('recipe')
+        ).values_list('id', 'name', 'selected_count').order_by(
+            '-selected_count', 'name', 'id'
+        )
+
+        return Response([
+            {'id': pk, 'name': name, 'recipe_count': count}
+            for pk, name, count in ingredients
+        ])
+
+    # server-side cursor에서 한번에 가져오는 recipe 수
+    export_chunk_size = 500
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """ Stream every recipe of the user as ?output=ndjson or csv """
+        # ?format=은 DRF의 renderer 선택에 쓰여서 output이라는 이름 사용
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({
+                'output': 'Choose one of %s' % ', '.join(EXPORT_FORMATS)
+            })
+        generate, content_type, extension = EXPORT_FORMATS[output]
+
+        response = StreamingHttpResponse(
+            generate(request.user, self.export_chunk_size),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            'attachment; filename="recipes.%s"' % extension
+        return response
+
+    def get_validators(self):
+        """ Return the ETag and Last-Modified of the list or detail """
+        if self.action not in ('list', 'retrieve'):
+            return None
+
+        # prefetch 없이 aggregate 쿼리 하나로 계산 (serialize 안함)
+        queryset = self.filter_queryset(
+            self.queryset.filter(user=self.request.user)
+        )
+        # count: 지워진 recipe도 ETag에 반영되게
+        aggregates = {
+            'last_modified': Max('updated_at'),
+            'count': Count('id', distinct=True),
+        }
+        if self.action == 'list':
+            queryset = self._filter_related(queryset)
+        else:
+            queryset = queryset.filter(pk=self.kwargs['pk'])
+            # detail은 tag/ingredient를 nested로 보여줌 (recipe_count 포함).
+            # 다른 recipe 때문에 count가 바뀌어도 ETag가 바뀌게
+            aggregates['tags_modified'] = Max('tags__updated_at')
+            aggregates['ingredients_modified'] = Max(
+                'ingredients__updated_at'
+            )
+        state = queryset.aggregate(**aggregates)
+        if self.action == 'retrieve' and not state['count']:
+            # 없는 recipe는 그냥 404
+            return None
+        state['last_modified'] = max((
+            moment for moment in (
+                state['last_modified'],
+                state.get('tags_modified'),
+                state.get('ingredients_modified'),
+            ) if moment is not None
+        ), default=None)
+
+        etag = hashlib.md5(':'.join(str(part) for part in (
+            self.action,
+            state['count'],
+            state['last_modified'],
+            self.request.get_full_path(),
+            self.request.accepted_renderer.format,
+        )).encode()).hexdigest()
+        return etag, state['last_modified']
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
 
     # certain request를 retrieve할 때 call 하는 함수
     # viewset의 different action에 따라 serializer를 바꾸고 싶다면
@@ -79,4 +452,87 @@ class RecipeViewSet(viewsets.ModelViewSet):
     ModelViewSet이 out of the box하게 object를 create하기 떄문 """
     def perform_create(self, serializer):
         """ Create a new recipe """
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+
+class RecipeStatsViewSet(CachedResponseMixin, viewsets.ViewSet):
+    """ Summarize the recipes of the user for dashboards """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    # time_minutes histogram 구간 경계 (?time_buckets=15,30,60 로 변경 가능)
+    time_buckets = (15, 30, 60, 120)
+
+    def list(self, request):
+        # recipe/tag가 바뀌면 generation이 올라가서 cache가 무효화됨
+        return self.cached_response(
+            request, lambda: Response(self.get_stats(request))
+        )
+
+    def get_buckets(self, request):
+        """ Return [(min, max or None)] ranges of the time histogram """
+        edges = self.time_buckets
+        if request.query_params.get('time_buckets'):
+            edges = sorted(_params_to_ints(
+                'time_buckets', request.query_params['time_buckets']
+            ))
+            if not edges or edges[0] < 1 or len(edges) > 20:
+                raise ValidationError({
+                    'time_buckets': 'Expected 1 to 20 positive minutes'
+                })
+        lower = (0,) + tuple(edges)
+        upper = tuple(edges) + (None,)
+        return list(zip(lower, upper))
+
+    def get_stats(self, request):
+        """ Compute the stats with one aggregate and one tag query """
+        recipes = Recipe.objects.filter(user=request.user)
+        buckets = self.get_buckets(request)
+
+        # 평균, 최소/최대와 histogram 구간별 COUNT(...) FILTER를
+        # SELECT 한번에 (recipe를 Python으로 가져오지 않음)
+        aggregates = {
+            'count': Count('id'),
+            'price_avg': Avg('price'),
+            'price_min': Min('price'),
+            'price_max': Max('price'),
+            'time_avg': Avg('time_minutes'),
+            'time_min': Min('time_minutes'),
+            'time_max': Max('time_minutes'),
+        }
+        for i, (low, high) in enumerate(buckets):
+            condition = Q(time_minutes__gte=low)
+            if high is not None:
+                condition &= Q(time_minutes__lt=high)
+            aggregates['bucket_%d' % i] = Count('id', filter=condition)
+        summary = recipes.aggregate(**aggregates)
+
+        # 관리되는 recipe_count column이라 GROUP BY 없이
+        # (user, -recipe_count, -name, id) index 순서로
+        tags = Tag.objects.filter(user=request.user).values(
+            'id', 'name', 'recipe_count'
+        ).order_by('-recipe_count', '-name', 'id')
+
+        def price(value):
+            # RecipeSerializer의 price와 같은 형식
+            return None if value is None else '%.2f' % value
+
+        return {
+            'recipe_count': summary['count'],
+            'price': {
+                'avg': price(summary['price_avg']),
+                'min': price(summary['price_min']),
+                'max': price(summary['price_max']),
+            },
+            'time_minutes': {
+                'avg': None if summary['time_avg'] is None
+                else round(summary['time_avg'], 1),
+                'min': summary['time_min'],
+                'max': summary['time_max'],
+                'histogram': [
+                    {'min': low, 'max': high,
+                     'count': summary['bucket_%d' % i]}
+                    for i, (low, high) in enumerate(buckets)
+                ],
+            },
+            'tags': list(tags),
+        }
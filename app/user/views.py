@@ -1,16 +1,18 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.authentication import CachedTokenAuthentication
+from core.profiling import ProfilingMixin
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 # 빌트인 View
 # serializer를 이용해서 DB에 인스턴스를 create하는 API를 만듦
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ProfilingMixin, generics.CreateAPIView):
     """ Create a new user in the system """
     serializer_class = UserSerializer
 
 # 빌트인 View
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ProfilingMixin, ObtainAuthToken):
     """ Creata a new auth token for user """
     serializer_class = AuthTokenSerializer
 
@@ -18,10 +20,10 @@ class CreateTokenView(ObtainAuthToken):
     # ViewSet과 Url View들을 모아 볼수 있는 Hub
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
     
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ProfilingMixin, generics.RetrieveUpdateAPIView):
     """ Manage the authenticated user """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, )
     # permissions: level of access user has
     # user는 auth되어야지만 api 사용가능하게 함
     permission_classes = (permissions.IsAuthenticated, )